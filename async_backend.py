@@ -0,0 +1,346 @@
+"""واجهة غير متزامنة لـ Backend مبنية على ccxt.async_support.
+ملاحظات:
+- حلقة asyncio واحدة في خيط مستقل، وجلسة aiohttp واحدة دائمة (مجمع اتصالات keep-alive) لكل الطلبات.
+- تتشارك الحالة مع Backend المتزامن: المفاتيح، فهرس الأسواق، مخزن الأسعار، السجل، التخزين المؤقت ومجدول الأوزان.
+- الواجهة تستدعي submit(coroutine, callback) وتستلم Future، فتتداخل طلبات الرصيد والأسعار والأوامر
+  ولا يتوقف خيط الواجهة على الشبكة.
+- aiohttp و ccxt.async_support يُستوردان على خيط الحلقة عند أول اتصال، لا عند بدء التطبيق.
+"""
+import asyncio
+import functools
+import importlib.util
+import threading
+import time
+from decimal import Decimal
+
+from binance_backend import SPOT_ONLY
+from conversion import ConversionPlanner, ConversionExecutor
+from telemetry import ERROR
+from valuation import to_decimal
+
+aiohttp = None  # both imported by _load_async_deps() on the loop thread
+ccxt_async = None
+_AVAILABLE = None
+
+
+def _load_async_deps():
+    global aiohttp, ccxt_async
+    if ccxt_async is None:
+        import aiohttp as http
+        import ccxt.async_support as module
+        aiohttp, ccxt_async = http, module
+
+
+class AsyncBackend:
+    def __init__(self, backend, pool_size=20, keepalive=30, max_workers=4):
+        self.backend = backend
+        self.pool_size = pool_size  # max open connections in the shared session
+        self.keepalive = keepalive
+        self.max_workers = max_workers  # concurrent conversion steps
+        self.exchange = None
+        self.session = None
+        self._loop = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    @staticmethod
+    def available():
+        # only looks the packages up; importing ccxt.async_support loads every async exchange
+        global _AVAILABLE
+        if _AVAILABLE is None:
+            _AVAILABLE = all(importlib.util.find_spec(name) is not None for name in ('aiohttp', 'ccxt'))
+        return _AVAILABLE
+
+    def log(self, msg, *args, **kwargs):
+        self.backend.log(msg, *args, **kwargs)
+
+    # --- event loop thread -------------------------------------------------------
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return True
+        if not self.available():
+            self.log('ccxt.async_support أو aiohttp غير متوفر - لا يمكن تشغيل الواجهة غير المتزامنة.')
+            return False
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._thread_main, daemon=True)
+        self._thread.start()
+        self._ready.wait(5)
+        return self._loop is not None
+
+    def _thread_main(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._ready.set()
+        try:
+            loop.run_forever()
+            loop.run_until_complete(self._close())
+        except Exception as e:
+            self.log('خطأ في خيط الواجهة غير المتزامنة: {}', e)
+        finally:
+            self._loop = None
+            loop.close()
+
+    def stop(self, timeout=5):
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(loop.stop)
+            except RuntimeError:
+                pass
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    async def _close(self):
+        if self.exchange is not None:
+            await self.exchange.close()
+        if self.session is not None:
+            await self.session.close()
+        self.exchange = self.session = None
+
+    def submit(self, coro, callback=None):
+        """جدولة coroutine على حلقة الخلفية من أي خيط، وتعيد concurrent.futures.Future.
+        callback(result, error) يُستدعى من خيط الحلقة عند الانتهاء."""
+        if not self.start():
+            coro.close()
+            raise RuntimeError('الواجهة غير المتزامنة غير متاحة')
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        if callback is not None:
+            def done(f):
+                try:
+                    result, error = f.result(), None
+                except Exception as e:
+                    result, error = None, e
+                callback(result, error)
+            future.add_done_callback(done)
+        return future
+
+    # --- exchange and shared session ----------------------------------------------
+    async def connect(self):
+        """(إعادة) إنشاء exchange غير المتزامن بمفاتيح Backend الحالية فوق الجلسة المشتركة."""
+        _load_async_deps()
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=self.keepalive,
+                                             ttl_dns_cache=300)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=30))
+        if self.exchange is not None:
+            # ccxt never closes a session it was given, so the pool survives the swap
+            await self.exchange.close()
+        b = self.backend
+        config = {
+            'session': self.session,
+            # pacing is done by Backend.scheduler from Binance request weights
+            'enableRateLimit': False,
+            'options': dict(SPOT_ONLY, adjustForTimeDifference=True),
+        }
+        if b.api_key and b.api_secret:
+            config.update(apiKey=b.api_key, secret=b.api_secret)
+        self.exchange = ccxt_async.binance(config)
+        return self.exchange
+
+    async def set_keys(self, key, secret):
+        """تحديث المفاتيح وتحميل الأسواق (في خيط جانبي) ثم إعادة إنشاء exchange غير المتزامن."""
+        await asyncio.get_running_loop().run_in_executor(None, self.backend.set_keys, key, secret)
+        await self.connect()
+
+    async def api(self, name, *args, **kwargs):
+        paper = self.backend.paper
+        if paper is not None:
+            # paper trading: the ledger answers locally, market data goes through the sync scheduler path
+            if paper.is_virtual(name):
+                return getattr(paper, name)(*args, **kwargs)
+            return await asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(self.backend.api, name, *args, **kwargs))
+        if self.exchange is None:
+            await self.connect()
+        return await self.backend.scheduler.call_async(self.exchange, name, *args, **kwargs)
+
+    async def _cached(self, key, loader, ttl=None):
+        # same cache entries as Backend._cached, so sync and async callers share snapshots
+        found, value = self.backend.cache_get(key, ttl)
+        return value if found else self.backend.cache_put(key, await loader())
+
+    async def get_balance(self):
+        return await self._cached('balance', lambda: self.api('fetch_balance'))
+
+    async def get_all_tickers(self):
+        return await self._cached('tickers', lambda: self.api('fetch_tickers'))
+
+    async def refresh_tickers(self, symbols=None):
+        """جلب أسعار الرموز (الظاهرة افتراضياً) ونشرها في مخزن الأسعار. تعيد عدد الرموز المحدثة."""
+        b = self.backend
+        symbols = b.tradable_symbols(list(symbols or b.watch_symbols or b.DEFAULT_SYMBOLS))
+        if not symbols:
+            return 0
+        tickers = await self.api('fetch_tickers', symbols) or {}
+        prices = {}
+        for sym in symbols:
+            t = tickers.get(sym)
+            price = (t.get('last') or t.get('close')) if t else None
+            if price is not None:
+                prices[sym] = Decimal(str(price))
+        b.update_tickers(prices)
+        return len(prices)
+
+    # --- account operations -----------------------------------------------------------
+    async def value_portfolio(self):
+        b = self.backend
+        bal, tickers = await asyncio.gather(self.get_balance(), self.get_all_tickers())
+        if not isinstance(tickers, dict):
+            tickers = {}
+        return b.valuator.value(bal.get('total', {}), tickers, router=lambda: b.get_router(tickers),
+                                books=b.order_books.get)
+
+    async def calculate_total_asset_value(self):
+        try:
+            return to_decimal((await self.value_portfolio()).total)
+        except Exception as e:
+            self.log('خطأ في calculate_total_asset_value: {}', e)
+            return Decimal('0')
+
+    async def asset_breakdown(self):
+        try:
+            return self.backend.valuator.breakdown(await self.value_portfolio())
+        except Exception as e:
+            self.log('خطأ في asset_breakdown: {}', e)
+            return []
+
+    async def cancel_all_pending_orders(self, confirm_timeout=5.0):
+        """مثل Backend.cancel_all_pending_orders: كل الرموز تُلغى بالتوازي ثم يُتأكد من خلوها."""
+        try:
+            open_orders = await self.api('fetch_open_orders')
+            if not open_orders:
+                self.log('لا توجد أوامر معلقة.')
+                return True
+            jobs = self.backend.cancel_jobs(open_orders)
+            remaining = {sym for sym in await asyncio.gather(*(self._cancel(*job) for job in jobs)) if sym}
+            self.backend.invalidate_cache('balance')
+            deadline = time.monotonic() + confirm_timeout
+            delay = 0.2
+            while remaining and time.monotonic() < deadline:
+                still = await asyncio.gather(*(self.api('fetch_open_orders', sym) for sym in remaining))
+                remaining = {sym for sym, orders in zip(list(remaining), still) if orders}
+                if remaining:
+                    await asyncio.sleep(delay)
+                    delay = min(1.0, delay * 2)
+            if remaining:
+                self.log('ما زالت هناك أوامر معلقة بعد الإلغاء: {}', sorted(remaining))
+                return False
+            return True
+        except Exception as e:
+            self.log('خطأ في cancel_all_pending_orders: {}', e)
+            return False
+
+    async def _cancel(self, symbol, orders, name, args):
+        # returns the symbol when the response does not confirm every order as cancelled
+        try:
+            result = await self.api(name, *args)
+        except Exception as e:
+            return self.backend.cancel_result(symbol, orders, None, e)
+        return self.backend.cancel_result(symbol, orders, result)
+
+    async def convert_to_usdt(self, min_value_threshold=5, dry_run=False):
+        """نفس Backend.convert_to_usdt، مع تنفيذ خطوات الأصول المستقلة كمهام متزامنة على الحلقة."""
+        b = self.backend
+        try:
+            executor = ConversionExecutor(b, max_workers=self.max_workers)
+            if not dry_run:
+                await self.cancel_all_pending_orders()
+            bal, tickers = await asyncio.gather(self.get_balance(), self.get_all_tickers())
+            planner = ConversionPlanner(b, graph=b.get_router(tickers))
+            steps, skipped = planner.plan(bal.get('total', {}), tickers, min_value_threshold)
+            for msg in skipped:
+                self.log(msg)
+            if dry_run:
+                lines = executor.describe(steps)
+                lines.append(f'الزمن المتوقع للتنفيذ: {executor.estimate_wall_time(steps):.2f} ثانية ({len(steps)} أصل)')
+                return True, '\n'.join(lines)
+            if not b.trading_active:
+                results = executor.execute(steps, simulate=True)  # logging only, no network
+            else:
+                gate = asyncio.Semaphore(self.max_workers)
+                results = await asyncio.gather(*(self._run_step(executor, step, gate) for step in steps))
+            self.log('انتهاء محاولة التحويل إلى USDT.')
+            return True, '\n'.join(results) if results else 'لم يتم تحويل أي عملات'
+        except Exception as e:
+            b.telemetry.exception('استثناء في convert_to_usdt: {}', e, e)
+            return False, str(e)
+
+    async def _run_step(self, executor, step, gate):
+        # same steps as ConversionExecutor._run_step, with the orders awaited on the loop
+        asset = step.asset
+        async with gate:
+            for route in step.routes:
+                path = executor.route_path(asset, route)
+                orders = []
+                try:
+                    amount = step.amount
+                    for leg in route:
+                        qty = executor.leg_quantity(leg, amount, depth=await self._ensure_book(leg.symbol))
+                        order = await self.api('create_market_sell_order', leg.symbol, qty)
+                        orders.append(order)
+                        amount = executor.received_from_order(order, leg)
+                        if amount is None:
+                            self.backend.invalidate_cache('balance')
+                            amount = executor.free_amount(await self.get_balance(), leg)
+                        executor.check_received(amount, leg)
+                    return executor.route_succeeded(asset, path, orders)
+                except Exception as e:
+                    if executor.route_failed(path, e, orders):
+                        break
+        return executor.step_failed(asset)
+
+    async def _ensure_book(self, symbol):
+        # fill Backend.order_books from the async exchange so sizing never falls back to a blocking REST call
+        books = self.backend.order_books
+        if books.get(symbol) is not None:
+            return True
+        try:
+            books.load(symbol, await self.api('fetch_order_book', symbol, books.depth))
+            return True
+        except Exception as e:
+            self.log('تعذر جلب دفتر {}، البيع بدون تقدير الانزلاق: {}', symbol, e)
+            return False
+
+    async def place_order(self, symbol, side, amount, price=None):
+        b = self.backend
+        try:
+            b.log('طلب تنفيذ أمر: {} {} qty={} price={}', side, symbol, amount, price)
+            if not b.trading_active:
+                b.log('التداول الحقيقي غير مفعل - الأمر لن يُرسل (محاكاة).')
+                return {'status': 'simulated'}
+            qty = b.quantize_amount(symbol, amount)
+            if price is None:
+                order = await self.api('create_market_order', symbol, side, qty)
+            else:
+                order = await self.api('create_limit_order', symbol, side, qty,
+                                       b.quantize_price(symbol, price, up=(side == 'sell')))
+            b.invalidate_cache('balance')
+            b.log('أمر مُرسل: {}', order)
+            return order
+        except Exception as e:
+            b.log('فشل عند إرسال الأمر: {}', e, level=ERROR)
+            return {'error': str(e)}
+
+    async def send_usdt_via_arbitrum(self, address, min_withdraw=0.0):
+        b = self.backend
+        try:
+            if b.paper is not None:
+                b.log('السحب غير متاح في التداول الورقي.')
+                return False
+            if not b.enable_trading:
+                b.log('التداول/السحب معطّل (محاكاة).')
+                return False
+            balance = await self.api('fetch_balance')
+            free_usdt = balance.get('free', {}).get('USDT', 0)
+            if free_usdt <= min_withdraw:
+                b.log('الرصيد أقل من الحد الأدنى للسحب: {}', free_usdt)
+                return False
+            tx = await self.api('withdraw', 'USDT', float(free_usdt), address, {'network': 'ARBITRUM'})
+            b.invalidate_cache('balance')
+            b.log('تم تنفيذ السحب: {}', tx)
+            return Decimal(str(free_usdt))
+        except Exception as e:
+            b.log('فشل السحب عبر ccxt: {}', e, level=ERROR)
+            return False
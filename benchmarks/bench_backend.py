@@ -0,0 +1,222 @@
+"""مجموعة قياس أداء Backend فوق المنصة الوهمية (بدون اتصال بـ Binance).
+تقيس: زمن دورة تحديث الأسعار، زمن تحويل المحفظة، معدل حساب قيمة المحفظة، واستهلاك الذاكرة،
+مع زيادة عدد الرموز والأرصدة، وتداخل الطلبات في AsyncBackend مقارنة بالتنفيذ المتتابع.
+التشغيل: python benchmarks/bench_backend.py [--latency 0.02] [--markets 3000] [--stream] [--scheduler] [--async]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+from binance_backend import Backend
+from mock_exchange import MockExchange, attach, attach_async
+
+
+def make_backend(**kwargs):
+    backend = Backend()
+    exchange = MockExchange(**kwargs)
+    attach(backend, exchange)
+    return backend, exchange
+
+
+def measure(fn):
+    """تعيد (النتيجة، الزمن بالثواني). القياس بدون tracemalloc حتى لا يبطئ التوقيت."""
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def peak_memory(fn):
+    """ذروة الذاكرة المخصصة أثناء fn بالكيلوبايت."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def bench_refresh(args):
+    print('\n== refresh cycle (seconds per cycle) ==')
+    print(f'{"symbols":>8} {"mode":>7} {"cycle s":>9} {"calls":>6} {"peak KB":>9}')
+    for count in (8, 50, 500):
+        for batch in (True, False):
+            if not batch and count * args.latency > 5:
+                continue  # per-symbol mode at this size would take too long to be useful
+            backend, ex = make_backend(markets=args.markets, latency=args.latency)
+            backend.batch_fetch = batch
+            symbols = [s for s in ex.markets if s.endswith('/USDT')][:count]
+            _, elapsed = measure(lambda: backend.refresh_tickers(symbols))
+            calls = sum(ex.calls.get(k, 0) for k in ('fetch_ticker', 'fetch_tickers'))
+            peak = peak_memory(lambda: backend.refresh_tickers(symbols))
+            print(f'{count:>8} {"batch" if batch else "single":>7} {elapsed:9.3f} {calls:>6} {peak:9.0f}')
+
+
+def bench_conversion(args):
+    print('\n== convert_to_usdt wall time ==')
+    print(f'{"assets":>8} {"workers":>8} {"wall s":>8} {"orders":>7} {"ok":>4}')
+    for count in (5, 20, 40):
+        for workers in (1, 4, 8):
+            backend, ex = make_backend(markets=args.markets, latency=args.latency)
+            ex.random_balances(count)
+            backend.enable_trading = True
+            (ok, summary), elapsed = measure(lambda: backend.convert_to_usdt(max_workers=workers))
+            done = summary.count('[نجاح]')
+            print(f'{count:>8} {workers:>8} {elapsed:8.2f} {ex.calls.get("create_order", 0):>7} {done:>4}')
+
+
+def bench_valuation(args):
+    print('\n== calculate_total_asset_value throughput ==')
+    print(f'{"assets":>8} {"cached/s":>10} {"cold/s":>10} {"peak KB":>9}')
+    for count in (10, 100, 1000):
+        backend, ex = make_backend(markets=max(args.markets, count + 10))
+        ex.random_balances(count)
+        backend.calculate_total_asset_value()  # warm the snapshot cache
+        n = 200
+        _, warm = measure(lambda: [backend.calculate_total_asset_value() for _ in range(n)])
+
+        def cold():
+            for _ in range(n // 10):
+                backend.invalidate_cache()
+                backend.calculate_total_asset_value()
+        _, cold_t = measure(cold)
+        peak = peak_memory(cold)
+        print(f'{count:>8} {n / warm:10.0f} {(n // 10) / cold_t:10.0f} {peak:9.0f}')
+
+
+def bench_scheduler(args):
+    print('\n== request scheduler under a tight weight budget ==')
+    backend, ex = make_backend(markets=args.markets, latency=args.latency, weight_limit=2000)
+    backend.scheduler.weight_limit = 2000
+    ex.random_balances(50)
+    symbols = [s for s in ex.markets if s.endswith('/USDT')][:50]
+    timings = {'poll': [], 'order': []}
+    errors = []
+
+    def poll():
+        for _ in range(20):
+            t = time.perf_counter()
+            try:
+                backend.api('fetch_tickers', symbols)
+                backend.api('fetch_balance')
+            except Exception as e:
+                errors.append(e)
+            timings['poll'].append(time.perf_counter() - t)
+
+    def order(base):
+        t = time.perf_counter()
+        try:
+            backend.api('create_market_sell_order', f'{base}/USDT', 0.0)
+        except Exception as e:
+            errors.append(e)
+        timings['order'].append(time.perf_counter() - t)
+
+    bases = [s.split('/')[0] for s in symbols]
+    threads = [threading.Thread(target=poll) for _ in range(8)]
+    threads += [threading.Thread(target=order, args=(b,)) for b in bases]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=120)
+    elapsed = time.perf_counter() - start
+    usage = backend.budget_usage()
+    for kind, values in timings.items():
+        values.sort()
+        if values:
+            print(f'{kind:>6}: n={len(values):<4} p50={values[len(values) // 2] * 1000:8.1f} ms  '
+                  f'max={values[-1] * 1000:8.1f} ms')
+    print(f'wall {elapsed:.2f}s, weight {usage["used_weight"]}/{usage["weight_limit"]}, '
+          f'coalesced={usage["coalesced"]}, throttled={usage["throttled"]}, errors={len(errors)}')
+
+
+def bench_stream(args):
+    try:
+        from mock_server import MockServer
+    except ImportError:
+        print('\n(aiohttp غير متوفر - تخطي قياس البث)')
+        return
+    print('\n== WebSocket stream: time until every watched symbol has a price ==')
+    print(f'{"symbols":>8} {"first s":>8} {"all s":>8}')
+    for count in (8, 50, 200):
+        backend, ex = make_backend(markets=args.markets)
+        server = MockServer(ex, push_interval=0.05).start()
+        backend.stream_url = server.stream_url
+        symbols = [s for s in ex.markets if s.endswith('/USDT')][:count]
+        backend.set_watch_symbols(symbols)
+        start = time.perf_counter()
+        backend.start_loop(mode='stream')
+        first = None
+        while time.perf_counter() - start < 10:
+            have = len(backend.latest_tickers())
+            if have and first is None:
+                first = time.perf_counter() - start
+            if have >= count:
+                break
+            time.sleep(0.005)
+        total = time.perf_counter() - start
+        backend.stop_loop()
+        server.stop()
+        print(f'{count:>8} {first or 0:8.3f} {total:8.3f}')
+
+
+def bench_async(args):
+    from async_backend import AsyncBackend
+    if not AsyncBackend.available():
+        print('\n(ccxt.async_support/aiohttp غير متوفر - تخطي قياس الواجهة غير المتزامنة)')
+        return
+    print('\n== account round: balance + all tickers + 4 order books (seconds) ==')
+    backend, ex = make_backend(markets=args.markets, latency=args.latency)
+    symbols = [s for s in ex.markets if s.endswith('/USDT')][:4]
+
+    def sync_round():
+        backend.invalidate_cache()
+        backend.get_balance()
+        backend.get_all_tickers()
+        for sym in symbols:
+            backend.api('fetch_order_book', sym, 100)
+
+    _, t_sync = measure(sync_round)
+    async_backend = attach_async(AsyncBackend(backend), ex)
+
+    async def async_round():
+        backend.invalidate_cache()
+        await asyncio.gather(async_backend.get_balance(), async_backend.get_all_tickers(),
+                             *(async_backend.api('fetch_order_book', sym, 100) for sym in symbols))
+
+    async_backend.start()
+    _, t_async = measure(lambda: async_backend.submit(async_round()).result())
+    total, t_value = measure(lambda: async_backend.submit(async_backend.calculate_total_asset_value()).result())
+    async_backend.stop()
+    print(f'{"sync":>8} {"async":>8} {"speedup":>8}')
+    print(f'{t_sync:8.3f} {t_async:8.3f} {t_sync / t_async:7.1f}x')
+    print(f'async valuation (cached snapshots): {t_value * 1000:.1f} ms, total={total}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--latency', type=float, default=0.02, help='simulated seconds per REST call')
+    parser.add_argument('--markets', type=int, default=3000, help='number of synthetic markets')
+    parser.add_argument('--stream', action='store_true', help='also benchmark the WebSocket feed')
+    parser.add_argument('--scheduler', action='store_true', help='also benchmark the request scheduler (may wait for the next minute)')
+    parser.add_argument('--async', dest='run_async', action='store_true', help='also benchmark AsyncBackend request overlap')
+    args = parser.parse_args()
+    bench_refresh(args)
+    bench_conversion(args)
+    bench_valuation(args)
+    if args.scheduler:
+        bench_scheduler(args)
+    if args.stream:
+        bench_stream(args)
+    if args.run_async:
+        bench_async(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""قياس محرك التداول الورقي (paper_trading.py) فوق المنصة الوهمية وبدونها.
+تقيس: عدد الأوامر الورقية في الثانية أثناء إعادة تشغيل أسعار بأقصى سرعة، إعادة تشغيل شموع CandleStore،
+وتحويل محفظة كاملة إلى USDT في وضع التداول الورقي الحي (بدون أي أمر يصل إلى المنصة).
+التشغيل: python benchmarks/bench_paper.py [--frames 20000] [--symbols 20]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+from binance_backend import Backend
+from candle_store import CandleStore
+from market_index import MarketIndex
+from mock_exchange import MockExchange, attach
+from paper_trading import PaperExchange, ReplayFeed
+
+
+def random_walk(symbols, start_prices, frames, seed=3):
+    rnd = random.Random(seed)
+    prices = dict(start_prices)
+    ts = 1_700_000_000_000
+    for _ in range(frames):
+        ts += 1000
+        for s in symbols:
+            prices[s] *= math.exp(rnd.gauss(0, 0.001))
+        yield ts, dict(prices), None, None
+
+
+def mean_reversion(paper, symbols, window=20):
+    """استراتيجية بسيطة للقياس: شراء بـ 20 USDT عند الهبوط تحت المتوسط، وأمر بيع محدد فوقه بـ 0.3%."""
+    history = {s: [] for s in symbols}
+
+    def on_frame(ts, prices, paper):
+        for s in symbols:
+            h = history[s]
+            h.append(prices[s])
+            if len(h) > window:
+                del h[0]
+            if len(h) < window or prices[s] > sum(h) / window * 0.998:
+                continue
+            if paper.free.get('USDT', 0.0) < 25:
+                continue
+            order = paper.create_order(s, 'market', 'buy', 20 / prices[s])
+            qty = order['filled'] * (1 - paper.fee)
+            paper.create_order(s, 'limit', 'sell', qty, prices[s] * 1.003)
+    return on_frame
+
+
+def bench_replay(frames, count):
+    ex = MockExchange(markets=200)
+    symbols = [s for s in ex.markets if s.endswith('/USDT')][:count]
+    paper = PaperExchange(MarketIndex.from_markets(ex.markets), {'USDT': 10000.0})
+    feed = ReplayFeed(random_walk(symbols, {s: ex.prices[s] for s in symbols}, frames))
+    start = time.perf_counter()
+    n = feed.run(paper, mean_reversion(paper, symbols))
+    elapsed = time.perf_counter() - start
+    orders = len(paper.orders)
+    print(f'replay: {n} frames x {len(symbols)} symbols in {elapsed:.2f}s '
+          f'({n / elapsed:,.0f} frames/s, {orders} orders, {orders / elapsed:,.0f} orders/s, {len(paper.trades)} fills)')
+    pnl = paper.pnl()
+    print(f'pnl: {pnl["pnl"]:.2f} USDT ({pnl["pnl_pct"]:.2f}%), fees {pnl["fees"].get("USDT", 0):.2f} USDT '
+          f'+ base-asset fees, {pnl["open_orders"]} limits still open')
+
+
+def bench_orders(count=50000):
+    ex = MockExchange(markets=10)
+    paper = PaperExchange(MarketIndex.from_markets(ex.markets), {'USDT': 1e9, 'BTC': 1e3})
+    paper.set_prices({'BTC/USDT': 60000.0})
+    start = time.perf_counter()
+    for i in range(count):
+        paper.create_order('BTC/USDT', 'market', 'buy' if i % 2 else 'sell', 0.5)
+    elapsed = time.perf_counter() - start
+    print(f'market orders: {count / elapsed:,.0f}/s ({elapsed / count * 1e6:.1f} us each, 0.5 BTC walks the synthetic book)')
+
+
+def bench_candles(count):
+    backend = Backend()
+    ex = MockExchange(markets=50)
+    attach(backend, ex)
+    symbols = ['BTC/USDT', 'ETH/USDT', 'BNB/USDT'][:count]
+    with tempfile.TemporaryDirectory() as root:
+        backend.candles = store = CandleStore(backend, root=root)
+        since = int(time.time() * 1000) - 3 * 86400 * 1000
+        for s in symbols:
+            store.sync(s, '1m', since=since)
+        paper = PaperExchange(backend.market_index, {'USDT': 10000.0})
+        start = time.perf_counter()
+        n = ReplayFeed.from_candles(store, symbols, '1m').run(paper, mean_reversion(paper, symbols))
+        elapsed = time.perf_counter() - start
+    print(f'candles: {n} bars x {len(symbols)} symbols in {elapsed:.2f}s, {len(paper.orders)} orders, '
+          f'pnl {paper.pnl()["pnl"]:.2f} USDT')
+
+
+def bench_live_convert():
+    backend = Backend()
+    ex = MockExchange(markets=300)
+    attach(backend, ex)
+    balances = ex.random_balances(40)
+    backend.update_tickers({s: ex.prices[s] for s in ex.markets})
+    paper = backend.enable_paper_trading(balances)
+    start = time.perf_counter()
+    ok, summary = backend.convert_to_usdt(min_value_threshold=1)
+    elapsed = time.perf_counter() - start
+    assert ok, summary
+    assert not ex.calls.get('create_order'), 'paper mode must not reach the exchange'
+    left = [a for a, v in paper.fetch_balance()['total'].items() if a != 'USDT' and v > 1e-6]
+    print(f'paper convert: {len(balances) - 1} assets in {elapsed:.2f}s, USDT {paper.free.get("USDT", 0):.2f}, '
+          f'{len(paper.trades)} fills, lot-size dust left in {len(left)} assets, fees {paper.fees_paid.get("USDT", 0):.4f} USDT')
+    print('pnl:', backend.disable_paper_trading())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=20000)
+    parser.add_argument('--symbols', type=int, default=20)
+    args = parser.parse_args()
+    bench_orders()
+    bench_replay(args.frames, args.symbols)
+    bench_candles(3)
+    bench_live_convert()
@@ -0,0 +1,111 @@
+"""فحص خصائص وقياس أداء quantize.Quantizer مقابل الدوال السابقة (get_symbol_precision + format_quantity بـ Decimal).
+التشغيل: python benchmarks/bench_quantize.py [عدد الحالات العشوائية]
+يتوقف بخطأ AssertionError عند أول اختلاف.
+"""
+import os
+import random
+import sys
+import timeit
+from decimal import Decimal, ROUND_DOWN
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from market_index import precision_of
+from quantize import Quantizer, for_precision
+
+# every LOT_SIZE / PRICE_FILTER step shape seen on Binance spot, plus non power-of-ten ones
+POW10_STEPS = ['100000', '10000', '1000', '100', '10', '1'] + ['0.' + '0' * i + '1' for i in range(8)]
+OTHER_STEPS = ['0.5', '5', '0.25', '0.00002', '0.0005', '2.5', '0.00000005', '50']
+
+
+def legacy_precision(step):
+    # get_symbol_precision before the market index: string-split the min amount
+    s = str(step)
+    if '.' in s:
+        return len(s.split('.')[1].rstrip('0'))
+    return 0
+
+
+def legacy_format(quantity, precision):
+    # Backend.format_quantity before quantize.py
+    quantity = Decimal(str(quantity)).quantize(Decimal(1).scaleb(-precision), rounding=ROUND_DOWN)
+    formatted = f'{{:.{precision}f}}'.format(quantity)
+    if '.' in formatted:
+        formatted = formatted.rstrip('0').rstrip('.')
+    return formatted
+
+
+def random_amount(rnd):
+    kind = rnd.random()
+    if kind < 0.3:
+        return rnd.uniform(0, 10 ** rnd.randint(-9, 7))
+    if kind < 0.5:
+        # exact decimals with trailing digits right at the step boundary
+        return float(f'{rnd.randint(0, 10 ** 9)}e-{rnd.randint(0, 12)}')
+    if kind < 0.6:
+        return rnd.randint(0, 10 ** 6)
+    if kind < 0.7:
+        return Decimal(str(rnd.uniform(0, 1000))) + Decimal('1e-12')
+    if kind < 0.8:
+        return f'{rnd.uniform(0, 1000):.12f}'
+    return rnd.uniform(0, 1e-6)
+
+
+def check(cases, seed=7):
+    rnd = random.Random(seed)
+    for step in POW10_STEPS:
+        if Decimal(step) > 1:
+            continue  # the old helper truncated to whole units only, not to multiples of 10/100/...
+        q = Quantizer.from_step(step)
+        precision = precision_of(Decimal(step))
+        # the old path only ever saw float(min_amount); '1e-05' style reprs made it return 0, a known bug
+        if 'e' not in str(float(step)):
+            assert precision == legacy_precision(float(step)), step
+        assert q.scale == precision, step
+        for _ in range(cases):
+            x = random_amount(rnd)
+            assert q.format(x) == legacy_format(x, precision), (step, x, q.format(x), legacy_format(x, precision))
+    for step in POW10_STEPS + OTHER_STEPS:
+        q = Quantizer.from_step(step)
+        s = Decimal(step)
+        for _ in range(cases):
+            x = random_amount(rnd)
+            exact = Decimal(repr(x) if isinstance(x, float) else str(x))
+            down = Decimal(q.format(x))
+            up = Decimal(q.wire(q.ceil(x)))
+            assert down % s == 0 and up % s == 0, (step, x)
+            assert down <= exact < down + s, (step, x, down)
+            assert up - s < exact <= up, (step, x, up)
+            assert q.format(q.format(x)) == q.format(x), (step, x)
+    # precision-only quantizers are shared and agree with the old helper at every precision
+    for p in range(13):
+        assert for_precision(p) is for_precision(p)
+        for _ in range(cases // 10 or 1):
+            x = random_amount(rnd)
+            assert for_precision(p).format(x) == legacy_format(x, p), (p, x)
+    print(f'ok: {len(POW10_STEPS) + len(OTHER_STEPS)} steps x {cases} amounts')
+
+
+def bench(number=20000):
+    rnd = random.Random(1)
+    amounts = [rnd.uniform(0, 5000) for _ in range(1000)]
+    step = '0.00100000'
+    q = Quantizer.from_step(step)
+
+    def legacy():
+        for x in amounts:
+            legacy_format(x, legacy_precision(float(step)))
+
+    def fast():
+        for x in amounts:
+            q.format(x)
+
+    loops = max(1, number // len(amounts))
+    t_legacy = min(timeit.repeat(legacy, number=loops, repeat=5)) / (loops * len(amounts))
+    t_fast = min(timeit.repeat(fast, number=loops, repeat=5)) / (loops * len(amounts))
+    print(f'{"legacy us":>10} {"quantize us":>12} {"speedup":>8}')
+    print(f'{t_legacy * 1e6:10.3f} {t_fast * 1e6:12.3f} {t_legacy / t_fast:7.1f}x')
+
+
+if __name__ == '__main__':
+    check(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
+    bench()
@@ -0,0 +1,84 @@
+"""قياس زمن بدء التشغيل البارد لطبقة Backend (بدون Kivy).
+تقيس: زمن استيراد binance_backend و async_backend في عملية جديدة وهل سُحب ccxt/aiohttp معهما،
+كلفة استيراد ccxt نفسه (المؤجلة الآن إلى خيط التهيئة)، ومراحل start_background_init فوق المنصة الوهمية
+مع ملف أسواق محلي مقارنة بتحميل الأسواق من الشبكة.
+التشغيل: python benchmarks/bench_startup.py [--latency 0.8] [--markets 2000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+PROBE = '''
+import json, sys, time
+t = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t
+print(json.dumps({{'seconds': elapsed, 'ccxt': 'ccxt' in sys.modules, 'aiohttp': 'aiohttp' in sys.modules}}))
+'''
+
+
+def cold_import(module):
+    """زمن استيراد module في مفسر جديد (بعد تحميل أي وحدات Python أساسية)."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, os.environ.get('PYTHONPATH', '')]))
+    out = subprocess.run([sys.executable, '-c', PROBE.format(module=module)], capture_output=True, text=True,
+                         env=env, cwd=ROOT)
+    if out.returncode:
+        return None
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def bench_imports():
+    print(f'{"module":>16} {"import ms":>10} {"ccxt":>6} {"aiohttp":>8}')
+    for module in ('binance_backend', 'async_backend', 'ccxt', 'aiohttp'):
+        r = cold_import(module)
+        if r is None:
+            print(f'{module:>16} {"n/a":>10}')
+            continue
+        print(f'{module:>16} {r["seconds"] * 1000:10.1f} {str(r["ccxt"]):>6} {str(r["aiohttp"]):>8}')
+
+
+def bench_background_init(latency, markets):
+    from binance_backend import Backend
+    from market_index import MarketIndex
+    from mock_exchange import MockExchange
+
+    print(f'\n== start_background_init: load_markets latency {latency}s, {markets} markets ==')
+    with tempfile.TemporaryDirectory() as root:
+        cache = os.path.join(root, 'markets_cache.json')
+        for label, cached in (('no cache', False), ('cached file', True)):
+            ex = MockExchange(markets=markets, latency=latency)
+            if cached:
+                MarketIndex.from_markets(ex.markets).save(cache)
+            elif os.path.exists(cache):
+                os.remove(cache)
+            backend = Backend()
+            backend.exchange = ex  # stands in for ccxt.binance; ensure_exchange keeps it
+            backend.markets_cache_path = cache
+            listed = []
+            start = time.perf_counter()
+            backend.started_at = start
+            backend.start_background_init(on_markets=lambda: listed.append(time.perf_counter() - start))
+            returned = time.perf_counter() - start
+            backend.ready.wait(30)
+            total = time.perf_counter() - start
+            print(f'{label:>12}: returns in {returned * 1000:.1f} ms, coin list after {listed[0] * 1000:.1f} ms, '
+                  f'done after {total * 1000:.1f} ms, {len(backend.usdt_symbols())} USDT pairs')
+            print(' ' * 14 + ', '.join(f'{k} {v * 1000:.1f}ms' for k, v in backend.startup_times.items()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=0.8)
+    parser.add_argument('--markets', type=int, default=2000)
+    args = parser.parse_args()
+    bench_imports()
+    bench_background_init(args.latency, args.markets)
@@ -0,0 +1,53 @@
+"""قياس كلفة التسجيل على الخيط المرسل: Backend.log السابق (strftime + f-string) مقابل telemetry.Telemetry.
+التشغيل: python benchmarks/bench_telemetry.py [عدد الأحداث]
+"""
+import os
+import sys
+import tempfile
+import time
+import timeit
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from telemetry import Telemetry, DEBUG
+
+ORDER = {'id': '123456', 'symbol': 'BTC/USDT', 'side': 'sell', 'type': 'market', 'status': 'closed',
+         'amount': 0.5, 'filled': 0.5, 'remaining': 0.0, 'average': 60044.03, 'price': 60044.03,
+         'cost': 30022.01, 'fee': {'currency': 'USDT', 'cost': 30.02}, 'info': {'fills': [{'qty': '0.5'}] * 5}}
+
+
+def run(n):
+    legacy = deque(maxlen=2000)
+
+    def legacy_log():
+        ts = time.strftime('%H:%M:%S')
+        legacy.append(f'[{ts}] أمر مُرسل: {ORDER}')
+
+    t = Telemetry()
+    quiet = Telemetry(level=DEBUG + 20)
+
+    cases = [
+        ('legacy f-string', legacy_log),
+        ('lazy event', lambda: t.log(20, 'أمر مُرسل: {}', ORDER)),
+        ('below level', lambda: quiet.log(DEBUG, 'أمر مُرسل: {}', ORDER)),
+        ('latency observe', lambda: t.observe('create_order', 0.012)),
+    ]
+    print(f'{"case":>16} {"us/event":>9}')
+    for name, fn in cases:
+        per = min(timeit.repeat(fn, number=n, repeat=5)) / n
+        print(f'{name:>16} {per * 1e6:9.3f}')
+
+    with tempfile.TemporaryDirectory() as d:
+        sink = t.open_sink(os.path.join(d, 'telemetry.jsonl'))
+        start = time.perf_counter()
+        for _ in range(n):
+            t.log(20, 'أمر مُرسل: {}', ORDER)
+        producer = time.perf_counter() - start
+        t.close_sink()
+        total = time.perf_counter() - start
+        print(f'sink: {n} events, producer {producer / n * 1e6:.2f} us/event, '
+              f'drained in {total:.2f}s, written={sink.written} dropped={sink.dropped}')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,65 @@
+"""قياس أداء حساب قيمة المحفظة: التنفيذ السابق (حلقة Decimal) مقابل PortfolioValuator.
+التشغيل: python benchmarks/bench_valuation.py [عدد الأصول...]
+"""
+import os
+import random
+import sys
+import timeit
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from valuation import PortfolioValuator, np
+
+
+def legacy_total(totals, tickers, banned=()):
+    # the per-asset Decimal loop calculate_total_asset_value used before the valuation engine
+    total = Decimal('0')
+    for asset, info in totals.items():
+        if asset in banned:
+            continue
+        amt = Decimal(str(info or 0))
+        if amt <= 0:
+            continue
+        if asset == 'USDT':
+            total += amt
+        else:
+            price = tickers.get(f'{asset}/USDT', {}).get('last')
+            if price is None:
+                price = tickers.get(asset + 'USDT', {}).get('last')
+            if price:
+                total += amt * Decimal(str(price))
+    return total
+
+
+def synthetic(n, seed=1):
+    rnd = random.Random(seed)
+    totals = {'USDT': 1000.0}
+    tickers = {}
+    for i in range(n):
+        asset = f'A{i}'
+        totals[asset] = rnd.choice([0, rnd.uniform(0.001, 5000)])
+        tickers[f'{asset}/USDT'] = {'last': rnd.uniform(0.0001, 60000)}
+    return totals, tickers
+
+
+def run(sizes, repeat=5):
+    print(f'numpy: {"yes" if np is not None else "no"}')
+    print(f'{"assets":>8} {"legacy ms":>10} {"python ms":>10} {"numpy ms":>10} {"rel diff":>10}')
+    for n in sizes:
+        totals, tickers = synthetic(n)
+        py = PortfolioValuator(use_numpy=False)
+        fast = PortfolioValuator()
+        number = max(1, 2000 // n)
+        t_legacy = min(timeit.repeat(lambda: legacy_total(totals, tickers), number=number, repeat=repeat)) / number
+        t_py = min(timeit.repeat(lambda: py.value(totals, tickers), number=number, repeat=repeat)) / number
+        t_np = None
+        if fast.use_numpy:
+            t_np = min(timeit.repeat(lambda: fast.value(totals, tickers), number=number, repeat=repeat)) / number
+        expected = float(legacy_total(totals, tickers))
+        diff = abs(py.value(totals, tickers).total - expected) / (expected or 1)
+        np_ms = f'{t_np * 1000:10.3f}' if t_np is not None else f'{"-":>10}'
+        print(f'{n:>8} {t_legacy * 1000:10.3f} {t_py * 1000:10.3f} {np_ms} {diff:10.1e}')
+
+
+if __name__ == '__main__':
+    run([int(a) for a in sys.argv[1:]] or [10, 100, 1000, 5000])
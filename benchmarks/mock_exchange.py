@@ -0,0 +1,373 @@
+"""منصة وهمية محلية متوافقة مع واجهة ccxt المستخدمة في Backend، لقياس الأداء بدون اتصال بـ Binance.
+ملاحظات:
+- آلاف الأسواق الاصطناعية مع تأخير قابل للضبط وحد لمعدل الطلبات وأخطاء عشوائية.
+- أوزان الطلبات تُحتسب مثل Binance وتظهر في last_response_headers (x-mbx-used-weight-1m).
+- attach(backend, exchange) يربط المنصة الوهمية بكائن Backend جاهزاً للاستخدام،
+  وattach_async يربطها بـ AsyncBackend عبر غلاف غير متزامن (مثل ccxt.async_support).
+"""
+import asyncio
+import itertools
+import random
+import threading
+import time
+
+try:
+    from ccxt import NetworkError, RateLimitExceeded, InsufficientFunds, OrderNotFound, BadSymbol
+except ImportError:
+    class NetworkError(Exception):
+        pass
+
+    class RateLimitExceeded(NetworkError):
+        pass
+
+    class InsufficientFunds(Exception):
+        pass
+
+    class OrderNotFound(Exception):
+        pass
+
+    class BadSymbol(Exception):
+        pass
+
+QUOTES = ('USDT', 'BTC', 'ETH', 'BNB')
+
+# Binance spot request weights for the endpoints the backend uses
+WEIGHTS = {
+    'fetch_ticker': 2,
+    'fetch_tickers': 80,  # without symbols; scaled down for symbol lists below
+    'fetch_balance': 20,
+    'fetch_open_orders': 80,
+    'cancel_order': 1,
+    'cancel_all_orders': 1,
+    'create_order': 1,
+    'fetch_order': 4,
+    'fetch_ohlcv': 2,
+    'fetch_order_book': 5,
+    'withdraw': 1,
+    'load_markets': 20,
+}
+
+
+def tickers_weight(count):
+    if count is None or count > 100:
+        return 80
+    if count > 20:
+        return 40
+    return 2
+
+
+class MockExchange:
+    def __init__(self, markets=1000, latency=0.0, jitter=0.0, rate_limit=None, weight_limit=6000,
+                 error_rate=0.0, fee=0.001, seed=1, balances=None, book_notional=2000.0):
+        self.id = 'binance'
+        self.has = {'cancelAllOrders': True, 'fetchOHLCV': True, 'fetchOrderBook': True}
+        self.rnd = random.Random(seed)
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit  # max calls per second, None = unlimited
+        self.weight_limit = weight_limit  # per minute, like Binance REQUEST_WEIGHT
+        self.error_rate = error_rate
+        self.fee = fee
+        self.markets = self._make_markets(markets)
+        self.prices = self._make_prices()
+        self.balances = dict(balances or {'USDT': 1000.0})
+        self.open_orders = {}
+        self.book_notional = book_notional  # quote value resting on the first book level
+        self.book_update_id = 0
+        self.calls = {}
+        self.last_response_headers = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._call_times = []
+        self._weight_window = []  # (timestamp, weight)
+
+    # --- synthetic market data -------------------------------------------------
+    def _make_markets(self, n):
+        markets = {}
+
+        def add(base, quote, step, min_notional):
+            symbol = f'{base}/{quote}'
+            markets[symbol] = {
+                'id': base + quote, 'symbol': symbol, 'base': base, 'quote': quote,
+                'active': True, 'spot': True,
+                'limits': {'amount': {'min': step}, 'cost': {'min': min_notional}},
+                'info': {'filters': [
+                    {'filterType': 'LOT_SIZE', 'stepSize': f'{step:.8f}', 'minQty': f'{step:.8f}'},
+                    {'filterType': 'NOTIONAL', 'minNotional': f'{min_notional:.8f}'},
+                    {'filterType': 'PRICE_FILTER', 'tickSize': '0.00000001'},
+                ]},
+            }
+
+        for base in ('BTC', 'ETH', 'BNB'):
+            add(base, 'USDT', 0.00001, 5)
+        add('ETH', 'BTC', 0.0001, 0.0001)
+        add('BNB', 'BTC', 0.001, 0.0001)
+        steps = (1, 0.1, 0.01, 0.001, 0.0001, 0.00001)
+        for i in range(max(0, n - len(markets))):
+            base = f'C{i}'
+            quote = QUOTES[i % len(QUOTES)] if i % 5 else 'USDT'
+            add(base, quote, self.rnd.choice(steps), 5 if quote == 'USDT' else 0.0001)
+        return markets
+
+    def _make_prices(self):
+        prices = {'BTC/USDT': 60000.0, 'ETH/USDT': 3000.0, 'BNB/USDT': 500.0, 'ETH/BTC': 0.05, 'BNB/BTC': 0.0083}
+        for sym, m in self.markets.items():
+            if sym not in prices:
+                usd = 10 ** self.rnd.uniform(-4, 3)
+                quote_usd = 1.0 if m['quote'] == 'USDT' else prices[m['quote'] + '/USDT']
+                prices[sym] = usd / quote_usd
+        return prices
+
+    def random_balances(self, count, usd_each=(10, 500)):
+        """أرصدة عشوائية لـ count أصل (قيمة كل منها بين حدي usd_each بالدولار)."""
+        bases = [m['base'] for m in self.markets.values() if m['base'].startswith('C')][:count]
+        for base in bases:
+            sym = next(s for s, m in self.markets.items() if m['base'] == base)
+            usd_price = self.prices[sym] * (1.0 if self.markets[sym]['quote'] == 'USDT'
+                                            else self.prices[self.markets[sym]['quote'] + '/USDT'])
+            self.balances[base] = self.rnd.uniform(*usd_each) / usd_price
+        return self.balances
+
+    # --- request accounting ----------------------------------------------------
+    def _call(self, name, weight=None):
+        weight = WEIGHTS.get(name, 1) if weight is None else weight
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            now = time.monotonic()
+            if self.rate_limit:
+                self._call_times = [t for t in self._call_times if now - t < 1.0]
+                if len(self._call_times) >= self.rate_limit:
+                    raise RateLimitExceeded(f'binance 429 Too Many Requests ({name})')
+                self._call_times.append(now)
+            self._weight_window = [(t, w) for t, w in self._weight_window if now - t < 60]
+            used = sum(w for _, w in self._weight_window) + weight
+            if self.weight_limit and used > self.weight_limit:
+                raise RateLimitExceeded(f'binance 429 request weight {used} > {self.weight_limit}')
+            self._weight_window.append((now, weight))
+            self.last_response_headers = {'x-mbx-used-weight-1m': str(used), 'x-mbx-used-weight': str(used)}
+            fail = self.error_rate and self.rnd.random() < self.error_rate
+        delay = self.latency + (self.rnd.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise NetworkError(f'binance simulated network error ({name})')
+
+    def _ticker(self, sym):
+        p = self.prices[sym] * (1 + self.rnd.uniform(-0.001, 0.001))
+        self.prices[sym] = p
+        spread = p * 0.0005
+        return {'symbol': sym, 'last': p, 'close': p, 'bid': p - spread, 'ask': p + spread,
+                'timestamp': int(time.time() * 1000)}
+
+    # --- ccxt-compatible API ---------------------------------------------------
+    def load_markets(self, reload=False, params=None):
+        self._call('load_markets')
+        return self.markets
+
+    def fetch_ticker(self, symbol, params=None):
+        self._call('fetch_ticker')
+        if symbol not in self.markets:
+            raise BadSymbol(f'binance does not have market symbol {symbol}')
+        return self._ticker(symbol)
+
+    def fetch_tickers(self, symbols=None, params=None):
+        self._call('fetch_tickers', tickers_weight(len(symbols) if symbols else None))
+        # like ccxt's market_symbols(): one unknown symbol rejects the whole request
+        for s in symbols or ():
+            if s not in self.markets:
+                raise BadSymbol(f'binance does not have market symbol {s}')
+        wanted = symbols if symbols else self.markets.keys()
+        return {s: self._ticker(s) for s in wanted}
+
+    def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=500, params=None):
+        self._call('fetch_ohlcv')
+        units = {'m': 60000, 'h': 3600000, 'd': 86400000}
+        step = int(timeframe[:-1]) * units[timeframe[-1]]
+        now = int(time.time() * 1000)
+        # first bar opening at or after `since`, aligned to the timeframe
+        start = -(-since // step) * step if since is not None else (now - limit * step) // step * step
+        rows = []
+        price = self.prices[symbol]
+        rnd = random.Random(hash((symbol, start)))
+        for ts in range(start, now + 1, step):
+            if len(rows) >= limit:
+                break
+            o = price
+            c = o * (1 + rnd.uniform(-0.002, 0.002))
+            rows.append([ts, o, max(o, c) * 1.001, min(o, c) * 0.999, c, rnd.uniform(1, 100)])
+            price = c
+        return rows
+
+    def fetch_order_book(self, symbol, limit=100, params=None):
+        self._call('fetch_order_book')
+        if symbol not in self.markets:
+            raise BadSymbol(f'binance does not have market symbol {symbol}')
+        t = self._ticker(symbol)
+        with self._lock:
+            self.book_update_id += 1
+            nonce = self.book_update_id
+        # levels 0.05% apart with depth growing away from the touch
+        qty = self.book_notional / t['last']
+        bids = [[t['bid'] * (1 - 0.0005 * i), qty * (1 + i)] for i in range(limit)]
+        asks = [[t['ask'] * (1 + 0.0005 * i), qty * (1 + i)] for i in range(limit)]
+        return {'symbol': symbol, 'bids': bids, 'asks': asks, 'nonce': nonce,
+                'timestamp': t['timestamp']}
+
+    def fetch_balance(self, params=None):
+        self._call('fetch_balance')
+        with self._lock:
+            free = {a: v for a, v in self.balances.items() if v > 0}
+        used = {}
+        for o in self.open_orders.values():
+            used[o['base']] = used.get(o['base'], 0) + o['remaining']
+        total = {a: free.get(a, 0) + used.get(a, 0) for a in set(free) | set(used)}
+        return {'free': free, 'used': used, 'total': total}
+
+    def fetch_open_orders(self, symbol=None, since=None, limit=None, params=None):
+        self._call('fetch_open_orders', 6 if symbol else 80)
+        return [dict(o) for o in self.open_orders.values() if symbol is None or o['symbol'] == symbol]
+
+    def fetch_order(self, id, symbol=None, params=None):
+        self._call('fetch_order')
+        o = self.open_orders.get(id)
+        if o is None:
+            return {'id': id, 'symbol': symbol, 'status': 'canceled'}
+        return dict(o)
+
+    def cancel_order(self, id, symbol=None, params=None):
+        self._call('cancel_order')
+        with self._lock:
+            o = self.open_orders.pop(id, None)
+            if o is None:
+                raise OrderNotFound(f'binance order {id} not found')
+            self.balances[o['base']] = self.balances.get(o['base'], 0) + o['remaining']
+        o['status'] = 'canceled'
+        return o
+
+    def cancel_all_orders(self, symbol=None, params=None):
+        self._call('cancel_all_orders')
+        ids = [i for i, o in self.open_orders.items() if symbol is None or o['symbol'] == symbol]
+        out = []
+        for i in ids:
+            with self._lock:
+                o = self.open_orders.pop(i, None)
+                if o is None:
+                    continue
+                self.balances[o['base']] = self.balances.get(o['base'], 0) + o['remaining']
+            o['status'] = 'canceled'
+            out.append(o)
+        return out
+
+    def place_resting_orders(self, count):
+        """إنشاء أوامر محددة معلقة (بيع بسعر بعيد) لاختبار الإلغاء."""
+        symbols = [s for s in self.markets if s.startswith('C')][:max(1, count // 2)]
+        for i in range(count):
+            sym = symbols[i % len(symbols)]
+            oid = str(next(self._ids))
+            self.open_orders[oid] = {'id': oid, 'symbol': sym, 'base': self.markets[sym]['base'], 'side': 'sell',
+                                     'type': 'limit', 'price': self.prices[sym] * 10, 'amount': 1.0,
+                                     'remaining': 1.0, 'filled': 0.0, 'status': 'open'}
+        return len(self.open_orders)
+
+    def create_order(self, symbol, type, side, amount, price=None, params=None):
+        self._call('create_order')
+        # ccxt takes numbers or exact decimal strings for amount and price
+        amount = float(amount)
+        price = float(price) if price is not None else None
+        m = self.markets.get(symbol)
+        if m is None:
+            raise BadSymbol(f'binance does not have market symbol {symbol}')
+        base, quote = m['base'], m['quote']
+        oid = str(next(self._ids))
+        with self._lock:
+            if type == 'limit':
+                if side == 'sell' and self.balances.get(base, 0) < amount:
+                    raise InsufficientFunds(f'binance Account has insufficient balance for {base}')
+                if side == 'sell':
+                    self.balances[base] -= amount
+                order = {'id': oid, 'symbol': symbol, 'base': base, 'side': side, 'type': type, 'price': price,
+                         'amount': amount, 'remaining': amount, 'filled': 0.0, 'status': 'open'}
+                self.open_orders[oid] = order
+                return dict(order)
+            t = self._ticker(symbol)
+            fill_price = t['bid'] if side == 'sell' else t['ask']
+            if side == 'sell':
+                if self.balances.get(base, 0) + 1e-12 < amount:
+                    raise InsufficientFunds(f'binance Account has insufficient balance for {base}')
+                cost = amount * fill_price
+                fee = cost * self.fee
+                self.balances[base] = self.balances.get(base, 0) - amount
+                self.balances[quote] = self.balances.get(quote, 0) + cost - fee
+                fee_currency = quote
+            else:
+                cost = amount * fill_price
+                if self.balances.get(quote, 0) + 1e-12 < cost:
+                    raise InsufficientFunds(f'binance Account has insufficient balance for {quote}')
+                fee = amount * self.fee
+                self.balances[quote] -= cost
+                self.balances[base] = self.balances.get(base, 0) + amount - fee
+                fee_currency = base
+        return {'id': oid, 'symbol': symbol, 'side': side, 'type': type, 'status': 'closed', 'amount': amount,
+                'filled': amount, 'remaining': 0.0, 'average': fill_price, 'price': fill_price, 'cost': cost,
+                'fee': {'currency': fee_currency, 'cost': fee}}
+
+    def create_market_order(self, symbol, side, amount, price=None, params=None):
+        return self.create_order(symbol, 'market', side, amount, price, params)
+
+    def create_market_sell_order(self, symbol, amount, params=None):
+        return self.create_order(symbol, 'market', 'sell', amount, None, params)
+
+    def create_market_buy_order(self, symbol, amount, params=None):
+        return self.create_order(symbol, 'market', 'buy', amount, None, params)
+
+    def create_limit_order(self, symbol, side, amount, price, params=None):
+        return self.create_order(symbol, 'limit', side, amount, price, params)
+
+    def withdraw(self, code, amount, address, tag=None, params=None):
+        self._call('withdraw')
+        with self._lock:
+            if self.balances.get(code, 0) < amount:
+                raise InsufficientFunds(f'binance insufficient {code} to withdraw')
+            self.balances[code] -= amount
+        return {'id': str(next(self._ids)), 'currency': code, 'amount': amount, 'address': address, 'status': 'ok'}
+
+
+def attach(backend, exchange):
+    """ربط منصة وهمية بـ Backend بدلاً من ccxt.binance (بدون ملف كاش للأسواق)."""
+    from market_index import MarketIndex
+    backend.exchange = exchange
+    backend.markets_cache_path = None
+    backend.markets = exchange.markets
+    backend.market_index = MarketIndex.from_markets(exchange.markets)
+    backend.invalidate_cache()
+    return backend
+
+
+class AsyncMockExchange:
+    """غلاف غير متزامن لـ MockExchange: التأخير عبر asyncio.sleep فتتداخل الطلبات على حلقة واحدة.
+    ينقل تأخير المنصة الأصلية إليه (ويصفّره فيها) حتى لا يُحجز خيط الحلقة."""
+
+    def __init__(self, exchange, latency=None):
+        self.exchange = exchange
+        self.latency = exchange.latency if latency is None else latency
+        exchange.latency = 0.0
+
+    def __getattr__(self, name):
+        attr = getattr(self.exchange, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return attr(*args, **kwargs)
+        return call
+
+    async def close(self):
+        pass
+
+
+def attach_async(async_backend, exchange, latency=None):
+    """ربط منصة وهمية بـ AsyncBackend (يُفترض أن Backend الخاص به مربوط بها عبر attach)."""
+    async_backend.exchange = AsyncMockExchange(exchange, latency)
+    return async_backend
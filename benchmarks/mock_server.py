@@ -0,0 +1,113 @@
+"""خادم HTTP/WebSocket محلي اختياري فوق MockExchange (يحتاج aiohttp).
+- WebSocket على /stream بصيغة combined streams من Binance (miniTicker/bookTicker) مع دعم SUBSCRIBE/UNSUBSCRIBE،
+  ليعمل معه PriceStream عبر Backend.stream_url.
+- REST: /api/v3/ticker/price و /api/v3/ticker/24hr بنفس شكل ردود Binance.
+"""
+import asyncio
+import json
+import threading
+
+from aiohttp import web
+
+
+class MockServer:
+    def __init__(self, exchange, host='127.0.0.1', port=0, push_interval=0.1):
+        self.exchange = exchange
+        self.host = host
+        self.port = port
+        self.push_interval = push_interval
+        self.connections = 0
+        self._loop = None
+        self._runner = None
+        self._ready = threading.Event()
+        self._by_id = {m['id']: s for s, m in exchange.markets.items()}
+
+    @property
+    def stream_url(self):
+        return f'ws://{self.host}:{self.port}/stream'
+
+    @property
+    def rest_url(self):
+        return f'http://{self.host}:{self.port}'
+
+    def start(self):
+        threading.Thread(target=self._thread_main, daemon=True).start()
+        self._ready.wait(10)
+        return self
+
+    def stop(self):
+        if self._loop and self._runner:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(10)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def _thread_main(self):
+        loop = self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        app = web.Application()
+        app.router.add_get('/stream', self._ws_handler)
+        app.router.add_get('/api/v3/ticker/price', self._price)
+        app.router.add_get('/api/v3/ticker/24hr', self._ticker_24hr)
+        self._runner = web.AppRunner(app)
+        loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, self.host, self.port)
+        loop.run_until_complete(site.start())
+        if not self.port:
+            self.port = site._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        loop.run_forever()
+
+    def _symbols(self, request):
+        raw = request.query.get('symbols') or (json.dumps([request.query['symbol']]) if 'symbol' in request.query else None)
+        if not raw:
+            return list(self.exchange.markets)
+        return [self._by_id[i] for i in json.loads(raw) if i in self._by_id]
+
+    async def _price(self, request):
+        rows = [{'symbol': self.exchange.markets[s]['id'], 'price': f"{self.exchange._ticker(s)['last']:.8f}"}
+                for s in self._symbols(request)]
+        return web.json_response(rows[0] if 'symbol' in request.query and rows else rows)
+
+    async def _ticker_24hr(self, request):
+        rows = []
+        for s in self._symbols(request):
+            t = self.exchange._ticker(s)
+            rows.append({'symbol': self.exchange.markets[s]['id'], 'lastPrice': f"{t['last']:.8f}",
+                         'bidPrice': f"{t['bid']:.8f}", 'askPrice': f"{t['ask']:.8f}", 'closeTime': t['timestamp']})
+        return web.json_response(rows[0] if 'symbol' in request.query and rows else rows)
+
+    async def _ws_handler(self, request):
+        ws = web.WebSocketResponse(heartbeat=20)
+        await ws.prepare(request)
+        self.connections += 1
+        streams = set(filter(None, request.query.get('streams', '').split('/')))
+
+        async def pusher():
+            while not ws.closed:
+                for name in list(streams):
+                    sid, _, channel = name.partition('@')
+                    sym = self._by_id.get(sid.upper())
+                    if sym is None:
+                        continue
+                    t = self.exchange._ticker(sym)
+                    if channel == 'bookTicker':
+                        data = {'s': sid.upper(), 'b': f"{t['bid']:.8f}", 'a': f"{t['ask']:.8f}"}
+                    else:
+                        data = {'e': '24hrMiniTicker', 'E': t['timestamp'], 's': sid.upper(), 'c': f"{t['last']:.8f}"}
+                    await ws.send_str(json.dumps({'stream': name, 'data': data}))
+                await asyncio.sleep(self.push_interval)
+
+        task = asyncio.ensure_future(pusher())
+        try:
+            async for msg in ws:
+                if msg.type != web.WSMsgType.TEXT:
+                    continue
+                req = json.loads(msg.data)
+                params = set(req.get('params') or [])
+                if req.get('method') == 'SUBSCRIBE':
+                    streams |= params
+                elif req.get('method') == 'UNSUBSCRIBE':
+                    streams -= params
+                await ws.send_str(json.dumps({'result': None, 'id': req.get('id')}))
+        finally:
+            task.cancel()
+        return ws
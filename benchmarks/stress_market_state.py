@@ -0,0 +1,91 @@
+"""اختبار ضغط لمخزن حالة السوق: عدة خيوط كتابة وقراءة في نفس الوقت مع التحقق من الاتساق.
+التشغيل: python benchmarks/stress_market_state.py [writers] [readers] [seconds]
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from market_state import MarketStateStore, LogBuffer
+
+
+def run(writers=8, readers=8, seconds=3.0, symbols=200):
+    store = MarketStateStore()
+    logs = LogBuffer(maxlen=10 ** 7)
+    stop = threading.Event()
+    errors = []
+    counts = {'publish': 0, 'read': 0, 'logged': 0}
+    lock = threading.Lock()
+
+    def writer(w):
+        # each writer owns a slice of symbols and publishes strictly increasing prices
+        own = [f'S{i}/USDT' for i in range(w, symbols, writers)]
+        n = 0
+        while not stop.is_set():
+            n += 1
+            store.publish({sym: n for sym in own})
+            logs.append((w, n))
+        with lock:
+            counts['publish'] += n
+            counts['logged'] += n
+
+    def reader():
+        seq, mirror, last_seen, reads = 0, {}, {}, 0
+        while not stop.is_set():
+            snap = store.snapshot()
+            if any(v > snap.seq for v in snap.versions.values()):
+                errors.append('version ahead of snapshot seq')
+            if set(snap.prices) != set(snap.stamps):
+                errors.append('prices/stamps out of sync')
+            new_seq, delta = store.changes_since(seq)
+            if new_seq < seq:
+                errors.append('sequence went backwards')
+            for sym, price in delta.items():
+                if price < last_seen.get(sym, 0):
+                    errors.append(f'{sym} went backwards')
+                last_seen[sym] = price
+            mirror.update(delta)
+            seq = new_seq
+            reads += 1
+        # applying every delta must reproduce the final snapshot exactly
+        seq, delta = store.changes_since(seq)
+        mirror.update(delta)
+        if mirror != dict(store.snapshot().prices):
+            errors.append('delta replay does not match snapshot')
+        with lock:
+            counts['read'] += reads
+
+    drained = []
+
+    def drainer():
+        while not stop.is_set():
+            drained.extend(logs.drain())
+            time.sleep(0.001)
+
+    threads = [threading.Thread(target=writer, args=(w,)) for w in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    drain_thread = threading.Thread(target=drainer)
+    start = time.perf_counter()
+    for t in threads + [drain_thread]:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    drain_thread.join()
+    drained.extend(logs.drain())  # whatever writers appended after the drainer's last pass
+    elapsed = time.perf_counter() - start
+
+    if len(drained) != counts['logged'] or len(set(drained)) != len(drained):
+        errors.append(f'log lost/duplicated entries: {len(drained)} drained vs {counts["logged"]} logged')
+    print(f'writers={writers} readers={readers} symbols={symbols} seconds={elapsed:.1f}')
+    print(f'publishes/s={counts["publish"] / elapsed:,.0f} reads/s={counts["read"] / elapsed:,.0f} final seq={store.seq}')
+    print('OK' if not errors else f'FAILED: {len(errors)} errors, first: {errors[0]}')
+    return not errors
+
+
+if __name__ == '__main__':
+    args = [float(a) for a in sys.argv[1:]]
+    ok = run(*(int(a) for a in args[:2]), *args[2:3])
+    sys.exit(0 if ok else 1)
@@ -2,14 +2,42 @@
 ملاحظات:
 - يستخدم ccxt للتواصل مع Binance (يفضل تثبيت ccxt في بيئة البناء).
 - التداول الحقيقي معطّل افتراضياً (enable_trading=False). لتفعيله يجب تشغيله من الواجهة.
+- وضع التداول الورقي (enable_paper_trading) يستبدل exchange بـ PaperExchange: نفس مسار الأوامر والتحويل
+  لكن على رصيد افتراضي مع تنفيذ على دفتر الأوامر ورسوم، ويمكن تسجيل الأسعار لإعادة تشغيلها لاحقاً.
+- ccxt لا يُستورد عند تحميل الوحدة (الحزمة تستورد كل المنصات)، بل عند أول إنشاء لـ exchange؛
+  start_background_init يفعل ذلك في خيط جانبي مع تحميل فهرس الأسواق من الملف المحلي، ويسجل أزمنة بدء التشغيل.
 - بعض وظائف السحب قد لا تكون مدعومة بواسطة ccxt بنفس الطريقة مثل python-binance، فوضعت نقاطًا واضحة تحتاج مراجعة عند الاختبار الحقيقي.
 """
 import time
-from decimal import Decimal, ROUND_DOWN
+from decimal import Decimal
 from collections import deque
 import threading
-import ccxt
-import traceback
+import os
+from concurrent.futures import ThreadPoolExecutor
+from price_stream import PriceStream
+from market_index import MarketIndex
+from conversion import ConversionPlanner, ConversionExecutor
+from routing import CurrencyGraph
+from valuation import PortfolioValuator, to_decimal
+from market_state import MarketStateStore
+from scheduler import RequestScheduler, is_error_type, is_network_error
+from candle_store import CandleStore
+from order_book import OrderBookManager
+from quantize import for_precision
+from telemetry import Telemetry, JsonlSink, INFO, WARNING, ERROR
+
+ccxt = None  # imported by load_ccxt() on first use
+# the app only trades spot; ccxt's default also fetches the USDⓈ-M and COIN-M futures markets
+SPOT_ONLY = {'fetchMarkets': ['spot'], 'defaultType': 'spot'}
+
+
+def load_ccxt():
+    """استيراد ccxt مرة واحدة عند الحاجة؛ ccxt/__init__ يستورد مئات وحدات المنصات فلا يكون على مسار أول إطار."""
+    global ccxt
+    if ccxt is None:
+        import ccxt as module
+        ccxt = module
+    return ccxt
 
 class Backend:
     BANNED_ASSETS = {
@@ -19,6 +47,7 @@ class Backend:
         'CTXC', 'ELF', 'FIRO', 'HARD', 'NULS', 'PROS', 'SNT', 'TROY', 'UFT', 'VIDT',
         'ANIME', 'STRK', 'THE', 'ALPHA', 'BSW', 'KMD', 'LEVER', 'LTO', 'AION'
     }
+    DEFAULT_SYMBOLS = ['BTC/USDT', 'ETH/USDT', 'BNB/USDT', 'ADA/USDT', 'XRP/USDT', 'DOGE/USDT', 'SOL/USDT', 'MATIC/USDT']
 
     def __init__(self):
         self.api_key = ''
@@ -26,59 +55,259 @@ class Backend:
         self.exchange = None
         self._loop_thread = None
         self._stop_event = threading.Event()
-        self._tickers = {}
-        self._logs = deque(maxlen=2000)
+        self._wake_event = threading.Event()  # wakes the poll loop early when the watch list changes
+        self.watch_symbols = []  # symbols polled/streamed (visible rows in the UI)
+        self.market_state = MarketStateStore()  # atomically swapped price snapshots
+        self.telemetry = Telemetry(maxlen=2000)  # lazily formatted events + per-call latency histograms
+        self.telemetry.sample['ticker_error'] = 10  # per-symbol errors repeat every poll cycle when the API is down
+        self.telemetry_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'telemetry.jsonl')
         self.running = False
         self.enable_trading = False  # safety default
         self.markets = {}  # loaded markets info
+        self.scheduler = RequestScheduler(self)  # every REST call goes through its weight budget
+        self.market_index = MarketIndex()  # compact precision/step/min-notional lookups
+        self.markets_cache_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'markets_cache.json')
+        self.markets_max_age = 24 * 3600  # refresh persisted markets once a day
+        self.batch_fetch = True  # one fetch_tickers call per cycle instead of one call per symbol
+        self._cycle_stats = deque(maxlen=200)  # (timestamp, symbols, seconds, mode)
+        self._rejected_symbols = set()  # symbols Binance answered with BadSymbol; kept out of batches
+        self._dropped_symbols = ()  # last list tradable_symbols left out, for logging changes only
+        self.feed_mode = 'poll'  # 'poll' (REST loop) or 'stream' (WebSocket)
+        self.stream_url = None  # override for a local stand-in WebSocket server
+        self._stream = None
+        self.cache_ttl = 10  # seconds a balance/tickers snapshot is reused
+        self._cache = {}  # key -> (timestamp, value)
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.taker_fee = 0.001  # used when ranking conversion routes
+        self._router = (None, None)  # (tickers snapshot, CurrencyGraph built from it)
+        self.valuator = PortfolioValuator(banned=self.BANNED_ASSETS)
+        self.candles = CandleStore(self)  # on-disk OHLCV history, synced incrementally
+        self.order_books = OrderBookManager(self)  # local depth mirrors for sizing and bid-side valuation
+        self.stream_depth = False  # also subscribe to diff depth streams for the watched symbols
+        self.paper = None  # PaperExchange while paper trading is on
+        self._live_exchange = None  # real exchange kept aside during paper trading
+        self._ticker_recorder = None  # JsonlSink of published prices, replayable by paper_trading.ReplayFeed
+        self._exchange_lock = threading.Lock()
+        self.ready = threading.Event()  # set when start_background_init has finished
+        self.started_at = time.perf_counter()  # cold-start reference; the app overrides it with its own import time
+        self.startup_times = {}  # stage -> seconds since started_at
 
-    def log(self, msg):
-        ts = time.strftime('%H:%M:%S')
-        self._logs.appendleft(f'[{ts}] {msg}')
+    def log(self, msg, *args, level=INFO, key=None, **fields):
+        # msg is a str.format template; args are only formatted when the UI drains or the sink writes
+        self.telemetry.log(level, msg, *args, key=key, **fields)
 
     def drain_logs(self):
-        items = []
-        while self._logs:
-            items.append(self._logs.pop())
-        return items
+        return self.telemetry.drain()
+
+    def metrics(self):
+        """ملخص أزمنة كل نوع طلب (بالثواني): count, errors, mean, p50, p95, p99, max."""
+        return self.telemetry.metrics()
+
+    def enable_telemetry_sink(self, path=None):
+        """بدء كتابة الأحداث في ملف JSONL (إضافة فقط) من خيط خلفي."""
+        return self.telemetry.open_sink(path or self.telemetry_path)
+
+    def disable_telemetry_sink(self):
+        self.telemetry.close_sink()
+
+    @property
+    def trading_active(self):
+        """True إذا كانت الأوامر ستُنفذ فعلاً (حقيقية أو على الحساب الورقي)."""
+        return self.enable_trading or self.paper is not None
+
+    def enable_paper_trading(self, balances=None, replay=False, **kwargs):
+        """تفعيل التداول الورقي برصيد افتراضي balances (افتراضياً 1000 USDT).
+        - replay=False: الأسعار والدفاتر من Binance الحقيقية، والأوامر والرصيد افتراضية بالكامل.
+        - replay=True: بدون أي اتصال؛ الأسعار تأتي من ReplayFeed.run(backend.paper).
+        """
+        from paper_trading import PaperExchange  # not needed on the startup path
+        if self.paper is None:
+            # live paper trading needs the real connection even before the background init made it
+            self._live_exchange = self.exchange if replay else self.ensure_exchange()
+        elif not replay and self._live_exchange is None:
+            self._live_exchange = self._create_exchange()  # switching from offline replay to live
+        source = None if replay else self._live_exchange
+        self.paper = PaperExchange(self.market_index, balances, fee=self.taker_fee, source=source,
+                                   book_provider=None if replay else self.order_books.get, **kwargs)
+        self.paper.set_prices({s: p for s, p in self.latest_tickers().items() if p is not None})
+        self.exchange = self.paper
+        self.invalidate_cache()
+        self.log('تم تفعيل التداول الورقي (رصيد افتراضي: {}).', self.paper.start_balances)
+        return self.paper
+
+    def disable_paper_trading(self):
+        if self.paper is None:
+            return None
+        paper, self.paper = self.paper, None
+        self.exchange, self._live_exchange = self._live_exchange, None
+        self.invalidate_cache()
+        self.log('تم إيقاف التداول الورقي: {}', paper.pnl())
+        return paper.pnl()
+
+    def record_tickers(self, path):
+        """تسجيل كل الأسعار المنشورة في ملف JSONL لإعادة تشغيلها في التداول الورقي؛ path=None يوقف التسجيل."""
+        recorder, self._ticker_recorder = self._ticker_recorder, None
+        if recorder is not None:
+            recorder.close()
+        if path:
+            self._ticker_recorder = JsonlSink(path)
+
+    def startup_mark(self, stage):
+        """تسجيل زمن مرحلة بدء تشغيل منذ started_at (في السجل وفي مقاييس 'startup.<stage>')."""
+        seconds = time.perf_counter() - self.started_at
+        self.startup_times[stage] = seconds
+        self.telemetry.observe('startup.' + stage, seconds)
+        self.log('بدء التشغيل: {} بعد {:.0f} ms', stage, seconds * 1000)
+        return seconds
+
+    def _create_exchange(self):
+        if self.api_key and self.api_secret:
+            return load_ccxt().binance({
+                'apiKey': self.api_key,
+                'secret': self.api_secret,
+                # pacing is done by self.scheduler from Binance request weights
+                'enableRateLimit': False,
+                'options': dict(SPOT_ONLY, adjustForTimeDifference=True)
+            })
+        # public exchange instance (read-only)
+        return load_ccxt().binance({'enableRateLimit': False, 'options': dict(SPOT_ONLY)})
+
+    def ensure_exchange(self):
+        """إنشاء exchange عام إن لم يُنشأ بعد (أول استدعاء يدفع كلفة استيراد ccxt)."""
+        with self._exchange_lock:
+            if self.exchange is None:
+                self.exchange = self._create_exchange()
+        return self.exchange
+
+    def start_background_init(self, on_markets=None, on_ready=None):
+        """تهيئة exchange والأسواق في خيط جانبي حتى لا يتأخر أول إطار.
+        - on_markets() بعد تحميل فهرس الأسواق (من الملف المحلي أولاً ثم من الشبكة إن كان قديماً).
+        - on_ready() في النهاية، حتى عند الفشل. الاستدعاءات من الخيط الجانبي.
+        """
+        thread = threading.Thread(target=self._background_init, args=(on_markets, on_ready), daemon=True)
+        thread.start()
+        return thread
+
+    def _background_init(self, on_markets, on_ready):
+        try:
+            index = MarketIndex.load(self.markets_cache_path) if self.markets_cache_path else None
+            if index is not None and len(index):
+                # a stale index still fills the coin list until the refresh below lands
+                self.market_index = index
+                self.startup_mark('markets_cached')
+                if on_markets:
+                    on_markets()
+            self.ensure_exchange()
+            self.startup_mark('exchange_ready')
+            if index is None or not len(index) or index.is_stale(self.markets_max_age):
+                self.refresh_markets()
+                self.startup_mark('markets_loaded')
+                if on_markets:
+                    on_markets()
+        except Exception as e:
+            self.telemetry.exception('فشل التهيئة في الخلفية: {}', e, e)
+        finally:
+            self.ready.set()
+            if on_ready:
+                on_ready()
 
     def set_keys(self, key, secret):
         self.api_key = key or ''
         self.api_secret = secret or ''
+        self.invalidate_cache()
         try:
+            exchange = self._create_exchange()
+            with self._exchange_lock:
+                if self.paper is None:
+                    self.exchange = exchange
+                else:
+                    # keep paper trading on: the new connection only feeds it market data,
+                    # orders keep going to the paper ledger
+                    self._live_exchange = exchange
+                    if self.paper.source is not None:
+                        self.paper.source = exchange
+            # load markets for symbol info (from disk cache when fresh)
+            self.init_markets()
+            if self.paper is not None:
+                self.paper.index = self.market_index
             if self.api_key and self.api_secret:
-                self.exchange = ccxt.binance({
-                    'apiKey': self.api_key,
-                    'secret': self.api_secret,
-                    'enableRateLimit': True,
-                    'options': {'adjustForTimeDifference': True}
-                })
-                # load markets for symbol info
-                self.markets = self.exchange.load_markets()
                 self.log('تم تهيئة اتصال Binance مع مفاتيح API.')
             else:
-                # public exchange instance (read-only)
-                self.exchange = ccxt.binance({'enableRateLimit': True})
-                self.markets = self.exchange.load_markets()
                 self.log('تم تهيئة اتصال Binance عام (بدون مفاتيح).')
         except Exception as e:
-            tb = traceback.format_exc()
-            self.log(f'فشل تهيئة Binance: {e}')
-            self.log(tb)
+            self.telemetry.exception('فشل تهيئة Binance: {}', e, e)
+
+    def init_markets(self):
+        """تحميل فهرس الأسواق من الملف المحلي إن كان حديثاً، وإلا تنزيله من Binance وحفظه."""
+        index = MarketIndex.load(self.markets_cache_path) if self.markets_cache_path else None
+        if index is not None and len(index) and not index.is_stale(self.markets_max_age):
+            self.market_index = index
+            self.log('تم تحميل بيانات {} سوق من الذاكرة المحلية.', len(index))
+            return
+        self.refresh_markets()
 
-    def start_loop(self, interval=5):
+    def refresh_markets(self):
+        # ccxt still calls load_markets itself before its first request of any kind (outside the scheduler);
+        # SPOT_ONLY keeps that implicit load to the spot exchangeInfo instead of spot + both futures APIs
+        if self.paper is not None:
+            # paper trading: markets come from the real connection, never from the ledger
+            if self._live_exchange is None:
+                self.log('التداول الورقي دون اتصال - الإبقاء على فهرس الأسواق المحفوظ.')
+                return
+            self.markets = self.scheduler.call('load_markets', True, exchange=self._live_exchange)
+        else:
+            self.markets = self.api('load_markets', True)
+        index = MarketIndex.from_markets(self.markets)
+        if index.etag == self.market_index.etag:
+            self.log('بيانات الأسواق لم تتغير منذ آخر تحديث.')
+        self.market_index = index
+        if self.paper is not None:
+            self.paper.index = index
+        if self.markets_cache_path:
+            try:
+                index.save(self.markets_cache_path)
+            except OSError as e:
+                self.log('تعذر حفظ بيانات الأسواق: {}', e)
+
+    def start_loop(self, interval=5, batch=None, mode=None):
         if self.running:
             return
+        if batch is not None:
+            self.batch_fetch = bool(batch)
+        if mode is not None:
+            self.feed_mode = mode
         self._stop_event.clear()
+        if self.feed_mode == 'stream' and self._start_stream():
+            self.running = True
+            self.log('تشغيل بث الأسعار عبر WebSocket.')
+            return
         self._loop_thread = threading.Thread(target=self._run_loop, args=(interval,), daemon=True)
         self.running = True
         self._loop_thread.start()
         self.log('تشغيل حلقة جلب الأسعار.')
 
+    def _start_stream(self):
+        symbols = self.watch_symbols or self.DEFAULT_SYMBOLS
+        kwargs = {'base_url': self.stream_url} if self.stream_url else {}
+        if self.stream_depth:
+            kwargs['channels'] = ('miniTicker', 'depth@100ms')
+        self._stream = PriceStream(self, symbols, **kwargs)
+        if self._stream.start():
+            return True
+        self._stream = None
+        self.log('تعذر تشغيل البث - الرجوع إلى الاستطلاع.')
+        return False
+
     def stop_loop(self):
         if not self.running:
             return
         self._stop_event.set()
+        self._wake_event.set()
+        if self._stream:
+            self._stream.stop()
+            self._stream = None
         self.running = False
         self.log('إيقاف حلقة جلب الأسعار.')
 
@@ -86,236 +315,392 @@ class Backend:
         while not self._stop_event.is_set():
             try:
                 # default symbols if empty
-                symbols = list(self._tickers.keys()) or ['BTC/USDT','ETH/USDT','BNB/USDT','ADA/USDT','XRP/USDT','DOGE/USDT']
-                for sym in symbols:
-                    try:
-                        price = self.fetch_ticker(sym)
-                        if price is not None:
-                            self._tickers[sym] = price
-                    except Exception as e:
-                        self.log(f'خطأ عند جلب {sym}: {e}')
+                symbols = self.watch_symbols or self.DEFAULT_SYMBOLS
+                self.refresh_tickers(symbols)
             except Exception as ex:
-                self.log(f'خطأ عام في حلقة الخلفية: {ex}')
-            self._stop_event.wait(interval)
+                self.log('خطأ عام في حلقة الخلفية: {}', ex)
+            self._wake_event.wait(interval)
+            self._wake_event.clear()
+
+    def set_watch_symbols(self, symbols):
+        """تحديد الرموز التي تُجلب أسعارها (الظاهرة في الواجهة فقط)."""
+        symbols = list(dict.fromkeys(symbols))
+        if symbols == self.watch_symbols:
+            return
+        self.watch_symbols = symbols
+        if self._stream:
+            self._stream.set_symbols(symbols or self.DEFAULT_SYMBOLS)
+        self._wake_event.set()
+
+    def usdt_symbols(self):
+        """كل أزواج USDT النشطة من فهرس الأسواق، أو القائمة الافتراضية إن لم تُحمّل الأسواق بعد."""
+        symbols = sorted(self.market_index.symbols(quote='USDT'))
+        return [s for s in symbols if s.split('/')[0] not in self.BANNED_ASSETS] or list(self.DEFAULT_SYMBOLS)
+
+    def refresh_tickers(self, symbols):
+        """دورة تحديث واحدة للأسعار مع قياس زمنها. تعيد عدد الرموز التي تم تحديثها."""
+        start = time.perf_counter()
+        if self.batch_fetch:
+            mode = 'batch'
+            prices = self.fetch_tickers_batch(symbols)
+        else:
+            mode = 'single'
+            prices = {}
+            for sym in symbols:
+                try:
+                    price = self.fetch_ticker(sym)
+                    if price is not None:
+                        prices[sym] = price
+                except Exception as e:
+                    self.log('خطأ عند جلب {}: {}', sym, e, level=WARNING, key='ticker_error')
+        self.update_tickers(prices)
+        elapsed = time.perf_counter() - start
+        self._cycle_stats.append((time.time(), len(symbols), elapsed, mode))
+        return len(prices)
+
+    def tradable_symbols(self, symbols):
+        """الرموز التي يقبلها fetch_tickers: ccxt يرفض الدفعة كلها (BadSymbol) إن كان رمز واحد مجهولاً أو محذوفاً."""
+        markets = getattr(self.exchange, 'markets', None)
+        index = self.market_index if len(self.market_index) else None
+        kept = []
+        for sym in symbols:
+            if sym in self._rejected_symbols or (markets and sym not in markets):
+                continue
+            if index is not None:
+                meta = index.get(sym)
+                if meta is None or not meta.active:
+                    continue
+            kept.append(sym)
+        dropped = tuple(s for s in symbols if s not in kept) if len(kept) < len(symbols) else ()
+        if dropped != self._dropped_symbols:
+            self._dropped_symbols = dropped  # log once per change, not every poll cycle
+            if dropped:
+                self.log('تجاهل رموز غير متداولة: {}', list(dropped), level=WARNING)
+        return kept
+
+    def fetch_tickers_batch(self, symbols):
+        """جلب أسعار كل الرموز في طلب واحد (fetch_tickers).
+        - الرموز غير المتداولة تُستبعد قبل الطلب؛ fetch_ticker لكل رمز فقط لما غاب عن رد ناجح.
+        - خطأ شبكة أو حد طلبات يُنهي الدورة دون طلبات إضافية؛ BadSymbol يكشف الرمز المرفوض مرة واحدة.
+        """
+        prices = {}
+        symbols = self.tradable_symbols(symbols)
+        if not symbols:
+            return prices
+        try:
+            if not self.exchange:
+                self.set_keys('','')
+            tickers = self.api('fetch_tickers', list(symbols)) or {}
+        except Exception as e:
+            if is_network_error(e) or not is_error_type(e, 'BadSymbol'):
+                self.log('fetch_tickers خطأ (تخطي هذه الدورة): {}', e, level=WARNING, key='ticker_error')
+                return prices
+            self.log('fetch_tickers رفض رمزاً (سيتم الجلب لكل رمز على حدة مرة واحدة): {}', e, level=WARNING)
+            return self._fetch_each(symbols)
+        for sym in symbols:
+            t = tickers.get(sym)
+            if not t:
+                continue
+            price = t.get('last') or t.get('close')
+            if price is not None:
+                prices[sym] = Decimal(str(price))
+        missing = [sym for sym in symbols if sym not in prices]
+        for sym in missing:
+            price = self.fetch_ticker(sym)
+            if price is not None:
+                prices[sym] = price
+        return prices
+
+    def _fetch_each(self, symbols):
+        # finds the symbol(s) behind a batch BadSymbol so the next cycles batch again without them
+        prices = {}
+        for sym in symbols:
+            try:
+                ticker = self.api('fetch_ticker', sym)
+            except Exception as e:
+                if is_error_type(e, 'BadSymbol'):
+                    self._rejected_symbols.add(sym)
+                    self.log('الرمز {} مرفوض من Binance - استبعاده من الدفعات.', sym, level=WARNING)
+                    continue
+                self.log('fetch_ticker خطأ لـ {}: {}', sym, e, level=WARNING, key='ticker_error')
+                if is_network_error(e):
+                    break  # same rule as the batch: no more requests into a network or rate-limit error
+                continue
+            price = ticker.get('last') or ticker.get('close')
+            if price is not None:
+                prices[sym] = Decimal(str(price))
+        return prices
+
+    def cycle_stats(self, symbol_count=None):
+        """ملخص أزمنة دورات التحديث (بالثواني)، ويمكن تصفيته حسب عدد الرموز في الدورة."""
+        rows = [r for r in list(self._cycle_stats) if symbol_count is None or r[1] == symbol_count]
+        if not rows:
+            return {'cycles': 0, 'last': None, 'avg': None, 'max': None, 'symbols': symbol_count, 'mode': None}
+        durations = [r[2] for r in rows]
+        return {
+            'cycles': len(rows),
+            'last': durations[-1],
+            'avg': sum(durations) / len(durations),
+            'max': max(durations),
+            'symbols': rows[-1][1],
+            'mode': rows[-1][3],
+        }
 
     def fetch_ticker(self, symbol):
         try:
             if not self.exchange:
                 self.set_keys('','')
             # ccxt uses market ids like 'BTC/USDT'
-            ticker = self.exchange.fetch_ticker(symbol)
+            ticker = self.api('fetch_ticker', symbol)
             price = ticker.get('last') or ticker.get('close') or None
             return Decimal(str(price)) if price is not None else None
         except Exception as e:
-            self.log(f'fetch_ticker خطأ لـ {symbol}: {e}')
+            self.log('fetch_ticker خطأ لـ {}: {}', symbol, e, level=WARNING, key='ticker_error')
             return None
 
+    def api(self, name, *args, **kwargs):
+        """استدعاء exchange.<name> عبر المجدول المركزي (الأولوية، ميزانية الأوزان، دمج القراءات)."""
+        if self.paper is not None and self.exchange is self.paper and self.paper.is_virtual(name):
+            return getattr(self.paper, name)(*args, **kwargs)  # local ledger: no request weight
+        if self.exchange is None:
+            self.ensure_exchange()  # called before the background init got there
+        return self.scheduler.call(name, *args, **kwargs)
+
+    def budget_usage(self):
+        return self.scheduler.usage()
+
     def latest_tickers(self):
-        return dict(self._tickers)
+        # read-only view of the current snapshot; no copy, never torn by writers
+        return self.market_state.snapshot().prices
+
+    @property
+    def tickers_version(self):
+        return self.market_state.seq
+
+    def update_tickers(self, prices):
+        """نشر أسعار جديدة؛ يزيد رقم التسلسل فقط إذا تغير سعر رمز واحد على الأقل."""
+        if self.paper is not None or self._ticker_recorder is not None:
+            marks = {s: float(p) for s, p in prices.items() if p is not None}
+            if self.paper is not None:
+                self.paper.set_prices(marks)
+            if self._ticker_recorder is not None:
+                self._ticker_recorder.put({'ts': int(time.time() * 1000), 'prices': marks})
+        return self.market_state.publish(prices)
+
+    def tickers_changed_since(self, version):
+        """تعيد (التسلسل الحالي، {رمز: سعر}) للرموز التي تغيرت بعد version فقط."""
+        return self.market_state.changes_since(version)
+
+    # shared snapshot cache for expensive account/market calls (also used by AsyncBackend)
+    def cache_get(self, key, ttl=None):
+        """تعيد (True، القيمة) إن كانت اللقطة المخزنة أحدث من ttl، وإلا (False، None)."""
+        ttl = self.cache_ttl if ttl is None else ttl
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None and time.monotonic() - entry[0] < ttl:
+                self.cache_hits += 1
+                return True, entry[1]
+            self.cache_misses += 1
+        return False, None
+
+    def cache_put(self, key, value):
+        with self._cache_lock:
+            self._cache[key] = (time.monotonic(), value)
+        return value
+
+    def _cached(self, key, loader, ttl=None):
+        found, value = self.cache_get(key, ttl)
+        return value if found else self.cache_put(key, loader())
+
+    def invalidate_cache(self, *keys):
+        """مسح اللقطات المخزنة (كلها إن لم تحدد مفاتيح). تُستدعى بعد إرسال أي أمر."""
+        with self._cache_lock:
+            if not keys:
+                self._cache.clear()
+            for k in keys:
+                self._cache.pop(k, None)
+
+    def cache_stats(self):
+        with self._cache_lock:
+            return {'hits': self.cache_hits, 'misses': self.cache_misses,
+                    'entries': len(self._cache), 'ttl': self.cache_ttl}
+
+    def get_balance(self):
+        return self._cached('balance', lambda: self.api('fetch_balance'))
+
+    def get_all_tickers(self):
+        return self._cached('tickers', lambda: self.api('fetch_tickers'))
+
+    def get_router(self, tickers):
+        """رسم بياني للأسواق مبني من لقطة الأسعار؛ يعاد بناؤه فقط عند تغير اللقطة."""
+        snapshot, graph = self._router
+        if graph is None or snapshot is not tickers:
+            graph = CurrencyGraph(self.market_index, tickers, fee=self.taker_fee)
+            self._router = (tickers, graph)
+        return graph
 
     # utilities adapted from original script
     def get_symbol_info(self, market_symbol):
+        """MarketMeta من فهرس الأسواق (متاح أيضاً عند التحميل من الملف المحلي، بخلاف self.markets)."""
         # market_symbol expected like 'BTC/USDT' or 'BTCUSDT'
         if '/' not in market_symbol and market_symbol.endswith('USDT'):
             market_symbol = market_symbol[:-4] + '/USDT'
-        return self.markets.get(market_symbol)
+        return self.market_index.get(market_symbol)
 
     def get_min_notional(self, market_symbol):
-        try:
-            info = self.get_symbol_info(market_symbol)
-            if not info: 
-                return Decimal('0')
-            # ccxt market info contains 'limits' -> 'cost' for minimum cost
-            cost_limit = info.get('limits', {}).get('cost')
-            if cost_limit and cost_limit.get('min') is not None:
-                return Decimal(str(cost_limit.get('min')))
-            # fallback to 0
-            return Decimal('0')
-        except Exception:
-            return Decimal('0')
+        meta = self.market_index.get(market_symbol)
+        return meta.min_notional if meta else Decimal('0')
 
     def get_symbol_precision(self, market_symbol):
-        try:
-            info = self.get_symbol_info(market_symbol)
-            if not info:
-                return 8
-            # amountPrecision not always present; infer from step size
-            step = info.get('limits', {}).get('amount', {}).get('min')
-            if step is None:
-                # fallback to 8
-                return 8
-            # calculate precision from step like 0.001 => 3
-            s = str(step)
-            if '.' in s:
-                return len(s.split('.')[1].rstrip('0'))
-            return 0
-        except Exception:
-            return 8
+        # precision is derived from the LOT_SIZE step once, when the index is built
+        meta = self.market_index.get(market_symbol)
+        return meta.precision if meta else 8
 
     def format_quantity(self, quantity, precision):
-        fmt_str = f"{{:.{precision}f}}"
-        formatted = fmt_str.format(quantity)
-        if '.' in formatted:
-            formatted = formatted.rstrip('0').rstrip('.')
-        return formatted
+        # truncate, never round up: a rounded-up quantity exceeds the free balance and the order is rejected
+        return for_precision(precision).format(quantity)
 
-    def cancel_all_pending_orders(self):
+    def quantize_amount(self, market_symbol, quantity):
+        """الكمية مقصوصة إلى مضاعف حجم الخطوة للسوق، كنص جاهز للإرسال."""
+        lot = self.market_index.lot(market_symbol)
+        return lot.format(quantity) if lot else self.format_quantity(quantity, 8)
+
+    def quantize_price(self, market_symbol, price, up=False):
+        """السعر مقرباً إلى حجم التيك (للأسفل، أو للأعلى مع up=True)، كنص جاهز للإرسال."""
+        tick = self.market_index.tick(market_symbol)
+        if tick is None:
+            return self.format_quantity(price, 8)
+        return tick.wire(tick.ceil(price) if up else tick.floor(price))
+
+    def cancel_all_pending_orders(self, max_workers=8, confirm_timeout=5.0):
+        """إلغاء كل الأوامر المعلقة دفعة واحدة لكل رمز (cancelAllOrders) إن دعمته المنصة،
+        وإلا إلغاء كل أمر على حدة بالتوازي. يتأكد من الإلغاء من حالة الأوامر بدل الانتظار الثابت."""
         try:
             if not self.exchange:
                 self.log('لم يتم تهيئة Exchange لإلغاء الأوامر.')
                 return False
-            open_orders = self.exchange.fetch_open_orders()
+            open_orders = self.api('fetch_open_orders')
             if not open_orders:
                 self.log('لا توجد أوامر معلقة.')
                 return True
-            for o in open_orders:
-                try:
-                    symbol = o.get('symbol')
-                    order_id = o.get('id')
-                    self.exchange.cancel_order(order_id, symbol)
-                    self.log(f'تم إلغاء الأمر المعلق: {symbol} (ID: {order_id})')
-                except Exception as e:
-                    self.log(f'فشل إلغاء أمر {o}: {e}')
-            time.sleep(2)
+            jobs = self.cancel_jobs(open_orders)
+            workers = max(1, min(max_workers, len(jobs)))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                unconfirmed = [sym for sym in pool.map(lambda job: self._cancel(*job), jobs) if sym]
+            self.invalidate_cache('balance')
+            remaining = self._confirm_cancelled(set(unconfirmed), confirm_timeout)
+            if remaining:
+                self.log('ما زالت هناك أوامر معلقة بعد الإلغاء: {}', sorted(remaining))
+                return False
             return True
         except Exception as e:
-            self.log(f'خطأ في cancel_all_pending_orders: {e}')
+            self.log('خطأ في cancel_all_pending_orders: {}', e)
             return False
 
+    def cancel_jobs(self, open_orders):
+        """طلبات الإلغاء (الرمز، أوامره، الطريقة، المعاملات): طلب DELETE /api/v3/openOrders واحد لكل رمز
+        إن دعمته المنصة، وإلا طلب لكل أمر. يستخدمها AsyncBackend أيضاً."""
+        if (getattr(self.exchange, 'has', None) or {}).get('cancelAllOrders'):
+            by_symbol = {}
+            for o in open_orders:
+                by_symbol.setdefault(o.get('symbol'), []).append(o)
+            return [(sym, orders, 'cancel_all_orders', (sym,)) for sym, orders in by_symbol.items()]
+        return [(o.get('symbol'), [o], 'cancel_order', (o.get('id'), o.get('symbol'))) for o in open_orders]
+
+    def cancel_result(self, symbol, orders, result, error=None):
+        """تسجيل نتيجة طلب إلغاء؛ تعيد الرمز إن لم يؤكد الرد إلغاء كل أوامره (ليُعاد فحصه)، وإلا None."""
+        if error is not None:
+            self.log('فشل إلغاء أوامر {}: {}', symbol, error, level=ERROR)
+            return symbol
+        if len(orders) == 1:
+            self.log('تم إلغاء الأمر المعلق: {} (ID: {})', symbol, orders[0].get("id"))
+        else:
+            self.log('تم إلغاء {} أمر معلق على {}.', len(orders), symbol)
+        rows = result if isinstance(result, list) else [result or {}]
+        cancelled = {r.get('id') for r in rows if isinstance(r, dict) and r.get('status') in ('canceled', 'closed')}
+        return None if all(o.get('id') in cancelled for o in orders) else symbol
+
+    def _cancel(self, symbol, orders, name, args):
+        try:
+            result = self.api(name, *args)
+        except Exception as e:
+            return self.cancel_result(symbol, orders, None, e)
+        return self.cancel_result(symbol, orders, result)
+
+    def _confirm_cancelled(self, symbols, timeout):
+        """إعادة فحص الرموز غير المؤكدة حتى تخلو من الأوامر المفتوحة أو ينتهي الوقت."""
+        deadline = time.monotonic() + timeout
+        delay = 0.2
+        while symbols:
+            symbols = {sym for sym in symbols if self.api('fetch_open_orders', sym)}
+            if not symbols or time.monotonic() >= deadline:
+                break
+            time.sleep(delay)
+            delay = min(1.0, delay * 2)
+        return symbols
+
     def calculate_total_asset_value(self):
         try:
-            if not self.exchange:
-                self.log('Exchange غير مهيأ لحساب الأصول.')
-                return Decimal('0')
-            # fetch balances via ccxt (fetch_balance)
-            bal = self.exchange.fetch_balance()
-            total = Decimal('0')
-            # get tickers for pricing
-            tickers = self.exchange.fetch_tickers()
-            for asset, info in bal.get('total', {}).items():
-                if asset in self.BANNED_ASSETS:
-                    continue
-                amt = Decimal(str(info or 0))
-                if amt <= 0:
-                    continue
-                if asset == 'USDT':
-                    total += amt
-                else:
-                    pair = f"{asset}/USDT"
-                    price = tickers.get(pair, {}).get('last') if isinstance(tickers, dict) else None
-                    if price is None:
-                        # try without slash
-                        price = tickers.get(asset+'USDT', {}).get('last') if isinstance(tickers, dict) else None
-                    if price:
-                        total += amt * Decimal(str(price))
-            return total
+            valuation = self.value_portfolio()
+            return to_decimal(valuation.total) if valuation else Decimal('0')
         except Exception as e:
-            self.log(f'خطأ في calculate_total_asset_value: {e}')
+            self.log('خطأ في calculate_total_asset_value: {}', e)
             return Decimal('0')
 
-    def convert_to_usdt(self, min_value_threshold=5):
+    def asset_breakdown(self):
+        """قيمة كل أصل بالـ USDT مرتبة تنازلياً: [(asset, Decimal)]."""
+        try:
+            valuation = self.value_portfolio()
+            return self.valuator.breakdown(valuation) if valuation else []
+        except Exception as e:
+            self.log('خطأ في asset_breakdown: {}', e)
+            return []
+
+    def value_portfolio(self):
+        if not self.exchange:
+            self.log('Exchange غير مهيأ لحساب الأصول.')
+            return None
+        # fetch balances via ccxt (fetch_balance), shared snapshot
+        bal = self.get_balance()
+        # get tickers for pricing
+        tickers = self.get_all_tickers()
+        if not isinstance(tickers, dict):
+            tickers = {}
+        # assets with no direct USDT pair are priced along the best route in the market graph
+        return self.valuator.value(bal.get('total', {}), tickers, router=lambda: self.get_router(tickers),
+                                   books=self.order_books.get)
+
+    def convert_to_usdt(self, min_value_threshold=5, dry_run=False, max_workers=4):
         """محاولة تحويل جميع الأصول غير USDT إلى USDT
-        - تحاول البيع مباشرة في زوج ASSET/USDT، وإن لم يكن متاحاً تحاول عبر وسطاء (BTC, ETH, BNB, BUSD)
-        - إذا enable_trading==False لا تُرسل أوامر حقيقية بل تُسجّل فقط (محاكاة)
+        - تُحسب خطة المسارات أولاً (مباشر ASSET/USDT، أو أفضل مسار في رسم الأسواق، ثم وسطاء BTC, ETH, BNB, BUSD) ثم تُنفذ البيوع المستقلة بالتوازي
+        - dry_run=True يعيد الخطة وزمن التنفيذ المتوقع فقط دون إلغاء أو إرسال أي أمر
+        - إذا enable_trading==False لا تُرسل أوامر حقيقية بل تُسجّل فقط (محاكاة)، إلا في التداول الورقي فتُنفذ على الحساب الافتراضي
         """
-        results = []
         try:
             if not self.exchange:
                 self.log('Exchange غير مهيأ للـ convert_to_usdt.')
                 return False, 'Exchange غير مهيأ'
-            # cancel pending orders first
-            self.cancel_all_pending_orders()
-            bal = self.exchange.fetch_balance()
-            totals = bal.get('total', {})
-            tickers = self.exchange.fetch_tickers()
-            intermediates = ['BTC','ETH','BNB','BUSD']
-            for asset, amt in totals.items():
-                try:
-                    if asset in self.BANNED_ASSETS:
-                        continue
-                    amount = Decimal(str(amt or 0))
-                    if amount <= 0 or asset == 'USDT':
-                        continue
-                    # compute USD value
-                    pair = f"{asset}/USDT"
-                    price = None
-                    if pair in tickers:
-                        price = tickers[pair].get('last')
-                    if price:
-                        value = amount * Decimal(str(price))
-                    else:
-                        value = Decimal('0')
-                    if value < Decimal(str(min_value_threshold)):
-                        self.log(f'تخطي {asset} لأن قيمته {value} (أقل من {min_value_threshold})')
-                        continue
-                    # attempt direct sell
-                    if pair in self.markets:
-                        precision = self.get_symbol_precision(pair)
-                        qty_str = self.format_quantity(amount, precision)
-                        self.log(f'محاولة بيع مباشر: {asset} -> USDT qty={qty_str}')
-                        if self.enable_trading:
-                            try:
-                                order = self.exchange.create_market_sell_order(pair, float(qty_str))
-                                self.log(f'أمر بيع مُرسل: {order}')
-                                results.append(f'[نجاح] {asset} -> USDT')
-                            except Exception as e:
-                                self.log(f'فشل عند إرسال أمر البيع المباشر: {e}')
-                                # fallthrough to intermediates
-                        else:
-                            self.log(f'(محاكاة) لن يتم إرسال أمر بيع مباشر لـ {asset}')
-                            results.append(f'[محاكاة] {asset} -> USDT (لم تُرسل أمرًا)')
-                            continue
-                    else:
-                        # try via intermediates
-                        converted = False
-                        for inter in intermediates:
-                            try:
-                                pair1 = f"{asset}/{inter}"
-                                pair2 = f"{inter}/USDT"
-                                if pair1 in self.markets and pair2 in self.markets:
-                                    precision1 = self.get_symbol_precision(pair1)
-                                    qty1 = self.format_quantity(amount, precision1)
-                                    self.log(f'محاولة تحويل عبر وسيط {inter}: {asset} -> {inter} (qty={qty1}) ثم {inter} -> USDT')
-                                    if self.enable_trading:
-                                        try:
-                                            o1 = self.exchange.create_market_sell_order(pair1, float(qty1))
-                                            # after sell, determine intermediate amount from balance
-                                            time.sleep(1)
-                                            bal2 = self.exchange.fetch_balance()
-                                            inter_amount = Decimal(str(bal2.get('free', {}).get(inter, 0))) or Decimal('0')
-                                            if inter_amount <= 0:
-                                                continue
-                                            precision2 = self.get_symbol_precision(pair2)
-                                            qty2 = self.format_quantity(inter_amount, precision2)
-                                            o2 = self.exchange.create_market_sell_order(pair2, float(qty2))
-                                            self.log(f'أوامر وسيط مُرسلة: {o1}, {o2}')
-                                            results.append(f'[نجاح] {asset} -> {inter} -> USDT')
-                                            converted = True
-                                            break
-                                        except Exception as e:
-                                            self.log(f'فشل تحويل عبر الوسيط {inter}: {e}')
-                                            continue
-                                    else:
-                                        self.log(f'(محاكاة) تحويل عبر {inter} لـ {asset} (لن يُرسل أمر حقيقي)')
-                                        results.append(f'[محاكاة] {asset} -> {inter} -> USDT')
-                                        converted = True
-                                        break
-                            except Exception as e:
-                                self.log(f'استثناء داخل محاولات الوسيط: {e}')
-                                continue
-                        if not converted:
-                            self.log(f'[فشل] لم يتم تحويل {asset}')
-                            results.append(f'[فشل] {asset}')
-                except Exception as e:
-                    self.log(f'خطأ عند معالجة {asset}: {e}')
-                    continue
+            executor = ConversionExecutor(self, max_workers=max_workers)
+            if not dry_run:
+                # cancel pending orders first
+                self.cancel_all_pending_orders()
+            bal = self.get_balance()
+            tickers = self.get_all_tickers()
+            planner = ConversionPlanner(self, graph=self.get_router(tickers))
+            steps, skipped = planner.plan(bal.get('total', {}), tickers, min_value_threshold)
+            for msg in skipped:
+                self.log(msg)
+            if dry_run:
+                estimate = executor.estimate_wall_time(steps)
+                lines = executor.describe(steps)
+                lines.append(f'الزمن المتوقع للتنفيذ: {estimate:.2f} ثانية ({len(steps)} أصل)')
+                return True, '\n'.join(lines)
+            results = executor.execute(steps, simulate=not self.trading_active)
             summary = '\n'.join(results) if results else 'لم يتم تحويل أي عملات'
             self.log('انتهاء محاولة التحويل إلى USDT.')
             return True, summary
         except Exception as e:
-            tb = traceback.format_exc()
-            self.log(f'استثناء في convert_to_usdt: {e}')
-            self.log(tb)
+            self.telemetry.exception('استثناء في convert_to_usdt: {}', e, e)
             return False, str(e)
 
     def place_order(self, symbol, side, amount, price=None):
@@ -323,18 +708,22 @@ class Backend:
         try:
             if not self.exchange:
                 return {'error': 'Exchange غير مهيأ'}
-            self.log(f'طلب تنفيذ أمر: {side} {symbol} qty={amount} price={price}')
-            if not self.enable_trading:
+            self.log('طلب تنفيذ أمر: {} {} qty={} price={}', side, symbol, amount, price)
+            if not self.trading_active:
                 self.log('التداول الحقيقي غير مفعل - الأمر لن يُرسل (محاكاة).')
                 return {'status':'simulated'}
+            qty = self.quantize_amount(symbol, amount)
             if price is None:
-                order = self.exchange.create_market_order(symbol, side, float(amount))
+                order = self.api('create_market_order', symbol, side, qty)
             else:
-                order = self.exchange.create_limit_order(symbol, side, float(amount), float(price))
-            self.log(f'أمر مُرسل: {order}')
+                # round the limit price away from the fill: down for buys, up for sells
+                order = self.api('create_limit_order', symbol, side, qty,
+                                 self.quantize_price(symbol, price, up=(side == 'sell')))
+            self.invalidate_cache('balance')
+            self.log('أمر مُرسل: {}', order)
             return order
         except Exception as e:
-            self.log(f'فشل عند إرسال الأمر: {e}')
+            self.log('فشل عند إرسال الأمر: {}', e, level=ERROR)
             return {'error': str(e)}
 
     def send_usdt_via_arbitrum(self, address, min_withdraw=0.0):
@@ -343,23 +732,27 @@ class Backend:
             if not self.exchange:
                 self.log('Exchange غير مهيأ للسحب.')
                 return False
+            if self.paper is not None:
+                self.log('السحب غير متاح في التداول الورقي.')
+                return False
             if not self.enable_trading:
                 self.log('التداول/السحب معطّل (محاكاة).')
                 return False
             # ccxt withdraw usage varies; here we try a generic withdraw call
-            balance = self.exchange.fetch_balance()
+            balance = self.api('fetch_balance')
             free_usdt = balance.get('free', {}).get('USDT', 0)
             if free_usdt <= min_withdraw:
-                self.log(f'الرصيد أقل من الحد الأدنى للسحب: {free_usdt}')
+                self.log('الرصيد أقل من الحد الأدنى للسحب: {}', free_usdt)
                 return False
             # attempt withdraw (this may require exchange-specific params)
             try:
-                tx = self.exchange.withdraw('USDT', float(free_usdt), address, {'network': 'ARBITRUM'})
-                self.log(f'تم تنفيذ السحب: {tx}')
+                tx = self.api('withdraw', 'USDT', float(free_usdt), address, {'network': 'ARBITRUM'})
+                self.invalidate_cache('balance')
+                self.log('تم تنفيذ السحب: {}', tx)
                 return Decimal(str(free_usdt))
             except Exception as e:
-                self.log(f'فشل السحب عبر ccxt: {e}')
+                self.log('فشل السحب عبر ccxt: {}', e, level=ERROR)
                 return False
         except Exception as e:
-            self.log(f'خطأ في send_usdt_via_arbitrum: {e}')
+            self.log('خطأ في send_usdt_via_arbitrum: {}', e)
             return False
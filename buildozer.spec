@@ -4,6 +4,7 @@ package.name = binance_trading_app
 package.domain = org.example
 source.dir = .
 source.include_exts = py,png,jpg,kv,ico
+source.exclude_dirs = benchmarks
 version = 0.1
 requirements = python3,kivy==2.2.1,ccxt,requests
 orientation = portrait
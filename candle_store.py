@@ -0,0 +1,181 @@
+"""مخزن الشموع التاريخية (OHLCV) على القرص بجانب Backend.
+ملاحظات:
+- التخزين عمودي بعرض ثابت: ملف لكل عمود (ts كـ int64، والباقي float64) داخل مجلد لكل (رمز، إطار زمني)،
+  ويُقرأ عبر mmap بدون نسخ، فتحميل سنة من شموع الدقيقة لعدة أزواج فوري تقريباً.
+- ملف meta.json يُكتب آخراً ويحدد عدد الصفوف الصالحة، فأي كتابة منقوصة (انقطاع مفاجئ) تُتجاهل وتُقص.
+- المزامنة تدريجية: تجلب فقط الشموع المغلقة بعد آخر طابع زمني مخزن، ويمكن مزامنة عدة رموز بالتوازي
+  (الأوزان يضبطها مجدول Backend).
+"""
+import json
+import mmap
+import os
+import sys
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional on Android builds
+    np = None
+
+COLUMNS = (('ts', 'q'), ('open', 'd'), ('high', 'd'), ('low', 'd'), ('close', 'd'), ('volume', 'd'))
+ITEM_SIZE = 8
+FETCH_LIMIT = 1000  # Binance klines max per request
+
+_UNITS = {'s': 1000, 'm': 60000, 'h': 3600000, 'd': 86400000, 'w': 604800000}
+
+
+def timeframe_ms(timeframe):
+    return int(timeframe[:-1]) * _UNITS[timeframe[-1]]
+
+
+class CandleSeries:
+    """سلسلة شموع لرمز وإطار زمني واحد."""
+
+    def __init__(self, path, timeframe):
+        self.path = path
+        self.timeframe = timeframe
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self.count, self.last_ts = self._read_meta()
+        self._repair()
+
+    def _meta_path(self):
+        return os.path.join(self.path, 'meta.json')
+
+    def _column_path(self, name):
+        return os.path.join(self.path, name + '.bin')
+
+    def _read_meta(self):
+        try:
+            with open(self._meta_path()) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return 0, None
+        if meta.get('byteorder', sys.byteorder) != sys.byteorder:
+            # files are written in native order; a foreign-endian store is treated as empty
+            return 0, None
+        return int(meta.get('count', 0)), meta.get('last_ts')
+
+    def _write_meta(self):
+        tmp = self._meta_path() + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'count': self.count, 'last_ts': self.last_ts, 'timeframe': self.timeframe,
+                       'byteorder': sys.byteorder, 'columns': [c for c, _ in COLUMNS]}, f)
+        os.replace(tmp, self._meta_path())
+
+    def _repair(self):
+        # drop bytes past `count` left by an interrupted append
+        size = self.count * ITEM_SIZE
+        for name, _ in COLUMNS:
+            p = self._column_path(name)
+            if not os.path.exists(p):
+                if self.count:
+                    self.count, self.last_ts = 0, None
+                    return self._repair()
+                open(p, 'wb').close()
+            elif os.path.getsize(p) != size:
+                if os.path.getsize(p) < size:
+                    self.count, self.last_ts = 0, None
+                    return self._repair()
+                with open(p, 'r+b') as f:
+                    f.truncate(size)
+
+    def __len__(self):
+        return self.count
+
+    def append(self, rows):
+        """إضافة صفوف [ts, o, h, l, c, v] مرتبة؛ يتجاهل ما لا يأتي بعد آخر طابع مخزن."""
+        with self.lock:
+            if self.last_ts is not None:
+                rows = [r for r in rows if r[0] > self.last_ts]
+            if not rows:
+                return 0
+            for i, (name, code) in enumerate(COLUMNS):
+                col = array(code, [int(r[i]) if code == 'q' else float(r[i] or 0.0) for r in rows])
+                with open(self._column_path(name), 'ab') as f:
+                    f.write(col.tobytes())
+            self.count += len(rows)
+            self.last_ts = int(rows[-1][0])
+            self._write_meta()
+            return len(rows)
+
+    def columns(self):
+        """أعمدة السلسلة كعروض mmap للقراءة فقط (أو مصفوفات numpy إن توفرت) بطول count الحالي."""
+        with self.lock:
+            count = self.count
+        out = {}
+        for name, code in COLUMNS:
+            if not count:
+                out[name] = np.empty(0, dtype='i8' if code == 'q' else 'f8') if np is not None else memoryview(array(code))
+                continue
+            if np is not None:
+                out[name] = np.memmap(self._column_path(name), dtype='i8' if code == 'q' else 'f8', mode='r', shape=(count,))
+            else:
+                with open(self._column_path(name), 'rb') as f:
+                    mm = mmap.mmap(f.fileno(), count * ITEM_SIZE, access=mmap.ACCESS_READ)
+                out[name] = memoryview(mm).cast(code)
+        return out
+
+    def tail(self, n):
+        """آخر n شمعة كصفوف [ts, o, h, l, c, v]."""
+        cols = self.columns()
+        names = [name for name, _ in COLUMNS]
+        stop = len(cols['ts'])
+        start = max(0, stop - n)
+        return [[int(cols['ts'][i])] + [float(cols[k][i]) for k in names[1:]] for i in range(start, stop)]
+
+
+class CandleStore:
+    def __init__(self, backend, root=None, max_workers=4, default_lookback_days=1):
+        self.backend = backend
+        self.root = root or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'candles')
+        self.max_workers = max_workers
+        self.default_lookback_days = default_lookback_days
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def series(self, symbol, timeframe='1m'):
+        key = (symbol, timeframe)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                folder = f"{symbol.replace('/', '')}_{timeframe}"
+                s = self._series[key] = CandleSeries(os.path.join(self.root, folder), timeframe)
+            return s
+
+    def sync(self, symbol, timeframe='1m', since=None):
+        """جلب الشموع المغلقة الجديدة فقط وإضافتها. تعيد عدد الشموع المضافة."""
+        series = self.series(symbol, timeframe)
+        step = timeframe_ms(timeframe)
+        if series.last_ts is not None:
+            since = series.last_ts + step
+        elif since is None:
+            since = int(time.time() * 1000) - self.default_lookback_days * 86400000
+        added = 0
+        while True:
+            now = int(time.time() * 1000)
+            bars = self.backend.api('fetch_ohlcv', symbol, timeframe, since, FETCH_LIMIT) or []
+            # the last bar is still forming until its period ends
+            closed = [b for b in bars if b[0] >= since and b[0] + step <= now]
+            if not closed:
+                break
+            added += series.append(closed)
+            since = closed[-1][0] + step
+            if len(bars) < FETCH_LIMIT:
+                break
+        return added
+
+    def sync_many(self, symbols, timeframe='1m', since=None):
+        """مزامنة عدة رموز بالتوازي. تعيد {رمز: عدد الشموع المضافة أو نص الخطأ}."""
+        def one(sym):
+            try:
+                return sym, self.sync(sym, timeframe, since)
+            except Exception as e:
+                self.backend.log('فشل مزامنة شموع {}: {}', sym, e)
+                return sym, str(e)
+        workers = max(1, min(self.max_workers, len(symbols)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return dict(pool.map(one, symbols))
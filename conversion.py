@@ -0,0 +1,228 @@
+"""مخطط ومنفذ تحويل الأصول إلى USDT (يستخدمه Backend.convert_to_usdt).
+ملاحظات:
+- المخطط يحسب مسار كل أصل مسبقاً من فهرس الأسواق ولقطة الأسعار: مباشر إن وُجد زوج مع USDT،
+  وإلا أفضل مسار من routing.CurrencyGraph ثم الوسطاء الثابتون كاحتياط.
+- المنفذ يرسل أوامر البيع المستقلة بالتوازي عبر مجمّع خيوط محدود، والأوامر تمر بمجدول Backend
+  (أولوية الأوامر وحد معدلها)،
+  ويقرأ الكمية المستلمة من رد الأمر بدلاً من إعادة جلب الرصيد.
+- قبل كل أمر تُقرأ نسخة دفتر الأوامر المحلية (Backend.order_books)، وتُقص الكمية إلى ما يمكن بيعه ضمن
+  انزلاق max_slippage، ويُسجل متوسط السعر المتوقع.
+- وضع dry_run يعيد الخطة وزمن التنفيذ المتوقع دون إرسال أي أمر.
+"""
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from routing import Leg, value_along
+from telemetry import ERROR
+
+INTERMEDIATES = ('BTC', 'ETH', 'BNB', 'BUSD')
+
+# full plan for one asset; routes are tried in order until one succeeds
+ConversionStep = namedtuple('ConversionStep', 'asset amount value routes')
+
+
+class ConversionPlanner:
+    def __init__(self, backend, graph=None, intermediates=INTERMEDIATES, quote='USDT'):
+        self.backend = backend
+        self.graph = graph
+        self.intermediates = intermediates
+        self.quote = quote
+
+    def routes_for(self, asset):
+        index = self.backend.market_index
+        routes = []
+        direct = f'{asset}/{self.quote}'
+        if direct in index:
+            routes.append([Leg(direct, asset, self.quote)])
+        elif self.graph is not None:
+            best = self.graph.route(asset)
+            if best:
+                routes.append(best)
+        for inter in self.intermediates:
+            if inter == asset:
+                continue
+            pair1 = f'{asset}/{inter}'
+            pair2 = f'{inter}/{self.quote}'
+            if pair1 in index and pair2 in index:
+                route = [Leg(pair1, asset, inter), Leg(pair2, inter, self.quote)]
+                if route not in routes:
+                    routes.append(route)
+        return routes
+
+    def value_of(self, amount, routes, tickers):
+        # value through the first route that has prices for every leg
+        for route in routes:
+            value = value_along(route, amount, tickers)
+            if value is not None:
+                return value
+        return Decimal('0')
+
+    def plan(self, totals, tickers, min_value_threshold=5):
+        """تعيد (الخطوات، رسائل التخطي)."""
+        steps, skipped = [], []
+        threshold = Decimal(str(min_value_threshold))
+        for asset, amt in totals.items():
+            if asset in self.backend.BANNED_ASSETS or asset == self.quote:
+                continue
+            amount = Decimal(str(amt or 0))
+            if amount <= 0:
+                continue
+            routes = self.routes_for(asset)
+            value = self.value_of(amount, routes, tickers)
+            if value < threshold:
+                skipped.append(f'تخطي {asset} لأن قيمته {value} (أقل من {min_value_threshold})')
+                continue
+            steps.append(ConversionStep(asset, amount, value, routes))
+        return steps, skipped
+
+
+class ConversionExecutor:
+    def __init__(self, backend, max_workers=4, leg_latency=0.35, max_slippage=0.02):
+        self.backend = backend
+        self.max_workers = max(1, max_workers)
+        self.leg_latency = leg_latency  # seconds per order round-trip, used for estimates
+        self.max_slippage = max_slippage  # None disables depth-aware sizing
+
+    def estimate_wall_time(self, steps):
+        """تقدير زمن التنفيذ: توزيع المسارات على العمال مع حد معدل الأوامر."""
+        durations = sorted((len(s.routes[0]) * self.leg_latency for s in steps if s.routes), reverse=True)
+        workers = [0.0] * min(self.max_workers, len(durations) or 1)
+        for d in durations:
+            i = workers.index(min(workers))
+            workers[i] += d
+        legs = sum(len(s.routes[0]) for s in steps if s.routes)
+        scheduler = self.backend.scheduler
+        # orders beyond the 10s burst allowance are paced at the sustained order rate
+        rate_floor = max(0, legs - scheduler.orders_per_10s) / scheduler.orders_per_second
+        return max(max(workers), rate_floor)
+
+    def describe(self, steps):
+        lines = []
+        for s in steps:
+            if not s.routes:
+                lines.append(f'{s.asset}: لا يوجد مسار إلى USDT')
+                continue
+            path = ' -> '.join([s.asset] + [leg.quote for leg in s.routes[0]])
+            lines.append(f'{path} qty={s.amount} value~{s.value:.2f}')
+        return lines
+
+    def execute(self, steps, simulate=False):
+        """تنفيذ الخطة؛ تعيد قائمة نتائج نصية بنفس ترتيب الخطوات."""
+        if not steps:
+            return []
+        workers = min(self.max_workers, len(steps))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(lambda s: self._run_step(s, simulate), steps))
+
+    def _run_step(self, step, simulate):
+        b = self.backend
+        asset = step.asset
+        for route in step.routes:
+            path = self.route_path(asset, route)
+            if simulate:
+                b.log('(محاكاة) تحويل {} qty={} (لن يُرسل أمر حقيقي)', path, step.amount)
+                return f'[محاكاة] {path}'
+            orders = []
+            try:
+                amount = step.amount
+                for leg in route:
+                    qty = self.leg_quantity(leg, amount)
+                    # ccxt accepts the exact wire string, so no float round-trip before sending
+                    order = b.api('create_market_sell_order', leg.symbol, qty)
+                    orders.append(order)
+                    amount = self.check_received(self.received_amount(order, leg), leg)
+                return self.route_succeeded(asset, path, orders)
+            except Exception as e:
+                if self.route_failed(path, e, orders):
+                    break
+        return self.step_failed(asset)
+
+    # per-leg pieces shared with AsyncBackend._run_step, which awaits the orders instead
+    @staticmethod
+    def route_path(asset, route):
+        return ' -> '.join([asset] + [leg.quote for leg in route])
+
+    def leg_quantity(self, leg, amount, depth=True):
+        """كمية أمر البيع لهذه الرجل كنص جاهز للإرسال (بعد القص حسب العمق والتقريب لحجم الخطوة)."""
+        if depth:
+            amount = self.size_for_depth(leg, amount)
+        qty = self.backend.quantize_amount(leg.symbol, amount)
+        if qty == '0':
+            raise RuntimeError(f'الكمية {amount} أقل من حجم الخطوة لـ {leg.symbol}')
+        self.backend.log('محاولة بيع: {} -> {} qty={}', leg.base, leg.quote, qty)
+        return qty
+
+    @staticmethod
+    def check_received(amount, leg):
+        if amount is None or amount <= 0:
+            raise RuntimeError(f'لم يمكن تحديد الكمية المستلمة من {leg.symbol}')
+        return amount
+
+    def route_succeeded(self, asset, path, orders):
+        b = self.backend
+        b.invalidate_cache('balance')
+        b.log('أوامر مُرسلة لـ {}: {}', asset, orders)
+        return f'[نجاح] {path}'
+
+    def route_failed(self, path, error, orders):
+        """تسجيل فشل مسار؛ تعيد True إن نُفذت رجل منه (الأصل لم يعد موجوداً فلا تُجرب مسارات أخرى)."""
+        b = self.backend
+        b.invalidate_cache('balance')
+        b.log('فشل تحويل {}: {}', path, error, level=ERROR)
+        return bool(orders)
+
+    def step_failed(self, asset):
+        self.backend.log('[فشل] لم يتم تحويل {}', asset)
+        return f'[فشل] {asset}'
+
+    def size_for_depth(self, leg, amount):
+        """قص الكمية إلى ما يحتمله عمق الدفتر ضمن max_slippage؛ عند تعذر جلب الدفتر تُرجع الكمية كما هي."""
+        b = self.backend
+        books = getattr(b, 'order_books', None)
+        if self.max_slippage is None or books is None:
+            return amount
+        try:
+            book = books.book(leg.symbol)
+        except Exception as e:
+            b.log('تعذر جلب دفتر {}، البيع بدون تقدير الانزلاق: {}', leg.symbol, e)
+            return amount
+        cap = book.max_amount_within('sell', self.max_slippage)
+        if cap <= 0:
+            raise RuntimeError(f'لا توجد سيولة في دفتر {leg.symbol}')
+        if cap < float(amount):
+            b.log('عمق {} لا يكفي: بيع {} من {} ضمن انزلاق {:.2%}', leg.symbol, cap, amount, self.max_slippage)
+            amount = Decimal(str(cap))
+        avg, _ = book.vwap('sell', float(amount))
+        slip = book.slippage('sell', float(amount))
+        if avg is not None:
+            b.log('السعر المتوقع لـ {}: {:.8g} (انزلاق {:.3%})', leg.symbol, avg, slip or 0)
+        return amount
+
+    def received_amount(self, order, leg):
+        """الكمية المستلمة من عملة quote بعد أمر بيع سوقي، من رد الأمر مباشرة."""
+        received = self.received_from_order(order, leg)
+        if received is None:
+            # exchange did not report the fill: fall back to the free balance of the quote asset
+            self.backend.invalidate_cache('balance')
+            return self.free_amount(self.backend.get_balance(), leg)
+        return received
+
+    @staticmethod
+    def free_amount(balance, leg):
+        return Decimal(str((balance or {}).get('free', {}).get(leg.quote, 0) or 0))
+
+    @staticmethod
+    def received_from_order(order, leg):
+        """صافي ما استُلم حسب رد الأمر (التكلفة ناقص رسوم quote)، أو None إن لم يذكر الرد التنفيذ."""
+        order = order or {}
+        cost = order.get('cost')
+        if cost is None and order.get('filled') is not None and order.get('average') is not None:
+            cost = order['filled'] * order['average']
+        if cost is None:
+            return None
+        received = Decimal(str(cost))
+        for fee in order.get('fees') or ([order['fee']] if order.get('fee') else []):
+            if fee and fee.get('currency') == leg.quote and fee.get('cost'):
+                received -= Decimal(str(fee['cost']))
+        return received
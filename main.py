@@ -1,40 +1,158 @@
+import time
+STARTUP_T0 = time.perf_counter()  # cold-start reference, taken before the Kivy imports
+
 from kivy.app import App
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
 from kivy.uix.textinput import TextInput
 from kivy.uix.button import Button
-from kivy.uix.scrollview import ScrollView
-from kivy.uix.gridlayout import GridLayout
 from kivy.uix.image import Image
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
 from kivy.clock import Clock
-import threading, time, os, sys
+from collections import deque
+import threading, os, sys
 
 sys.path.insert(0, os.path.dirname(__file__))
 from binance_backend import Backend
+from async_backend import AsyncBackend
 
-class CoinRow(BoxLayout):
-    def __init__(self, symbol, icon_path=None, **kwargs):
-        super().__init__(orientation='horizontal', size_hint_y=None, height=64, padding=6, spacing=8, **kwargs)
-        if icon_path and os.path.exists(icon_path):
-            self.add_widget(Image(source=icon_path, size_hint=(None, None), size=(48,48)))
-        else:
-            self.add_widget(Label(text='🪙', size_hint=(None, None), width=48))
-        self.symbol_label = Label(text=symbol, size_hint_x=0.3)
+ICON_DIRS = ('coin_icons', os.path.dirname(os.path.abspath(__file__)))
+_icon_index = None  # base -> icon path, filled by load_icon_index() off the UI thread
+
+def load_icon_index():
+    """قائمة ملفات مجلدات الأيقونات مرة واحدة (listdir لكل مجلد بدل فحص ملف لكل عملة)."""
+    global _icon_index
+    index = {}
+    for folder in reversed(ICON_DIRS):  # earlier folders win
+        try:
+            names = os.listdir(folder)
+        except OSError:
+            continue
+        for name in names:
+            if name.endswith('-logo.png'):
+                index[name[:-len('-logo.png')]] = os.path.join(folder, name)
+    _icon_index = index
+    return index
+
+def icon_for(symbol):
+    """مسار أيقونة العملة (أو None حتى يكتمل load_icon_index)."""
+    if _icon_index is None:
+        return None
+    return _icon_index.get(symbol.split('/')[0].lower())
+
+class CoinRow(RecycleDataViewBehavior, BoxLayout):
+    ROW_HEIGHT = 64
+
+    def __init__(self, **kwargs):
+        super().__init__(orientation='horizontal', size_hint_y=None, height=self.ROW_HEIGHT, padding=6, spacing=8, **kwargs)
+        self.icon = Image(size_hint=(None, None), size=(48,48))
+        self.symbol_label = Label(text='', size_hint_x=0.3)
         self.price_label = Label(text='--', size_hint_x=0.4)
+        self.add_widget(self.icon)
         self.add_widget(self.symbol_label)
         self.add_widget(self.price_label)
 
-    def set_price(self, price):
-        try:
-            self.price_label.text = f'{price:.6f}'
-        except Exception:
-            self.price_label.text = str(price)
+    def refresh_view_attrs(self, rv, index, data):
+        # rows are recycled: rebind this widget to the data entry at `index`
+        self.index = index
+        self.symbol_label.text = data['symbol']
+        icon = icon_for(data['symbol'])
+        self.icon.source = icon or ''
+        self.icon.opacity = 1 if icon else 0
+        if self.price_label.text != data['price']:
+            self.price_label.text = data['price']
+
+def format_price(price):
+    try:
+        return f'{price:.6f}'
+    except Exception:
+        return str(price)
+
+class CoinList(RecycleView):
+    """قائمة العملات الظاهرة فقط تُبنى كعناصر واجهة، مهما كان عدد الرموز."""
+    def __init__(self, on_visible=None, **kwargs):
+        super().__init__(**kwargs)
+        self.viewclass = CoinRow
+        layout = RecycleBoxLayout(orientation='vertical', default_size=(None, CoinRow.ROW_HEIGHT),
+                                  default_size_hint=(1, None), size_hint_y=None)
+        layout.bind(minimum_height=layout.setter('height'))
+        self.add_widget(layout)
+        self.on_visible = on_visible
+        self._rows = {}  # symbol -> data entry
+        self._notify = Clock.create_trigger(self._emit_visible, 0.3)
+        self.bind(scroll_y=self._notify, height=self._notify)
+
+    def set_symbols(self, symbols):
+        data = []
+        for sym in symbols:
+            row = self._rows.get(sym) or {'symbol': sym, 'price': '--'}
+            self._rows[sym] = row
+            data.append(row)
+        self.data = data
+        self._notify()
+
+    def set_prices(self, prices):
+        changed = False
+        for sym, price in prices.items():
+            row = self._rows.get(sym)
+            if row is None:
+                continue
+            text = format_price(price)
+            if row['price'] != text:
+                row['price'] = text
+                changed = True
+        if changed:
+            # re-applies data to the bound (visible) views only
+            self.refresh_from_data()
+
+    def visible_symbols(self, margin=2):
+        n = len(self.data)
+        if not n:
+            return []
+        h = CoinRow.ROW_HEIGHT
+        hidden = max(0, n * h - self.height)
+        first = int((1 - self.scroll_y) * hidden // h)
+        count = int(self.height // h) + 1
+        lo, hi = max(0, first - margin), min(n, first + count + margin)
+        return [self.data[i]['symbol'] for i in range(lo, hi)]
+
+    def _emit_visible(self, *a):
+        if self.on_visible:
+            self.on_visible(self.visible_symbols())
+
+class LogView(RecycleView):
+    """سجل رسائل بعدد أسطر محدود؛ RecycleView يرسم الأسطر الظاهرة فقط."""
+    def __init__(self, max_lines=500, **kwargs):
+        super().__init__(**kwargs)
+        self.viewclass = 'Label'
+        layout = RecycleBoxLayout(orientation='vertical', default_size=(None, 26),
+                                  default_size_hint=(1, None), size_hint_y=None)
+        layout.bind(minimum_height=layout.setter('height'))
+        self.add_widget(layout)
+        self._lines = deque(maxlen=max_lines)
+
+    def add_lines(self, lines):
+        # newest first, like the previous TextInput log; rows have a fixed height,
+        # so multi-line messages (tracebacks, conversion summaries) get one row per line
+        for ln in lines:
+            for part in reversed(str(ln).splitlines() or ['']):
+                self._lines.appendleft({'text': part})
+        self.data = list(self._lines)
+
+    def clear(self):
+        self._lines.clear()
+        self.data = []
 
 class MainLayout(BoxLayout):
+    """الواجهة تُبنى على مراحل: الأزرار في الإطار الأول، ثم قائمة العملات والسجل، ثم تهيئة Binance في الخلفية."""
     def __init__(self, **kwargs):
         super().__init__(orientation='vertical', padding=8, spacing=8, **kwargs)
         self.backend = Backend()
-
+        self.backend.started_at = STARTUP_T0
+        # network calls from buttons run off the UI thread (async loop, or a worker thread without aiohttp)
+        self.async_backend = AsyncBackend(self.backend)
         self.add_widget(Label(text='تطبيق SKY - تداول باينانس', font_size='20sp', size_hint_y=None, height=44))
 
         # API inputs
@@ -58,15 +176,20 @@ class MainLayout(BoxLayout):
         ctrl_box.add_widget(self.enable_trade_btn)
         self.add_widget(ctrl_box)
 
-        # Coin list (scrollable)
-        self.coin_area = GridLayout(cols=1, spacing=6, size_hint_y=None)
-        self.coin_area.bind(minimum_height=self.coin_area.setter('height'))
-        self.coins = {}
-        self.populate_coins(['BTC/USDT', 'ETH/USDT', 'BNB/USDT', 'ADA/USDT', 'XRP/USDT', 'DOGE/USDT', 'SOL/USDT', 'MATIC/USDT'])
+        # Account actions (non-blocking)
+        acct_box = BoxLayout(orientation='horizontal', size_hint_y=None, height=48, spacing=8)
+        self.value_btn = Button(text='قيمة المحفظة', on_release=self.show_total_value)
+        self.convert_btn = Button(text='تحويل الكل إلى USDT', on_release=self.convert_all)
+        acct_box.add_widget(self.value_btn)
+        acct_box.add_widget(self.convert_btn)
+        self.add_widget(acct_box)
 
-        scroll = ScrollView(size_hint=(1, 0.45))
-        scroll.add_widget(self.coin_area)
-        self.add_widget(scroll)
+        # placeholder for the coin list, filled by _build_lists on the next frame
+        self.list_box = BoxLayout(orientation='vertical', spacing=8, size_hint=(1, 0.5))
+        self.add_widget(self.list_box)
+        self.search = None
+        self.coin_list = None
+        self.all_symbols = []
 
         # Log area with clear button
         log_box = BoxLayout(orientation='horizontal', size_hint_y=None, height=40)
@@ -76,24 +199,108 @@ class MainLayout(BoxLayout):
         log_box.add_widget(self.clear_log_btn)
         self.add_widget(log_box)
 
-        self.log = TextInput(text='...', readonly=True, size_hint=(1, 0.28))
+        self.log = LogView(size_hint=(1, 0.28))
         self.add_widget(self.log)
 
         # Periodic UI update scheduler
         self.ui_event = None
+        self._tickers_version = 0  # last backend market_state seq applied to the rows
+        self.backend.startup_mark('ui_shell')
+        Clock.schedule_once(self._first_frame, 0)
+
+    def _first_frame(self, dt):
+        # runs in the first clock tick; scheduling again with 0 lands after that frame is drawn
+        self.backend.startup_mark('first_frame')
+        Clock.schedule_once(self._build_lists, 0)
+
+    def _build_lists(self, dt):
+        # Coin list (virtualized) with search; only visible rows are polled/streamed
+        self._filter_trigger = Clock.create_trigger(lambda dt: self.apply_filter(), 0.25)
+        self.search = TextInput(hint_text='بحث عن عملة...', multiline=False, size_hint_y=None, height=40)
+        self.search.bind(text=self._filter_trigger)
+        self.list_box.add_widget(self.search)
+        self.coin_list = CoinList(on_visible=self.backend.set_watch_symbols)
+        self.list_box.add_widget(self.coin_list)
+        self.populate_coins(self.all_symbols or self.backend.usdt_symbols())
+        self.backend.startup_mark('ui_ready')
+        Clock.schedule_once(self._start_background, 0)
+
+    def _start_background(self, dt):
+        def icons():
+            load_icon_index()
+            Clock.schedule_once(lambda dt: self.coin_list.refresh_from_data())
+        threading.Thread(target=icons, daemon=True).start()
+        self.backend.start_background_init(
+            on_markets=lambda: Clock.schedule_once(lambda dt: self.populate_coins(self.backend.usdt_symbols())),
+            on_ready=lambda: Clock.schedule_once(lambda dt: self.report_startup()))
+
+    def report_startup(self):
+        times = self.backend.startup_times
+        stages = ', '.join(f'{k} {v * 1000:.0f}ms' for k, v in sorted(times.items(), key=lambda kv: kv[1]))
+        self.log_message(f'زمن بدء التشغيل: {stages}')
 
     def populate_coins(self, symbols):
-        for sym in symbols:
-            icon_file = os.path.join('coin_icons', sym.split('/')[0].lower() + '-logo.png')
-            row = CoinRow(sym, icon_path=icon_file if os.path.exists(icon_file) else None)
-            self.coins[sym] = row
-            self.coin_area.add_widget(row)
+        self.all_symbols = list(symbols)
+        self.apply_filter()
+
+    def apply_filter(self):
+        if self.coin_list is None:
+            return  # _build_lists picks up all_symbols
+        query = self.search.text.strip().upper().replace('/', '')
+        if query:
+            symbols = [s for s in self.all_symbols if query in s.replace('/', '')]
+        else:
+            symbols = self.all_symbols
+        self.coin_list.set_symbols(symbols)
+
+    def call_backend(self, name, *args, on_done=None):
+        """تشغيل Backend.<name> دون حجز خيط الواجهة؛ on_done(result, error) يُستدعى على خيط الواجهة."""
+        def finish(result, error):
+            if on_done is not None:
+                Clock.schedule_once(lambda dt: on_done(result, error))
+        if self.async_backend.available():
+            self.async_backend.submit(getattr(self.async_backend, name)(*args), finish)
+            return
+
+        def work():
+            try:
+                result, error = getattr(self.backend, name)(*args), None
+            except Exception as e:
+                result, error = None, e
+            finish(result, error)
+        threading.Thread(target=work, daemon=True).start()
 
     def save_keys(self, *a):
         key = self.api_key.text.strip()
         secret = self.api_secret.text.strip()
-        self.backend.set_keys(key, secret)
-        self.log_message('تم حفظ المفاتيح (لم يتم تفعيل التداول تلقائياً).')
+
+        def done(result, error):
+            self.populate_coins(self.backend.usdt_symbols())
+            if error is not None:
+                self.log_message(f'فشل حفظ المفاتيح: {error}')
+            else:
+                self.log_message('تم حفظ المفاتيح (لم يتم تفعيل التداول تلقائياً).')
+        self.call_backend('set_keys', key, secret, on_done=done)
+
+    def show_total_value(self, *a):
+        self.value_btn.disabled = True
+
+        def done(total, error):
+            self.value_btn.disabled = False
+            self.log_message(f'فشل حساب القيمة: {error}' if error is not None else f'إجمالي قيمة الأصول: {total} USDT')
+        self.call_backend('calculate_total_asset_value', on_done=done)
+
+    def convert_all(self, *a):
+        self.convert_btn.disabled = True
+
+        def done(result, error):
+            self.convert_btn.disabled = False
+            if error is not None:
+                self.log_message(f'فشل التحويل: {error}')
+                return
+            ok, summary = result
+            self.log.add_lines(summary.splitlines())
+        self.call_backend('convert_to_usdt', on_done=done)
 
     def start_fetch(self, *a):
         if self.backend.running:
@@ -121,27 +328,29 @@ class MainLayout(BoxLayout):
         self.log_message(f'حالة التداول: {state}')
 
     def refresh_ui(self):
-        tickers = self.backend.latest_tickers()
-        for sym, price in tickers.items():
-            if sym in self.coins:
-                try:
-                    self.coins[sym].set_price(price)
-                except Exception:
-                    pass
-        logs = self.backend.drain_logs()
-        for ln in logs:
-            self.log_message(ln)
+        # only rows whose price changed since the last refresh are re-rendered
+        self._tickers_version, changed = self.backend.tickers_changed_since(self._tickers_version)
+        if changed:
+            self.coin_list.set_prices(changed)
+        logs = self.backend.drain_logs()  # already rendered with their own event time
+        if logs:
+            self.log.add_lines(logs)
 
     def log_message(self, msg):
         ts = time.strftime('%H:%M:%S')
-        self.log.text = f'[{ts}] {msg}\n' + self.log.text
+        self.log.add_lines([f'[{ts}] {msg}'])
 
     def clear_log(self, *a):
-        self.log.text = ''
+        self.log.clear()
 
 class SkyApp(App):
     def build(self):
-        return MainLayout()
+        self.layout = MainLayout()
+        return self.layout
+
+    def on_stop(self):
+        self.layout.backend.stop_loop()
+        self.layout.async_backend.stop()
 
 if __name__ == '__main__':
     SkyApp().run()
@@ -0,0 +1,164 @@
+"""فهرس مضغوط لبيانات الأسواق (الدقة، حجم الخطوة، الحد الأدنى للقيمة، العملة الأساس/المقابلة).
+ملاحظات:
+- يُبنى مرة واحدة من نتيجة ccxt load_markets() ثم تكون كل عمليات البحث O(1) بدون عمليات نصية.
+- لكل سوق Quantizer محسوب مسبقاً لحجم الخطوة والتيك (quantize.py)، فتقريب الكميات لا يحتاج Decimal.
+- يُحفظ في ملف JSON محلي مع رقم إصدار وبصمة (etag) ووقت الحفظ، ليتم التحميل من القرص عند بدء التشغيل.
+"""
+import hashlib
+import json
+import os
+import time
+from collections import namedtuple
+from decimal import Decimal
+
+from quantize import Quantizer
+
+INDEX_VERSION = 2
+
+MarketMeta = namedtuple('MarketMeta', 'symbol id base quote step precision min_notional min_amount active tick')
+
+
+def _filter(info, kind):
+    for f in (info or {}).get('filters', []) or []:
+        if f.get('filterType') == kind:
+            return f
+    return {}
+
+
+def _dec(value):
+    if value in (None, ''):
+        return None
+    try:
+        d = Decimal(str(value))
+    except Exception:
+        return None
+    return d if d > 0 else None
+
+
+def precision_of(step):
+    """عدد الخانات العشرية لحجم الخطوة (0.001 => 3، 1 => 0)."""
+    if step is None:
+        return 8
+    exp = step.normalize().as_tuple().exponent
+    return max(0, -exp)
+
+
+def meta_from_market(symbol, market):
+    raw = market.get('info') or {}
+    limits = market.get('limits') or {}
+    lot = _filter(raw, 'LOT_SIZE')
+    price_filter = _filter(raw, 'PRICE_FILTER')
+    notional = _filter(raw, 'NOTIONAL') or _filter(raw, 'MIN_NOTIONAL')
+    min_amount = _dec((limits.get('amount') or {}).get('min'))
+    step = _dec(lot.get('stepSize')) or min_amount
+    min_notional = _dec(notional.get('minNotional')) or _dec((limits.get('cost') or {}).get('min')) or Decimal('0')
+    return MarketMeta(
+        symbol=symbol,
+        id=market.get('id') or symbol.replace('/', ''),
+        base=market.get('base') or symbol.split('/')[0],
+        quote=market.get('quote') or (symbol.split('/')[1] if '/' in symbol else ''),
+        step=step,
+        precision=precision_of(step),
+        min_notional=min_notional,
+        min_amount=min_amount or Decimal('0'),
+        active=market.get('active') is not False,
+        tick=_dec(price_filter.get('tickSize')) or _dec((limits.get('price') or {}).get('min')),
+    )
+
+
+class MarketIndex:
+    def __init__(self, metas=(), saved_at=None, etag=None):
+        self._by_symbol = {}
+        self._by_id = {}
+        self._lots = {}
+        self._ticks = {}
+        for m in metas:
+            self._by_symbol[m.symbol] = m
+            self._by_id[m.id] = m
+            if m.step is not None:
+                self._lots[m.symbol] = Quantizer.from_step(m.step)
+            if m.tick is not None:
+                self._ticks[m.symbol] = Quantizer.from_step(m.tick)
+        self.saved_at = saved_at
+        self.etag = etag or self._compute_etag()
+
+    @classmethod
+    def from_markets(cls, markets):
+        metas = []
+        for symbol, market in (markets or {}).items():
+            # spot pairs only; skip futures/options symbols like 'BTC/USDT:USDT'
+            if ':' in symbol or market.get('spot') is False:
+                continue
+            try:
+                metas.append(meta_from_market(symbol, market))
+            except Exception:
+                continue
+        return cls(metas, saved_at=time.time())
+
+    def _compute_etag(self):
+        h = hashlib.sha1()
+        for sym in sorted(self._by_symbol):
+            m = self._by_symbol[sym]
+            h.update(f'{sym}|{m.step}|{m.min_notional}|{m.active};'.encode())
+        return h.hexdigest()
+
+    def get(self, symbol):
+        # accepts 'BTC/USDT' or the exchange id 'BTCUSDT'
+        return self._by_symbol.get(symbol) or self._by_id.get(symbol)
+
+    def lot(self, symbol):
+        """Quantizer لحجم خطوة الكمية (LOT_SIZE)، أو None إن كان السوق بلا خطوة معروفة."""
+        m = self.get(symbol)
+        return self._lots.get(m.symbol) if m else None
+
+    def tick(self, symbol):
+        """Quantizer لحجم تيك السعر (PRICE_FILTER)، أو None."""
+        m = self.get(symbol)
+        return self._ticks.get(m.symbol) if m else None
+
+    def __contains__(self, symbol):
+        return symbol in self._by_symbol or symbol in self._by_id
+
+    def __len__(self):
+        return len(self._by_symbol)
+
+    def __iter__(self):
+        return iter(self._by_symbol.values())
+
+    def symbols(self, quote=None, active_only=True):
+        return [m.symbol for m in self._by_symbol.values()
+                if (quote is None or m.quote == quote) and (m.active or not active_only)]
+
+    def is_stale(self, max_age):
+        return self.saved_at is None or time.time() - self.saved_at > max_age
+
+    def save(self, path):
+        rows = [[m.symbol, m.id, m.base, m.quote,
+                 str(m.step) if m.step is not None else None,
+                 str(m.min_notional), str(m.min_amount), m.active,
+                 str(m.tick) if m.tick is not None else None]
+                for m in self._by_symbol.values()]
+        payload = {'version': INDEX_VERSION, 'saved_at': self.saved_at or time.time(),
+                   'etag': self.etag, 'markets': rows}
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(payload, f, separators=(',', ':'))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """تحميل الفهرس من القرص؛ تعيد None إن لم يوجد الملف أو كان بإصدار مختلف."""
+        try:
+            with open(path) as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if payload.get('version') != INDEX_VERSION:
+            return None
+        metas = []
+        for symbol, mid, base, quote, step, min_notional, min_amount, active, tick in payload.get('markets', []):
+            step = Decimal(step) if step is not None else None
+            metas.append(MarketMeta(symbol, mid, base, quote, step, precision_of(step),
+                                    Decimal(min_notional), Decimal(min_amount), active,
+                                    Decimal(tick) if tick is not None else None))
+        return cls(metas, saved_at=payload.get('saved_at'), etag=payload.get('etag'))
@@ -0,0 +1,84 @@
+"""مخزن حالة السوق المشترك بين خيط الجلب/البث وخيط الواجهة.
+ملاحظات:
+- كل تحديث يبني لقطة جديدة غير قابلة للتعديل ثم يستبدلها بإسناد واحد (ذري في CPython)،
+  فالقارئ لا يحتاج قفلاً ولا نسخاً ولا يرى حالة نصف محدثة.
+- لكل لقطة رقم تسلسلي، ولكل رمز وقت آخر تحديث ورقم التسلسل الذي تغير فيه، فيسحب المستهلك الفروقات فقط.
+"""
+import threading
+import time
+from collections import deque, namedtuple
+from types import MappingProxyType
+
+_EMPTY = MappingProxyType({})
+
+# prices/stamps/versions are read-only mappings that are never mutated after publication
+Snapshot = namedtuple('Snapshot', 'seq prices stamps versions')
+
+
+class MarketStateStore:
+    def __init__(self):
+        self._snap = Snapshot(0, _EMPTY, _EMPTY, _EMPTY)
+        self._write_lock = threading.Lock()  # serializes writers only
+
+    @property
+    def seq(self):
+        return self._snap.seq
+
+    def snapshot(self):
+        return self._snap
+
+    def publish(self, prices, ts=None):
+        """نشر أسعار جديدة؛ تعيد عدد الرموز التي تغيرت (ولا تُنشأ لقطة إن لم يتغير شيء)."""
+        ts = time.time() if ts is None else ts
+        with self._write_lock:
+            snap = self._snap
+            changed = [sym for sym, price in prices.items() if snap.prices.get(sym) != price]
+            if not changed:
+                return 0
+            seq = snap.seq + 1
+            new_prices = dict(snap.prices)
+            new_stamps = dict(snap.stamps)
+            new_versions = dict(snap.versions)
+            for sym in changed:
+                new_prices[sym] = prices[sym]
+                new_stamps[sym] = ts
+                new_versions[sym] = seq
+            self._snap = Snapshot(seq, MappingProxyType(new_prices), MappingProxyType(new_stamps),
+                                  MappingProxyType(new_versions))
+            return len(changed)
+
+    def changes_since(self, seq):
+        """تعيد (التسلسل الحالي، {رمز: سعر}) للرموز التي تغيرت بعد seq."""
+        snap = self._snap
+        if seq >= snap.seq:
+            return snap.seq, {}
+        prices = snap.prices
+        return snap.seq, {sym: prices[sym] for sym, v in snap.versions.items() if v > seq}
+
+    def age(self, symbol, now=None):
+        """عمر آخر سعر للرمز بالثواني، أو None إن لم يُنشر له سعر."""
+        ts = self._snap.stamps.get(symbol)
+        if ts is None:
+            return None
+        return (time.time() if now is None else now) - ts
+
+
+class LogBuffer:
+    """مخزن رسائل محدود الحجم؛ الكتابة والسحب من خيوط مختلفة دون تمزق."""
+
+    def __init__(self, maxlen=2000):
+        self._items = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def append(self, item):
+        with self._lock:
+            self._items.append(item)
+
+    def drain(self):
+        # swap the whole buffer under the lock: O(1) while holding it, oldest entries first
+        with self._lock:
+            items, self._items = self._items, deque(maxlen=self._items.maxlen)
+        return list(items)
+
+    def __len__(self):
+        return len(self._items)
@@ -0,0 +1,258 @@
+"""نسخة محلية من دفتر الأوامر لكل رمز (لقطة + تحديثات فرق تدريجية).
+ملاحظات:
+- الأسعار والكميات في مصفوفات مرتبة (bisect)، فأفضل عرض/طلب O(1) وحساب VWAP لكمية معينة خطي في عدد المستويات فقط.
+- تسلسل تحديثات Binance (U/u) يُتحقق منه؛ أي فجوة تعلّم الدفتر غير متزامن ويُعاد جلب اللقطة،
+  والفروق التي تصل أثناء جلبها تُخزن ثم يُعاد تطبيقها بعد اللقطة (حسب إجراء Binance).
+- تستخدمه عمليات التحويل لتحديد الكمية ضمن انزلاق مقبول، ويستخدمه حساب القيمة بسعر جانب الشراء (bid).
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+
+class BookSide:
+    """جانب واحد من الدفتر؛ المفاتيح مرتبة تصاعدياً (للعروض bids تُخزن الأسعار بالسالب)."""
+
+    def __init__(self, descending):
+        self.sign = -1.0 if descending else 1.0
+        self.keys = []
+        self.qty = []
+
+    def clear(self):
+        self.keys = []
+        self.qty = []
+
+    def set(self, price, amount):
+        key = self.sign * price
+        i = bisect_left(self.keys, key)
+        exists = i < len(self.keys) and self.keys[i] == key
+        if amount <= 0:
+            if exists:
+                del self.keys[i]
+                del self.qty[i]
+        elif exists:
+            self.qty[i] = amount
+        else:
+            self.keys.insert(i, key)
+            self.qty.insert(i, amount)
+
+    def trim(self, depth):
+        if len(self.keys) > depth:
+            del self.keys[depth:]
+            del self.qty[depth:]
+
+    def best(self):
+        return (self.sign * self.keys[0], self.qty[0]) if self.keys else None
+
+    def levels(self, n=None):
+        n = len(self.keys) if n is None else n
+        return [(self.sign * k, q) for k, q in zip(self.keys[:n], self.qty[:n])]
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class LocalOrderBook:
+    def __init__(self, symbol, depth=100, pending_limit=1000):
+        self.symbol = symbol
+        self.depth = depth
+        self.bids = BookSide(descending=True)
+        self.asks = BookSide(descending=False)
+        self.last_update_id = None
+        self.synced = False
+        self.updated_at = None
+        self.resyncs = 0
+        self._first_event = True
+        self._pending = deque(maxlen=pending_limit)  # diffs received while unsynced, replayed after the snapshot
+        self.lock = threading.Lock()
+
+    def load_snapshot(self, snapshot):
+        """تحميل لقطة REST بصيغة ccxt: {'bids': [[p, q]], 'asks': [[p, q]], 'nonce': lastUpdateId}،
+        ثم إعادة تطبيق الفروق المخزنة أثناء جلبها. تعيد False إن كانت اللقطة أقدم من أول فرق مخزن (تلزم لقطة أحدث)."""
+        with self.lock:
+            self.bids.clear()
+            self.asks.clear()
+            for p, q, *_ in snapshot.get('bids') or []:
+                self.bids.set(float(p), float(q))
+            for p, q, *_ in snapshot.get('asks') or []:
+                self.asks.set(float(p), float(q))
+            self.last_update_id = snapshot.get('nonce')
+            self.synced = True
+            self._first_event = True
+            self.updated_at = time.time()
+            # Binance procedure: drop buffered events with u <= lastUpdateId, apply the rest in order
+            pending = list(self._pending)
+            self._pending.clear()
+            for i, event in enumerate(pending):
+                if not self._apply(event):
+                    self.synced = False
+                    self._pending.extend(pending[i:])
+                    break
+            return self.synced
+
+    def apply_diff(self, event):
+        """تطبيق حدث depthUpdate من Binance (U, u, b, a). تعيد False إن لم يكن الدفتر متزامناً
+        (يُخزن الحدث لحين وصول اللقطة) أو ظهرت فجوة تستلزم إعادة المزامنة."""
+        with self.lock:
+            if not self.synced or self.last_update_id is None:
+                self._pending.append(event)
+                return False
+            if self._apply(event):
+                return True
+            # gap: this event is the first one the next snapshot has to be replayed into
+            self.synced = False
+            self.resyncs += 1
+            self._pending.clear()
+            self._pending.append(event)
+            return False
+
+    def _apply(self, event):
+        # caller holds self.lock
+        first, final = event.get('U'), event.get('u')
+        if final is not None and final <= self.last_update_id:
+            return True  # already contained in the snapshot
+        if first is not None:
+            expected = self.last_update_id + 1
+            if not (first <= expected <= final if self._first_event else first == expected):
+                return False
+        for p, q in event.get('b') or []:
+            self.bids.set(float(p), float(q))
+        for p, q in event.get('a') or []:
+            self.asks.set(float(p), float(q))
+        # keep some slack beyond the requested depth so removals do not open holes at the edge
+        self.bids.trim(self.depth * 2)
+        self.asks.trim(self.depth * 2)
+        if final is not None:
+            self.last_update_id = final
+        self._first_event = False
+        self.updated_at = time.time()
+        return True
+
+    def best_bid(self):
+        b = self.bids.best()
+        return b[0] if b else None
+
+    def best_ask(self):
+        a = self.asks.best()
+        return a[0] if a else None
+
+    def mid(self):
+        bid, ask = self.best_bid(), self.best_ask()
+        return (bid + ask) / 2 if bid is not None and ask is not None else None
+
+    def vwap(self, side, amount):
+        """متوسط سعر التنفيذ لكمية amount (بالعملة الأساس). side='sell' يأكل العروض، 'buy' يأكل الطلبات.
+        تعيد (متوسط السعر، الكمية الممكن تنفيذها)."""
+        book = self.bids if side == 'sell' else self.asks
+        remaining = amount
+        cost = 0.0
+        with self.lock:
+            for price, qty in book.levels():
+                take = qty if qty < remaining else remaining
+                cost += take * price
+                remaining -= take
+                if remaining <= 0:
+                    break
+        filled = amount - max(0.0, remaining)
+        return (cost / filled if filled else None), filled
+
+    def slippage(self, side, amount):
+        """الانزلاق النسبي لمتوسط التنفيذ مقارنة بأفضل سعر."""
+        best = self.best_bid() if side == 'sell' else self.best_ask()
+        avg, filled = self.vwap(side, amount)
+        if not best or avg is None:
+            return None
+        return abs(avg - best) / best
+
+    def max_amount_within(self, side, max_slippage):
+        """أكبر كمية يمكن تنفيذها دون أن يتجاوز متوسط السعر الانزلاق المسموح."""
+        book = self.bids if side == 'sell' else self.asks
+        with self.lock:
+            levels = book.levels()
+        if not levels:
+            return 0.0
+        best = levels[0][0]
+        limit = best * (1 - max_slippage) if side == 'sell' else best * (1 + max_slippage)
+        filled = cost = 0.0
+        for price, qty in levels:
+            # the largest take at this level that keeps the running average within the limit
+            if side == 'sell':
+                room = (cost - limit * filled) / (limit - price) if price < limit else qty
+            else:
+                room = (limit * filled - cost) / (price - limit) if price > limit else qty
+            take = max(0.0, min(qty, room))
+            filled += take
+            cost += take * price
+            if take < qty:
+                break
+        return filled
+
+
+class OrderBookManager:
+    def __init__(self, backend, depth=100, max_age=5.0):
+        self.backend = backend
+        self.depth = depth
+        self.max_age = max_age  # REST snapshots older than this are refreshed before sizing orders
+        self.books = {}
+        self._lock = threading.Lock()
+        self._resyncing = set()
+        self.snapshot_attempts = 3
+
+    def get(self, symbol):
+        """الدفتر إن كان متزامناً وحديثاً فقط (بدون أي طلب شبكة)."""
+        book = self.books.get(symbol)
+        if book is None or not book.synced or book.updated_at is None or time.time() - book.updated_at > self.max_age:
+            return None
+        return book
+
+    def _book(self, symbol):
+        with self._lock:
+            book = self.books.get(symbol)
+            if book is None:
+                book = self.books[symbol] = LocalOrderBook(symbol, self.depth)
+            return book
+
+    def load(self, symbol, snapshot):
+        """تحميل لقطة جُلبت من خارج المدير (مثلاً من AsyncBackend)."""
+        book = self._book(symbol)
+        book.load_snapshot(snapshot)
+        return book
+
+    def resync(self, symbol):
+        return self.load(symbol, self.backend.api('fetch_order_book', symbol, self.depth))
+
+    def book(self, symbol, max_age=None):
+        """دفتر متزامن وحديث للرمز، مع جلب لقطة جديدة عند الحاجة."""
+        max_age = self.max_age if max_age is None else max_age
+        book = self.books.get(symbol)
+        if book is None or not book.synced or book.updated_at is None or time.time() - book.updated_at > max_age:
+            book = self.resync(symbol)
+        return book
+
+    def apply_diff(self, symbol, event):
+        """تطبيق حدث فرق من البث؛ عند غياب الدفتر أو وجود فجوة يُخزن الحدث وتُجلب لقطة جديدة في خيط منفصل."""
+        if self._book(symbol).apply_diff(event):
+            return True
+        self._schedule_resync(symbol)
+        return False
+
+    def _schedule_resync(self, symbol):
+        # called from the stream's event loop: never block it on a REST snapshot
+        with self._lock:
+            if symbol in self._resyncing:
+                return
+            self._resyncing.add(symbol)
+
+        def run():
+            try:
+                for _ in range(self.snapshot_attempts):
+                    # a snapshot older than the first buffered diff is useless: fetch a newer one
+                    if self.resync(symbol).synced:
+                        break
+            except Exception as e:
+                self.backend.log('فشل إعادة مزامنة دفتر {}: {}', symbol, e)
+            finally:
+                with self._lock:
+                    self._resyncing.discard(symbol)
+        threading.Thread(target=run, daemon=True).start()
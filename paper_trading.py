@@ -0,0 +1,447 @@
+"""محاكي تداول ورقي خلف نفس واجهة Backend (بديل عن وضع المحاكاة الذي يكتفي بالتسجيل).
+ملاحظات:
+- PaperExchange يطابق طرق ccxt التي يستخدمها Backend: الرصيد والأوامر والإلغاء افتراضية بالكامل
+  (دفتر أرصدة free/used محلي)، أما بيانات السوق فتُمرر إلى المنصة الحقيقية في الوضع الحي أو تأتي من إعادة التشغيل.
+- الأوامر السوقية تُنفذ بالمشي على مستويات دفتر الأوامر (النسخة المحلية الحية، أو دفتر اصطناعي حول آخر سعر)،
+  فالانزلاق ناتج عن العمق نفسه، والرسوم تُخصم من العملة المستلمة كما في Binance.
+- الأوامر المحددة تُحجز أرصدتها وتُطابق عند عبور السعر (أو أدنى/أعلى الشمعة أثناء إعادة التشغيل).
+- دفتر الأرصدة والأوامر محمي بقفل واحد (self.lock) لأنه يُستدعى من مجمع التحويل وخيط الأسعار ومنفذي الواجهة غير المتزامنة.
+- ReplayFeed يعيد تشغيل أسعار مسجلة (JSONL) أو شموع من CandleStore بأقصى سرعة لاختبار الاستراتيجيات دون اتصال.
+"""
+import heapq
+import itertools
+import json
+import threading
+import time
+
+try:
+    from ccxt import InsufficientFunds, OrderNotFound, BadSymbol, NotSupported
+except ImportError:  # keeps offline backtests usable without ccxt
+    class InsufficientFunds(Exception):
+        pass
+
+    class OrderNotFound(Exception):
+        pass
+
+    class BadSymbol(Exception):
+        pass
+
+    class NotSupported(Exception):
+        pass
+
+# market data calls forwarded to the live exchange; everything else is handled by the ledger
+MARKET_DATA_METHODS = frozenset({'load_markets', 'fetch_ticker', 'fetch_tickers', 'fetch_order_book', 'fetch_ohlcv'})
+EPS = 1e-9  # relative tolerance for float ledger comparisons
+
+
+class PaperExchange:
+    def __init__(self, market_index, balances=None, fee=0.001, source=None, book_provider=None,
+                 spread=0.0005, level_step=0.0005, level_notional=5000.0, quote='USDT'):
+        self.id = 'paper'
+        self.index = market_index
+        self.fee = fee
+        self.source = source  # live ccxt exchange for market data, None for replay
+        self.book_provider = book_provider  # symbol -> LocalOrderBook (live depth), optional
+        self.spread = spread  # synthetic book: relative bid/ask spread
+        self.level_step = level_step  # synthetic book: relative distance between levels
+        self.level_notional = level_notional  # synthetic book: quote value resting on each level
+        self.quote = quote
+        self.has = {'cancelAllOrders': True, 'fetchOrderBook': True, 'fetchOHLCV': source is not None}
+        self.free = {}
+        self.used = {}
+        self.prices = {}  # symbol -> last mark price
+        self.now = None  # replay clock in ms; None = wall clock
+        self.orders = {}  # id -> order dict (all orders, ccxt format)
+        self.open_orders = {}  # id -> order dict for resting limits
+        self.trades = []  # (timestamp, symbol, side, amount, price, fee, fee_currency)
+        self.fees_paid = {}
+        self._ids = itertools.count(1)
+        self.start_balances = {}
+        self.start_value = None
+        # the ledger is shared by the conversion pool, the price poll thread and async executors
+        self.lock = threading.RLock()
+        self.reset(balances)
+
+    # --- ledger ------------------------------------------------------------------
+    def reset(self, balances=None):
+        with self.lock:
+            self.free = {a: float(v) for a, v in (balances or {self.quote: 1000.0}).items() if float(v) > 0}
+            self.used = {}
+            self.orders.clear()
+            self.open_orders.clear()
+            self.trades = []
+            self.fees_paid = {}
+            self.start_balances = dict(self.free)
+            self.start_value = None
+
+    def _credit(self, asset, amount):
+        self.free[asset] = self.free.get(asset, 0.0) + amount
+
+    def _debit(self, asset, amount, book=None):
+        book = self.free if book is None else book
+        left = book.get(asset, 0.0) - amount
+        if left < -EPS * max(1.0, amount):
+            raise InsufficientFunds(f'paper account has insufficient balance for {asset}')
+        book[asset] = max(0.0, left)
+
+    def _timestamp(self):
+        return self.now if self.now is not None else int(time.time() * 1000)
+
+    def is_virtual(self, name):
+        """True إن كانت الطريقة تُنفذ محلياً دون أي طلب شبكة."""
+        return self.source is None or name not in MARKET_DATA_METHODS
+
+    @property
+    def last_response_headers(self):
+        return getattr(self.source, 'last_response_headers', None)
+
+    # --- market data -------------------------------------------------------------
+    def set_prices(self, prices, ts=None, lows=None, highs=None):
+        """تحديث أسعار العلامة (وساعة إعادة التشغيل) ومطابقة الأوامر المحددة التي عبرها السعر."""
+        with self.lock:
+            if ts is not None:
+                self.now = int(ts)
+            for sym, p in prices.items():
+                self.prices[sym] = float(p)
+            if self.start_value is None and self.prices:
+                self.start_value = self.value(self.start_balances)
+            if self.open_orders:
+                self._match_resting(prices, lows, highs)
+
+    def _mark(self, tickers):
+        with self.lock:
+            for sym, t in tickers.items():
+                last = t.get('last') if t else None
+                if last:
+                    self.prices[sym] = float(last)
+
+    def load_markets(self, reload=False, params=None):
+        if self.source is None:
+            raise NotSupported('paper replay uses the cached market index')
+        return self.source.load_markets(reload)
+
+    def fetch_ticker(self, symbol, params=None):
+        if self.source is not None:
+            t = self.source.fetch_ticker(symbol)
+            self._mark({symbol: t})
+            return t
+        return self._synthetic_ticker(symbol)
+
+    def fetch_tickers(self, symbols=None, params=None):
+        if self.source is not None:
+            tickers = self.source.fetch_tickers(symbols) or {}
+            self._mark(tickers)
+            return tickers
+        wanted = symbols if symbols else list(self.prices)
+        return {s: self._synthetic_ticker(s) for s in wanted if s in self.prices}
+
+    def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params=None):
+        if self.source is None:
+            raise NotSupported('paper replay has no OHLCV endpoint')
+        return self.source.fetch_ohlcv(symbol, timeframe, since, limit)
+
+    def fetch_order_book(self, symbol, limit=100, params=None):
+        if self.source is not None:
+            return self.source.fetch_order_book(symbol, limit)
+        return {'symbol': symbol, 'bids': [list(l) for l in itertools.islice(self._levels(symbol, 'sell'), limit)],
+                'asks': [list(l) for l in itertools.islice(self._levels(symbol, 'buy'), limit)],
+                'nonce': None, 'timestamp': self._timestamp()}
+
+    def _synthetic_ticker(self, symbol):
+        p = self.prices.get(symbol)
+        if p is None:
+            raise BadSymbol(f'paper exchange has no price for {symbol}')
+        half = p * self.spread / 2
+        return {'symbol': symbol, 'last': p, 'close': p, 'bid': p - half, 'ask': p + half,
+                'timestamp': self._timestamp()}
+
+    def _levels(self, symbol, side):
+        """مستويات (سعر، كمية) التي يأكلها أمر في الاتجاه side، من الأفضل للأسوأ."""
+        if self.book_provider is not None:
+            book = self.book_provider(symbol)
+            if book is not None:
+                with book.lock:
+                    levels = (book.bids if side == 'sell' else book.asks).levels()
+                if levels:
+                    return iter(levels)
+        p = self.prices.get(symbol)
+        if p is None:
+            raise BadSymbol(f'paper exchange has no price for {symbol}')
+        return self._synthetic_levels(p, side)
+
+    def _synthetic_levels(self, p, side):
+        sign = -1.0 if side == 'sell' else 1.0
+        best = p * (1 + sign * self.spread / 2)
+        qty = self.level_notional / p
+        for i in itertools.count():
+            yield best * (1 + sign * self.level_step * i), qty
+
+    # --- orders -------------------------------------------------------------------
+    def _meta(self, symbol):
+        meta = self.index.get(symbol) if self.index is not None else None
+        if meta is None:
+            if '/' not in symbol:
+                raise BadSymbol(f'paper exchange does not have market symbol {symbol}')
+            base, quote = symbol.split('/', 1)
+            return symbol, base, quote
+        return meta.symbol, meta.base, meta.quote
+
+    def _walk(self, symbol, side, amount=None, budget=None, limit_price=None):
+        """تنفيذ على الدفتر حتى كمية amount (أو إنفاق budget من quote للشراء). تعيد (الكمية، التكلفة)."""
+        filled = cost = 0.0
+        for price, qty in self._levels(symbol, side):
+            if limit_price is not None and (price < limit_price if side == 'sell' else price > limit_price):
+                break
+            take = qty
+            if amount is not None:
+                take = min(take, amount - filled)
+            if budget is not None:
+                take = min(take, (budget - cost) / price)
+            if take <= 0:
+                break
+            filled += take
+            cost += take * price
+            if (amount is not None and filled >= amount * (1 - EPS)) or (budget is not None and cost >= budget * (1 - EPS)):
+                break
+        return filled, cost
+
+    def _settle(self, symbol, base, quote, side, filled, cost):
+        # taker fee comes out of what is received, like Binance without BNB fee discount
+        if side == 'sell':
+            self._debit(base, filled)
+            fee = cost * self.fee
+            self._credit(quote, cost - fee)
+            fee_ccy = quote
+        else:
+            self._debit(quote, cost)
+            fee = filled * self.fee
+            self._credit(base, filled - fee)
+            fee_ccy = base
+        self.fees_paid[fee_ccy] = self.fees_paid.get(fee_ccy, 0.0) + fee
+        self.trades.append((self._timestamp(), symbol, side, filled, cost / filled if filled else 0.0, fee, fee_ccy))
+        return {'currency': fee_ccy, 'cost': fee}
+
+    def create_order(self, symbol, type, side, amount, price=None, params=None):
+        with self.lock:
+            symbol, base, quote = self._meta(symbol)
+            amount = float(amount)
+            price = float(price) if price is not None else None
+            if amount <= 0:
+                raise InsufficientFunds(f'paper order amount must be positive: {amount}')
+            oid = str(next(self._ids))
+            order = {'id': oid, 'clientOrderId': None, 'timestamp': self._timestamp(), 'symbol': symbol,
+                     'type': type, 'side': side, 'price': price, 'amount': amount, 'filled': 0.0,
+                     'remaining': amount, 'cost': 0.0, 'average': None, 'status': 'open', 'fee': None,
+                     'base': base, 'quote': quote}
+            if type == 'market':
+                if side == 'sell' and self.free.get(base, 0.0) < amount * (1 - EPS):
+                    raise InsufficientFunds(f'paper account has insufficient balance for {base}')
+                budget = self.free.get(quote, 0.0) if side == 'buy' else None
+                filled, cost = self._walk(symbol, side, amount, budget)
+                if budget is not None and filled < amount * (1 - EPS) and cost >= budget * (1 - EPS):
+                    raise InsufficientFunds(f'paper account has insufficient balance for {quote}')
+                self._fill(order, filled, cost)
+                # market orders never rest: an unfilled remainder expires like Binance IOC
+                order['status'] = 'closed' if order['remaining'] <= order['amount'] * EPS else 'expired'
+            elif type == 'limit':
+                if price is None:
+                    raise InsufficientFunds('paper limit order needs a price')
+                asset, need = (base, amount) if side == 'sell' else (quote, amount * price)
+                if self.free.get(asset, 0.0) < need * (1 - EPS):
+                    raise InsufficientFunds(f'paper account has insufficient balance for {asset}')
+                # marketable part fills immediately as taker, up to the limit price
+                filled, cost = self._walk(symbol, side, amount, limit_price=price)
+                self._fill(order, filled, cost)
+                if order['remaining'] > order['amount'] * EPS:
+                    self._reserve(order, order['remaining'])
+                    self.open_orders[oid] = order
+                else:
+                    order['status'] = 'closed'
+            else:
+                raise NotSupported(f'paper exchange does not support {type} orders')
+            self.orders[oid] = order
+            return dict(order)
+
+    def _reserve(self, order, remaining):
+        if order['side'] == 'sell':
+            self._debit(order['base'], remaining)
+            self.used[order['base']] = self.used.get(order['base'], 0.0) + remaining
+        else:
+            need = remaining * order['price']
+            self._debit(order['quote'], need)
+            self.used[order['quote']] = self.used.get(order['quote'], 0.0) + need
+
+    def _release_reserved(self, order, remaining):
+        if order['side'] == 'sell':
+            asset, amount = order['base'], remaining
+        else:
+            asset, amount = order['quote'], remaining * order['price']
+        self._debit(asset, amount, self.used)
+        self._credit(asset, amount)
+
+    def _fill(self, order, filled, cost):
+        if filled <= 0:
+            return
+        fee = self._settle(order['symbol'], order['base'], order['quote'], order['side'], filled, cost)
+        order['filled'] += filled
+        order['remaining'] = max(0.0, order['amount'] - order['filled'])
+        order['cost'] += cost
+        order['average'] = order['cost'] / order['filled']
+        prev = order['fee']
+        order['fee'] = fee if prev is None else {'currency': fee['currency'], 'cost': prev['cost'] + fee['cost']}
+
+    def _match_resting(self, prices, lows=None, highs=None):
+        for oid, order in list(self.open_orders.items()):
+            sym = order['symbol']
+            if sym not in prices:
+                continue
+            # a candle's low/high reaching the limit counts as a fill at the limit price (maker)
+            if order['side'] == 'sell':
+                reached = (highs or prices).get(sym, prices[sym])
+                hit = reached >= order['price']
+            else:
+                reached = (lows or prices).get(sym, prices[sym])
+                hit = reached <= order['price']
+            if not hit:
+                continue
+            remaining = order['remaining']
+            self._release_reserved(order, remaining)
+            self._fill(order, remaining, remaining * order['price'])
+            order['status'] = 'closed'
+            del self.open_orders[oid]
+
+    def create_market_order(self, symbol, side, amount, price=None, params=None):
+        return self.create_order(symbol, 'market', side, amount, None, params)
+
+    def create_market_sell_order(self, symbol, amount, params=None):
+        return self.create_order(symbol, 'market', 'sell', amount, None, params)
+
+    def create_market_buy_order(self, symbol, amount, params=None):
+        return self.create_order(symbol, 'market', 'buy', amount, None, params)
+
+    def create_limit_order(self, symbol, side, amount, price, params=None):
+        return self.create_order(symbol, 'limit', side, amount, price, params)
+
+    def cancel_order(self, id, symbol=None, params=None):
+        with self.lock:
+            order = self.open_orders.pop(id, None)
+            if order is None:
+                raise OrderNotFound(f'paper order {id} not found')
+            self._release_reserved(order, order['remaining'])
+            order['status'] = 'canceled'
+            return dict(order)
+
+    def cancel_all_orders(self, symbol=None, params=None):
+        with self.lock:
+            ids = [i for i, o in self.open_orders.items() if symbol is None or o['symbol'] == symbol]
+            return [self.cancel_order(i) for i in ids]
+
+    def fetch_open_orders(self, symbol=None, since=None, limit=None, params=None):
+        with self.lock:
+            return [dict(o) for o in self.open_orders.values() if symbol is None or o['symbol'] == symbol]
+
+    def fetch_order(self, id, symbol=None, params=None):
+        with self.lock:
+            order = self.orders.get(id)
+            if order is None:
+                raise OrderNotFound(f'paper order {id} not found')
+            return dict(order)
+
+    def fetch_balance(self, params=None):
+        with self.lock:
+            assets = set(self.free) | set(self.used)
+            free = {a: self.free.get(a, 0.0) for a in assets}
+            used = {a: self.used.get(a, 0.0) for a in assets}
+            total = {a: free[a] + used[a] for a in assets}
+            balance = {'free': free, 'used': used, 'total': total}
+            for a in assets:
+                balance[a] = {'free': free[a], 'used': used[a], 'total': total[a]}
+            return balance
+
+    def withdraw(self, code, amount, address, tag=None, params=None):
+        raise NotSupported('paper account cannot withdraw')
+
+    # --- performance ---------------------------------------------------------------
+    def value(self, balances=None):
+        """قيمة أرصدة (الحالية افتراضياً) بعملة quote حسب أسعار العلامة، مباشرة أو عبر عملة وسيطة واحدة."""
+        with self.lock:
+            if balances is None:
+                balances = {a: self.free.get(a, 0.0) + self.used.get(a, 0.0) for a in set(self.free) | set(self.used)}
+            return sum(amt * self.quote_price(asset) for asset, amt in balances.items() if amt)
+
+    def quote_price(self, asset):
+        if asset == self.quote:
+            return 1.0
+        p = self.prices.get(f'{asset}/{self.quote}')
+        if p is not None:
+            return p
+        prefix = asset + '/'
+        for sym, p in self.prices.items():
+            if sym.startswith(prefix):
+                hop = self.prices.get(f'{sym[len(prefix):]}/{self.quote}')
+                if hop is not None:
+                    return p * hop
+        return 0.0  # unpriced assets count as zero
+
+    def pnl(self):
+        """الربح/الخسارة منذ بداية المحاكاة بأسعار العلامة الحالية."""
+        with self.lock:
+            start = self.start_value if self.start_value is not None else self.value(self.start_balances)
+            now = self.value()
+            return {'start_value': start, 'value': now, 'pnl': now - start,
+                    'pnl_pct': (now - start) / start * 100 if start else None,
+                    'trades': len(self.trades), 'fees': dict(self.fees_paid), 'open_orders': len(self.open_orders)}
+
+
+class ReplayFeed:
+    """إطارات أسعار مرتبة زمنياً: (ts بالمللي ثانية، {رمز: سعر}، {رمز: أدنى} أو None، {رمز: أعلى} أو None)."""
+
+    def __init__(self, frames):
+        self.frames = frames
+
+    @classmethod
+    def from_jsonl(cls, path):
+        """من ملف سجل الأسعار (سطر لكل تحديث: {"ts": ms, "prices": {...}}) كما يكتبه Backend.record_tickers."""
+        def frames():
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        continue  # a torn last line from an interrupted writer
+                    prices = row.get('prices')
+                    if prices:
+                        yield row.get('ts'), {s: float(p) for s, p in prices.items()}, None, None
+        return cls(frames())
+
+    @classmethod
+    def from_candles(cls, store, symbols, timeframe='1m'):
+        """من شموع CandleStore المخزنة؛ كل شمعة تعطي سعر الإغلاق وأدنى/أعلى سعر لمطابقة الأوامر المحددة."""
+        def rows(sym):
+            cols = store.series(sym, timeframe).columns()
+            ts, low, high, close = cols['ts'], cols['low'], cols['high'], cols['close']
+            for i in range(len(ts)):
+                yield int(ts[i]), sym, float(close[i]), float(low[i]), float(high[i])
+
+        def frames():
+            current, closes, lows, highs = None, {}, {}, {}
+            for ts, sym, c, lo, hi in heapq.merge(*(rows(s) for s in symbols)):
+                if ts != current and closes:
+                    yield current, closes, lows, highs
+                    closes, lows, highs = {}, {}, {}
+                current = ts
+                closes[sym], lows[sym], highs[sym] = c, lo, hi
+            if closes:
+                yield current, closes, lows, highs
+        return cls(frames())
+
+    def run(self, paper, on_frame=None):
+        """إعادة التشغيل بأقصى سرعة؛ on_frame(ts, prices, paper) تُستدعى بعد كل إطار (منطق الاستراتيجية).
+        تعيد عدد الإطارات."""
+        count = 0
+        for ts, prices, lows, highs in self.frames:
+            paper.set_prices(prices, ts, lows, highs)
+            if on_frame is not None:
+                on_frame(ts, prices, paper)
+            count += 1
+        return count
@@ -0,0 +1,233 @@
+"""بث الأسعار عبر WebSocket (combined streams من Binance) كبديل لحلقة الاستطلاع في Backend.
+ملاحظات:
+- يعمل داخل خيط مستقل بحلقة asyncio خاصة به، ويكتب الأسعار في مخزن Backend.market_state عبر update_tickers.
+- يعتمد على aiohttp (مثبت أصلاً كاعتمادية لـ ccxt). إن لم يتوفر يرجع Backend إلى الاستطلاع.
+  يُستورد داخل خيط البث عند أول تشغيل، لا عند بدء التطبيق.
+- قناة depth@100ms (اختيارية) تغذي نسخة دفتر الأوامر المحلية في Backend.order_books.
+- عنوان الخادم قابل للتغيير (base_url) لتشغيله مقابل خادم WebSocket محلي للاختبار.
+"""
+import asyncio
+import importlib.util
+import json
+import random
+import threading
+import time
+from decimal import Decimal
+
+aiohttp = None  # imported by load_aiohttp() on the stream thread
+_HAS_AIOHTTP = None
+
+
+def aiohttp_available():
+    global _HAS_AIOHTTP
+    if _HAS_AIOHTTP is None:
+        _HAS_AIOHTTP = aiohttp is not None or importlib.util.find_spec('aiohttp') is not None
+    return _HAS_AIOHTTP
+
+
+def load_aiohttp():
+    global aiohttp
+    if aiohttp is None:
+        import aiohttp as module
+        aiohttp = module
+    return aiohttp
+
+DEFAULT_STREAM_URL = 'wss://stream.binance.com:9443/stream'
+
+
+def stream_name(symbol, channel):
+    # 'BTC/USDT' -> 'btcusdt@miniTicker'
+    return symbol.replace('/', '').lower() + '@' + channel
+
+
+class PriceStream:
+    """عميل combined-stream مع إعادة اتصال (backoff) ومراقبة نبض الاتصال."""
+
+    CHANNELS = ('miniTicker', 'bookTicker', 'depth@100ms')
+
+    def __init__(self, backend, symbols, channels=('miniTicker',), base_url=DEFAULT_STREAM_URL,
+                 heartbeat=20, stale_timeout=60, backoff_initial=1.0, backoff_max=60.0):
+        self.backend = backend
+        self.symbols = list(symbols)
+        self.channels = [c for c in channels if c in self.CHANNELS] or ['miniTicker']
+        self.base_url = base_url
+        self.heartbeat = heartbeat
+        self.stale_timeout = stale_timeout
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self._thread = None
+        self._loop = None
+        self._stop = None
+        self._stopping = threading.Event()  # set by stop(); covers the window before _stop exists
+        self._ws = None
+        self._request_id = 0
+        self._ids = {s.replace('/', '').upper(): s for s in self.symbols}
+        self.connected = False
+        self.reconnects = 0
+        self.messages = 0
+        self.last_message_at = None
+
+    @staticmethod
+    def available():
+        return aiohttp_available()
+
+    def url(self):
+        streams = '/'.join(stream_name(s, c) for s in self.symbols for c in self.channels)
+        return f'{self.base_url}?streams={streams}'
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return True
+        if not self.available():
+            self.backend.log('aiohttp غير متوفر - لا يمكن تشغيل بث الأسعار.')
+            return False
+        if not self.symbols:
+            self.backend.log('لا توجد رموز لبث الأسعار.')
+            return False
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._thread_main, daemon=True)
+        self._thread.start()
+        return True
+
+    def set_symbols(self, symbols):
+        """تغيير الرموز المشترك بها دون قطع الاتصال (SUBSCRIBE/UNSUBSCRIBE)."""
+        symbols = list(symbols)
+        added = [s for s in symbols if s not in self.symbols]
+        removed = [s for s in self.symbols if s not in symbols]
+        self.symbols = symbols  # used by url() on the next reconnect
+        self._ids = {s.replace('/', '').upper(): s for s in symbols}
+        loop = self._loop
+        if self._ws is None or loop is None or loop.is_closed():
+            return
+        for method, group in (('UNSUBSCRIBE', removed), ('SUBSCRIBE', added)):
+            if group:
+                params = [stream_name(s, c) for s in group for c in self.channels]
+                try:
+                    asyncio.run_coroutine_threadsafe(self._send(method, params), loop)
+                except RuntimeError:
+                    pass
+
+    async def _send(self, method, params):
+        ws = self._ws
+        if ws is None or ws.closed:
+            return
+        self._request_id += 1
+        try:
+            await ws.send_str(json.dumps({'method': method, 'params': params, 'id': self._request_id}))
+        except Exception as e:
+            self.backend.log('تعذر تحديث اشتراكات البث: {}', e)
+
+    def stop(self, timeout=5):
+        # flag first: a thread that has not created _stop yet picks it up in _thread_main
+        self._stopping.set()
+        loop, stop = self._loop, self._stop
+        if loop and stop and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(stop.set)
+            except RuntimeError:
+                pass
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _thread_main(self):
+        loop = asyncio.new_event_loop()
+        self._loop = loop
+        try:
+            asyncio.set_event_loop(loop)
+            self._stop = asyncio.Event()
+            if self._stopping.is_set():
+                self._stop.set()  # stop() ran before the event existed
+            loop.run_until_complete(self._run())
+        except Exception as e:
+            self.backend.log('خطأ في خيط بث الأسعار: {}', e)
+        finally:
+            self.connected = False
+            loop.close()
+
+    async def _run(self):
+        load_aiohttp()
+        backoff = self.backoff_initial
+        timeout = aiohttp.ClientTimeout(total=None, connect=15)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            while not self._stop.is_set():
+                try:
+                    async with session.ws_connect(self.url(), heartbeat=self.heartbeat, autoping=True) as ws:
+                        self.connected = True
+                        self._ws = ws
+                        backoff = self.backoff_initial
+                        self.backend.log('تم الاتصال ببث الأسعار ({} رمز).', len(self.symbols))
+                        await self._consume(ws)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.backend.log('انقطع بث الأسعار: {}', e)
+                self.connected = False
+                self._ws = None
+                if self._stop.is_set():
+                    break
+                # exponential backoff with jitter before reconnecting
+                delay = min(self.backoff_max, backoff) * (0.5 + random.random() / 2)
+                backoff = min(self.backoff_max, backoff * 2)
+                self.reconnects += 1
+                try:
+                    await asyncio.wait_for(self._stop.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _consume(self, ws):
+        stop_wait = asyncio.ensure_future(self._stop.wait())
+        try:
+            while not self._stop.is_set():
+                recv = asyncio.ensure_future(ws.receive())
+                done, _ = await asyncio.wait({recv, stop_wait}, timeout=self.stale_timeout,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if recv not in done:
+                    recv.cancel()
+                    if not self._stop.is_set():
+                        # no data (and no pong-driven close) within stale_timeout: force reconnect
+                        self.backend.log('لم تصل بيانات من بث الأسعار - إعادة الاتصال.')
+                    await ws.close()
+                    return
+                msg = recv.result()
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    self.handle_message(msg.data)
+                elif msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSING,
+                                  aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                    return
+        finally:
+            stop_wait.cancel()
+
+    def handle_message(self, raw):
+        """تحليل رسالة combined-stream وتحديث سعر الرمز. تعيد (الرمز، السعر) أو None."""
+        try:
+            payload = json.loads(raw)
+        except ValueError:
+            return None
+        data = payload.get('data', payload)
+        if not isinstance(data, dict):
+            return None
+        symbol = self._ids.get(str(data.get('s', '')).upper())
+        if symbol is None:
+            return None
+        if data.get('e') == 'depthUpdate':
+            # diff depth event: feeds the local order book mirror, not the price store
+            self.backend.order_books.apply_diff(symbol, data)
+            self.messages += 1
+            self.last_message_at = time.time()
+            return None
+        if 'c' in data:
+            # miniTicker: close price
+            price = data.get('c')
+        elif 'b' in data and 'a' in data:
+            # bookTicker: mid of best bid/ask
+            price = (Decimal(str(data['b'])) + Decimal(str(data['a']))) / 2
+        else:
+            return None
+        if price is None:
+            return None
+        price = Decimal(str(price))
+        self.backend.update_tickers({symbol: price})
+        self.messages += 1
+        self.last_message_at = time.time()
+        return symbol, price
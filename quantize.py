@@ -0,0 +1,124 @@
+"""تقريب الكميات والأسعار إلى حجم الخطوة (LOT_SIZE) وحجم التيك (PRICE_FILTER) بأعداد صحيحة.
+ملاحظات:
+- حجم الخطوة يُحلل مرة واحدة لكل سوق إلى (units, scale) بحيث step = units / 10**scale،
+  ثم يتم القص والتقريب بعمليات صحيحة فقط، بدون Decimal وبدون سلاسل تنسيق لكل أمر.
+- الناتج هو النص الجاهز للإرسال (wire string) بنفس شكل Backend.format_quantity القديم: بلا أصفار زائدة.
+- الأعداد العشرية float تُقرأ من repr (أقصر تمثيل)، فالنتيجة مطابقة لـ Decimal(str(x)) المستخدم سابقاً.
+- القص يكون إلى أقرب مضاعف للخطوة نحو الصفر (وليس فقط إلى عدد الخانات)، فخطوات مثل 0.5 أو 10 صحيحة أيضاً.
+"""
+from decimal import Decimal, ROUND_DOWN
+
+
+class Quantizer:
+    """خطوة واحدة (كمية أو سعر) محولة إلى عدد صحيح units بمقياس 10**-scale."""
+
+    __slots__ = ('units', 'scale', 'pow10')
+
+    def __init__(self, units, scale):
+        if units <= 0 or scale < 0:
+            raise ValueError(f'خطوة غير صالحة: {units}e-{scale}')
+        self.units = units
+        self.scale = scale
+        self.pow10 = 10 ** scale
+
+    @classmethod
+    def from_step(cls, step):
+        """من حجم خطوة Binance ('0.00100000' أو Decimal أو float)."""
+        d = Decimal(str(step)).normalize()
+        sign, digits, exp = d.as_tuple()
+        if sign or not any(digits):
+            raise ValueError(f'خطوة غير صالحة: {step}')
+        units = int(''.join(map(str, digits)))
+        if exp >= 0:
+            return cls(units * 10 ** exp, 0)
+        return cls(units, -exp)
+
+    @classmethod
+    def for_precision(cls, precision):
+        """خطوة 10**-precision (مثل format_quantity القديم)."""
+        return cls(1, max(0, int(precision)))
+
+    @property
+    def step(self):
+        return Decimal(self.units).scaleb(-self.scale)
+
+    def _parse(self, x):
+        # (x truncated towards zero in units of 10**-scale, sign of the part that was cut off)
+        if isinstance(x, int):
+            return x * self.pow10, 0
+        s = repr(x) if isinstance(x, float) else str(x)
+        if 'e' in s or 'E' in s or 'n' in s:
+            # exponent notation (or nan/inf, which are rejected)
+            d = Decimal(s)
+            if not d.is_finite():
+                raise ValueError(f'قيمة غير صالحة: {x}')
+            shifted = d.scaleb(self.scale)
+            n = int(shifted.to_integral_value(rounding=ROUND_DOWN))
+            return n, (shifted > n) - (shifted < n)
+        neg = s.startswith('-')
+        if neg or s.startswith('+'):
+            s = s[1:]
+        ip, _, fp = s.partition('.')
+        scale = self.scale
+        n = int((ip or '0') + fp[:scale].ljust(scale, '0')) if scale else int(ip or '0')
+        cut = 1 if fp[scale:].strip('0') else 0
+        return (-n, -cut) if neg else (n, cut)
+
+    def scaled(self, x):
+        """x مقطوعاً نحو الصفر إلى scale خانة، كعدد صحيح من وحدات 10**-scale."""
+        # hot path of every order: same result as _parse()[0] without tracking the cut-off digits
+        if x.__class__ is float:
+            s = repr(x)
+            if 'e' not in s and 'n' not in s:
+                ip, _, fp = s.partition('.')
+                scale = self.scale
+                return int(ip + fp[:scale].ljust(scale, '0')) if scale else int(ip)
+        return self._parse(x)[0]
+
+    def floor(self, x):
+        """x مقطوعاً نحو الصفر إلى مضاعف للخطوة (بوحدات 10**-scale)."""
+        n = self.scaled(x)
+        if n < 0:
+            return -((-n) - (-n) % self.units)
+        return n - n % self.units
+
+    def ceil(self, x):
+        """أصغر مضاعف للخطوة لا يقل عن x (بوحدات 10**-scale)."""
+        n, cut = self._parse(x)
+        if cut > 0:
+            n += 1
+        r = n % self.units
+        return n + (self.units - r) if r else n
+
+    def wire(self, n):
+        """نص الإرسال لعدد صحيح بوحدات 10**-scale، بدون أصفار زائدة."""
+        if not self.scale:
+            return str(n)
+        sign = '-' if n < 0 else ''
+        digits = str(-n if n < 0 else n).rjust(self.scale + 1, '0')
+        frac = digits[-self.scale:].rstrip('0')
+        return sign + digits[:-self.scale] + ('.' + frac if frac else '')
+
+    def to_float(self, n):
+        return n / self.pow10
+
+    def format(self, x):
+        """x مقصوصاً إلى مضاعف الخطوة كنص جاهز للإرسال."""
+        if self.units == 1:
+            # power-of-ten step: truncating to `scale` digits already lands on the grid
+            return self.wire(self.scaled(x))
+        return self.wire(self.floor(x))
+
+    def __repr__(self):
+        return f'Quantizer(step={self.step})'
+
+
+_by_precision = {}
+
+
+def for_precision(precision):
+    """Quantizer مشترك لكل دقة (يستخدمه Backend.format_quantity)."""
+    q = _by_precision.get(precision)
+    if q is None:
+        q = _by_precision[precision] = Quantizer.for_precision(precision)
+    return q
@@ -0,0 +1,93 @@
+"""إيجاد أفضل مسار تحويل لأي عملة إلى USDT عبر رسم بياني للأسواق.
+ملاحظات:
+- كل سوق BASE/QUOTE يعطي حافة بيع BASE -> QUOTE بوزن -log(سعر الشراء × (1 - الرسوم))،
+  أي أن أقصر مسار هو المسار الذي يعطي أكبر كمية من USDT بعد الرسوم والفارق السعري.
+- تُحسب أفضل المسارات لكل العملات دفعة واحدة (بحث عكسي من USDT بعدد قفزات محدود)،
+  فيصبح توجيه محفظة كاملة مجرد قراءة من قاموس.
+"""
+import math
+from collections import namedtuple
+from decimal import Decimal
+
+# one sell leg: sell `base` for `quote` on `symbol`
+Leg = namedtuple('Leg', 'symbol base quote')
+
+DEFAULT_FEE = 0.001  # Binance spot taker fee
+
+
+def _sell_price(ticker):
+    if not ticker:
+        return None
+    price = ticker.get('bid') or ticker.get('last')
+    try:
+        price = float(price)
+    except (TypeError, ValueError):
+        return None
+    return price if price > 0 else None
+
+
+def value_along(route, amount, tickers):
+    """قيمة الكمية بعد المرور بمسار كامل بسعر الشراء bid (أو آخر سعر إن غاب)، بدون رسوم، أو None إن نقص سعر."""
+    value = Decimal(str(amount))
+    for leg in route:
+        t = tickers.get(leg.symbol) if isinstance(tickers, dict) else None
+        price = (t.get('bid') or t.get('last')) if t else None
+        if not price:
+            return None
+        value *= Decimal(str(price))
+    return value
+
+
+class CurrencyGraph:
+    def __init__(self, market_index, tickers, fee=DEFAULT_FEE, target='USDT', max_hops=3):
+        self.fee = fee
+        self.target = target
+        self.max_hops = max_hops
+        # reverse adjacency: quote -> [(base, weight, leg)], so one search from the target covers every asset
+        self._incoming = {}
+        self.edges = 0
+        keep = math.log1p(-fee) if fee else 0.0
+        for meta in market_index:
+            if not meta.active:
+                continue
+            price = _sell_price(tickers.get(meta.symbol) if isinstance(tickers, dict) else None)
+            if price is None:
+                continue
+            weight = -(math.log(price) + keep)
+            self._incoming.setdefault(meta.quote, []).append((meta.base, weight, Leg(meta.symbol, meta.base, meta.quote)))
+            self.edges += 1
+        self._dist, self._paths = self._search()
+
+    def _search(self):
+        # hop-limited Bellman-Ford towards the target; weights can be negative so Dijkstra does not apply.
+        # Round k only extends the paths of round k-1's table, and every node keeps its whole path,
+        # so a stored distance always belongs to a path of at most k legs that does not revisit a node.
+        best = {self.target: (0.0, ())}
+        frontier = {self.target}
+        for _ in range(self.max_hops):
+            prev = dict(best)
+            updated = set()
+            for node in frontier:
+                d_node, path = prev[node]
+                for base, weight, leg in self._incoming.get(node, ()):
+                    if base == self.target or any(l.quote == base for l in path):
+                        continue
+                    d = d_node + weight
+                    if d < best.get(base, (math.inf,))[0]:
+                        best[base] = (d, (leg,) + path)
+                        updated.add(base)
+            if not updated:
+                break
+            frontier = updated
+        del best[self.target]
+        return {a: d for a, (d, _) in best.items()}, {a: p for a, (_, p) in best.items()}
+
+    def route(self, asset):
+        """أفضل مسار (قائمة Leg) من asset إلى العملة الهدف، أو None إن لم يوجد."""
+        path = self._paths.get(asset)
+        return list(path) if path else None
+
+    def rate(self, asset):
+        """كمية العملة الهدف المستلمة مقابل وحدة واحدة من asset بعد الرسوم والفارق."""
+        d = self._dist.get(asset)
+        return math.exp(-d) if d is not None else None
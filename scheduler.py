@@ -0,0 +1,328 @@
+"""مجدول مركزي لكل طلبات Backend إلى Binance مع ميزانية أوزان الطلبات.
+ملاحظات:
+- يحسب وزن كل طلب حسب جدول أوزان Binance ويقرأ الوزن المستهلك فعلياً من ترويسة X-MBX-USED-WEIGHT-1M.
+- الأولوية: الأوامر أولاً، ثم طلبات الحساب (الرصيد/الأوامر المفتوحة)، ثم استطلاع الأسعار.
+  الاستطلاع يتوقف عند حد مرن (80% من الميزانية) ليبقى هامش للأوامر.
+- الطلبات المتطابقة للقراءة أثناء تنفيذها تُدمج في طلب واحد يتشارك نتيجته كل المنتظرين.
+- عند 429/418 يتراجع المجدول تصاعدياً (مع احترام Retry-After) قبل إرسال أي طلب جديد.
+- زمن كل طلب (بدون الانتظار في الطابور) يُسجل في مدرج Backend.telemetry حسب اسم الطريقة.
+- call_async يشارك نفس الميزانية مع الواجهة غير المتزامنة (AsyncBackend) دون حجز خيط الحلقة.
+"""
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+PRIORITY_ORDER = 0
+PRIORITY_ACCOUNT = 1
+PRIORITY_POLL = 2
+
+ORDER_METHODS = frozenset({
+    'create_order', 'create_market_order', 'create_market_sell_order', 'create_market_buy_order',
+    'create_limit_order', 'cancel_order', 'cancel_all_orders', 'cancel_orders', 'withdraw',
+})
+ACCOUNT_METHODS = frozenset({'fetch_balance', 'fetch_open_orders', 'fetch_order', 'fetch_orders', 'fetch_my_trades'})
+
+# Binance spot REQUEST_WEIGHT per endpoint (per minute budget, default 6000)
+ENDPOINT_WEIGHTS = {
+    'load_markets': 20,
+    'fetch_ticker': 2,
+    'fetch_balance': 20,
+    'fetch_open_orders': 80,
+    'fetch_order': 4,
+    'fetch_orders': 20,
+    'fetch_my_trades': 20,
+    'fetch_ohlcv': 2,
+    'fetch_order_book': 5,
+    'cancel_order': 1,
+    'cancel_all_orders': 1,
+    'withdraw': 1,
+}
+
+
+def request_weight(name, args=(), kwargs=None):
+    kwargs = kwargs or {}
+    if name == 'fetch_tickers':
+        symbols = args[0] if args else kwargs.get('symbols')
+        if not symbols or len(symbols) > 100:
+            return 80
+        # /api/v3/ticker/24hr: flat 2 for 1-20 symbols, 40 for 21-100, 80 above or for all symbols
+        return 40 if len(symbols) > 20 else 2
+    if name == 'fetch_open_orders':
+        symbol = args[0] if args else kwargs.get('symbol')
+        return 6 if symbol else 80
+    if name == 'fetch_order_book':
+        limit = (args[1] if len(args) > 1 else kwargs.get('limit')) or 100  # None is ccxt's default
+        return 5 if limit <= 100 else 25 if limit <= 500 else 50
+    if name in ORDER_METHODS and name not in ENDPOINT_WEIGHTS:
+        return 1
+    return ENDPOINT_WEIGHTS.get(name, 2)
+
+
+def _header(headers, name):
+    if not headers:
+        return None
+    for k, v in headers.items():
+        if k.lower() == name:
+            return v
+    return None
+
+
+def is_rate_limit_error(exc):
+    text = f'{type(exc).__name__} {exc}'
+    return ('RateLimitExceeded' in text or 'DDoSProtection' in text
+            or ' 429 ' in f' {exc} ' or ' 418 ' in f' {exc} ')
+
+
+def is_error_type(exc, name):
+    # matches ccxt exception classes (and their subclasses) by name, without importing ccxt
+    return any(c.__name__ == name for c in type(exc).__mro__)
+
+
+def is_network_error(exc):
+    return is_rate_limit_error(exc) or is_error_type(exc, 'NetworkError')
+
+
+class RequestScheduler:
+    def __init__(self, backend, weight_limit=6000, soft_ratio=0.8, account_ratio=0.9,
+                 max_concurrent=8, orders_per_10s=100):
+        self.backend = backend
+        self.weight_limit = weight_limit
+        self.soft_ratio = soft_ratio
+        self.account_ratio = account_ratio
+        self.max_concurrent = max_concurrent
+        self.orders_per_10s = orders_per_10s
+        self._cond = threading.Condition()
+        self._waiting = []  # heap of (priority, ticket)
+        self._tickets = itertools.count()
+        self._in_flight = 0
+        self._reads = {}  # coalescing key -> Future
+        self._async_reads = {}  # coalescing key -> asyncio.Future (touched only from the async loop)
+        self._window = self._minute()
+        self._used = 0  # weight used in the current minute (local estimate, corrected by headers)
+        self._orders = deque()  # timestamps of recent orders (10s window)
+        self._blocked_until = 0.0
+        self._backoff = 0.0
+        self.calls = 0
+        self.coalesced = 0
+        self.throttled = 0
+
+    @property
+    def orders_per_second(self):
+        return self.orders_per_10s / 10.0
+
+    @staticmethod
+    def _minute(now=None):
+        return int((time.time() if now is None else now) // 60)
+
+    def _roll_window(self):
+        minute = self._minute()
+        if minute != self._window:
+            self._window = minute
+            self._used = 0
+
+    def _limit_for(self, priority):
+        ratio = 1.0 if priority == PRIORITY_ORDER else self.account_ratio if priority == PRIORITY_ACCOUNT else self.soft_ratio
+        return self.weight_limit * ratio
+
+    def _delay_for(self, priority, weight, is_order):
+        """0 إن أمكن الإرسال الآن، وإلا عدد الثواني المقترح للانتظار."""
+        now = time.time()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        self._roll_window()
+        if self._used + weight > self._limit_for(priority):
+            return max(0.01, 60 - now % 60)
+        if is_order:
+            mono = time.monotonic()
+            while self._orders and mono - self._orders[0] >= 10:
+                self._orders.popleft()
+            if len(self._orders) >= self.orders_per_10s:
+                return 10 - (mono - self._orders[0])
+        if self._in_flight >= self.max_concurrent:
+            return 0.05
+        return 0
+
+    def _acquire(self, priority, weight, is_order):
+        ticket = (priority, next(self._tickets))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            waited = False
+            while True:
+                if self._waiting[0] == ticket:
+                    delay = self._delay_for(priority, weight, is_order)
+                    if delay <= 0:
+                        heapq.heappop(self._waiting)
+                        self._take(weight, is_order)
+                        return
+                    if not waited:
+                        self.throttled += 1
+                        waited = True
+                    self._cond.wait(min(delay, 1.0))
+                else:
+                    self._cond.wait(0.5)
+
+    def _take(self, weight, is_order):
+        # caller holds self._cond
+        self._in_flight += 1
+        self._used += weight
+        if is_order:
+            self._orders.append(time.monotonic())
+        self.calls += 1
+        self._cond.notify_all()
+
+    def _try_acquire(self, priority, weight, is_order):
+        """نسخة غير حاجبة من _acquire: 0 عند الحجز، وإلا عدد الثواني المقترح قبل المحاولة التالية."""
+        with self._cond:
+            if self._waiting and self._waiting[0][0] <= priority:
+                # blocked threads of the same or higher priority go first
+                return 0.05
+            delay = self._delay_for(priority, weight, is_order)
+            if delay <= 0:
+                self._take(weight, is_order)
+            return delay
+
+    def _release(self, exc=None, exchange=None):
+        exchange = self.backend.exchange if exchange is None else exchange
+        headers = getattr(exchange, 'last_response_headers', None)
+        with self._cond:
+            self._in_flight -= 1
+            used = _header(headers, 'x-mbx-used-weight-1m') or _header(headers, 'x-mbx-used-weight')
+            if used is not None:
+                try:
+                    self._roll_window()
+                    # the header is authoritative, but calls still in flight are not in it yet
+                    self._used = max(int(used), self._used if self._in_flight else 0)
+                except ValueError:
+                    pass
+            if exc is not None and is_rate_limit_error(exc):
+                retry_after = _header(headers, 'retry-after')
+                try:
+                    retry_after = float(retry_after) if retry_after is not None else 0
+                except ValueError:
+                    retry_after = 0
+                self._backoff = min(120.0, max(1.0, self._backoff * 2))
+                pause = max(self._backoff, retry_after)
+                self._blocked_until = max(self._blocked_until, time.time() + pause)
+                self.backend.log('تجاوز حد الطلبات - إيقاف مؤقت {:.0f} ثانية.', pause)
+            elif exc is None:
+                self._backoff = self._backoff / 2 if self._backoff > 1 else 0.0
+            self._cond.notify_all()
+
+    def call(self, name, *args, priority=None, weight=None, exchange=None, **kwargs):
+        """تنفيذ exchange.<name>(*args, **kwargs) ضمن الميزانية والأولوية (exchange افتراضياً backend.exchange)."""
+        is_order = name in ORDER_METHODS
+        if priority is None:
+            priority = PRIORITY_ORDER if is_order else PRIORITY_ACCOUNT if name in ACCOUNT_METHODS else PRIORITY_POLL
+        if weight is None:
+            weight = request_weight(name, args, kwargs)
+        if is_order:
+            return self._run(name, args, kwargs, priority, weight, True, exchange)
+        key = repr((name, args, sorted(kwargs.items()), id(exchange)))
+        with self._cond:
+            future = self._reads.get(key)
+            leader = future is None
+            if leader:
+                future = self._reads[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+        try:
+            result = self._run(name, args, kwargs, priority, weight, False, exchange)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._cond:
+                self._reads.pop(key, None)
+
+    def _run(self, name, args, kwargs, priority, weight, is_order, exchange=None):
+        self._acquire(priority, weight, is_order)
+        exchange = self.backend.exchange if exchange is None else exchange
+        start = time.perf_counter()
+        try:
+            result = getattr(exchange, name)(*args, **kwargs)
+        except Exception as e:
+            self._observe(name, start, True)
+            self._release(e, exchange)
+            raise
+        self._observe(name, start)
+        self._release(exchange=exchange)
+        return result
+
+    def _observe(self, name, start, error=False):
+        telemetry = getattr(self.backend, 'telemetry', None)
+        if telemetry is not None:
+            telemetry.observe(name, time.perf_counter() - start, error)
+
+    async def call_async(self, exchange, name, *args, priority=None, weight=None, **kwargs):
+        """مثل call لكن على exchange من ccxt.async_support داخل حلقة asyncio، بنفس الميزانية والأولوية."""
+        is_order = name in ORDER_METHODS
+        if priority is None:
+            priority = PRIORITY_ORDER if is_order else PRIORITY_ACCOUNT if name in ACCOUNT_METHODS else PRIORITY_POLL
+        if weight is None:
+            weight = request_weight(name, args, kwargs)
+        if is_order:
+            return await self._run_async(exchange, name, args, kwargs, priority, weight, True)
+        key = repr((name, args, sorted(kwargs.items())))
+        future = self._async_reads.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+        future = self._async_reads[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await self._run_async(exchange, name, args, kwargs, priority, weight, False)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            self._async_reads.pop(key, None)
+
+    async def _run_async(self, exchange, name, args, kwargs, priority, weight, is_order):
+        waited = False
+        while True:
+            delay = self._try_acquire(priority, weight, is_order)
+            if delay <= 0:
+                break
+            if not waited:
+                with self._cond:
+                    self.throttled += 1
+                waited = True
+            await asyncio.sleep(min(delay, 1.0))
+        start = time.perf_counter()
+        try:
+            result = await getattr(exchange, name)(*args, **kwargs)
+        except BaseException as e:
+            self._observe(name, start, True)
+            self._release(e if isinstance(e, Exception) else None, exchange)
+            raise
+        self._observe(name, start)
+        self._release(None, exchange)
+        return result
+
+    def usage(self):
+        """حالة الميزانية الحالية."""
+        with self._cond:
+            self._roll_window()
+            now = time.time()
+            return {
+                'used_weight': self._used,
+                'weight_limit': self.weight_limit,
+                'percent': round(100.0 * self._used / self.weight_limit, 1) if self.weight_limit else 0.0,
+                'blocked_for': max(0.0, self._blocked_until - now),
+                'in_flight': self._in_flight,
+                'waiting': len(self._waiting),
+                'orders_10s': len(self._orders),
+                'calls': self.calls,
+                'coalesced': self.coalesced,
+                'throttled': self.throttled,
+            }
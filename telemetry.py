@@ -0,0 +1,246 @@
+"""سجل أحداث منظم ومقاييس زمنية لـ Backend بكلفة منخفضة على مسار التداول.
+ملاحظات:
+- الحدث يُخزن كـ tuple (الوقت، المستوى، القالب، المعاملات، الحقول) ولا يُنسق نصاً إلا عند سحبه للواجهة
+  أو كتابته في الملف، فالرسائل التي تحمل أوامر كاملة أو أخطاء لا تكلف شيئاً في الخيط المرسل.
+- مستويات (DEBUG/INFO/WARNING/ERROR) وأخذ عينات لكل مفتاح (حدث واحد من كل N) للرسائل المتكررة في الحلقات.
+- مدرج تكراري لزمن كل عملية (جلب الأسعار، الأوامر، الإلغاء، الرصيد...) بدلاء لوغاريتمية ثابتة،
+  فالتسجيل O(1) والنسب المئوية تقريبية (ضمن عامل الدلو).
+- ملف JSONL اختياري للإضافة فقط، يكتبه خيط خلفي من طابور غير حاجب (تُسقط الأحداث إن امتلأ الطابور).
+"""
+import json
+import math
+import os
+import queue
+import threading
+import time
+import traceback
+from bisect import bisect_left
+
+from market_state import LogBuffer
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING', ERROR: 'ERROR'}
+
+
+def message(event):
+    """نص رسالة الحدث بعد تنسيق المعاملات (بدون الوقت)."""
+    ts, level, msg, args, fields = event
+    if args:
+        try:
+            msg = msg.format(*args)
+        except Exception:
+            msg = ' '.join([msg] + [str(a) for a in args])
+    exc = fields.get('exc') if fields else None
+    if exc is not None:
+        msg = msg + '\n' + ''.join(exc.format()).rstrip()
+    return msg
+
+
+def render(event):
+    """نص الحدث للعرض: '[HH:MM:SS] رسالة'."""
+    ts, level = event[0], event[1]
+    prefix = '' if level == INFO else LEVEL_NAMES.get(level, str(level)) + ': '
+    return f"[{time.strftime('%H:%M:%S', time.localtime(ts))}] {prefix}{message(event)}"
+
+
+def _bucket_bounds(low=0.0005, factor=2.0, count=18):
+    # 0.5 ms .. ~65 s
+    return [low * factor ** i for i in range(count)]
+
+
+class Histogram:
+    """مدرج تكراري للأزمنة (بالثواني) بدلاء ثابتة متضاعفة."""
+
+    BOUNDS = _bucket_bounds()
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, error=False):
+        i = bisect_left(self.BOUNDS, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+            if error:
+                self.errors += 1
+
+    def percentile(self, p):
+        """الحد الأعلى للدلو الذي يقع فيه المئين p (0-100)."""
+        with self._lock:
+            counts, n, top = list(self.counts), self.count, self.max
+        if not n:
+            return None
+        rank = max(1, math.ceil(n * p / 100.0))
+        seen = 0
+        for i, c in enumerate(counts):
+            seen += c
+            if seen >= rank:
+                return min(self.BOUNDS[i], top) if i < len(self.BOUNDS) else top
+        return top
+
+    def summary(self):
+        with self._lock:
+            n, total, top, errors = self.count, self.total, self.max, self.errors
+        return {
+            'count': n,
+            'errors': errors,
+            'mean': total / n if n else None,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'max': top if n else None,
+        }
+
+
+class JsonlSink:
+    """كاتب JSONL في خيط خلفي؛ put لا يحجز أبداً."""
+
+    def __init__(self, path, max_queue=10000, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.written = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def put(self, record):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout=5):
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        folder = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(folder, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            while True:
+                try:
+                    record = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    f.flush()
+                    continue
+                if record is None:
+                    break
+                try:
+                    f.write(json.dumps(self._encode(record), ensure_ascii=False, default=str) + '\n')
+                    self.written += 1
+                except Exception:
+                    self.dropped += 1
+            f.flush()
+
+    @staticmethod
+    def _encode(record):
+        if isinstance(record, dict):
+            return record  # metrics snapshot
+        ts, level, msg, args, fields = record
+        row = {'ts': ts, 'level': LEVEL_NAMES.get(level, level), 'msg': message(record)}
+        for k, v in (fields or {}).items():
+            if k != 'exc':
+                row[k] = v
+        return row
+
+
+class Telemetry:
+    def __init__(self, level=INFO, maxlen=2000):
+        self.level = level
+        self.buffer = LogBuffer(maxlen=maxlen)
+        self.sample = {}  # key -> N: keep one event in every N with that key
+        self._seen = {}
+        self.suppressed = 0
+        self.histograms = {}
+        self._hist_lock = threading.Lock()
+        self.sink = None
+
+    def enabled(self, level):
+        return level >= self.level
+
+    def log(self, level, msg, *args, key=None, **fields):
+        """تسجيل حدث؛ msg قالب str.format يُنسق لاحقاً مع args."""
+        if level < self.level:
+            return
+        if key is not None:
+            every = self.sample.get(key)
+            if every:
+                # unlocked counter: a race only shifts which event of the N is kept
+                n = self._seen.get(key, 0)
+                self._seen[key] = n + 1
+                if n % every:
+                    self.suppressed += 1
+                    return
+        event = (time.time(), level, msg, args, fields)
+        self.buffer.append(event)
+        if self.sink is not None:
+            self.sink.put(event)
+
+    def exception(self, msg, exc, *args, **fields):
+        # frames are summarised now (without reading source lines) so the event does not pin them
+        fields['exc'] = traceback.TracebackException(type(exc), exc, exc.__traceback__, lookup_lines=False)
+        self.log(ERROR, msg, *args, **fields)
+
+    def drain(self):
+        return [render(e) for e in self.buffer.drain()]
+
+    # --- latency metrics ---------------------------------------------------------
+    def histogram(self, op):
+        h = self.histograms.get(op)
+        if h is None:
+            with self._hist_lock:
+                h = self.histograms.setdefault(op, Histogram())
+        return h
+
+    def observe(self, op, seconds, error=False):
+        self.histogram(op).observe(seconds, error)
+
+    def timer(self, op):
+        return _Timer(self, op)
+
+    def metrics(self):
+        """{عملية: ملخص الأزمنة بالثواني}."""
+        with self._hist_lock:
+            ops = list(self.histograms.items())
+        return {op: h.summary() for op, h in sorted(ops)}
+
+    # --- file sink -------------------------------------------------------------------
+    def open_sink(self, path, **kwargs):
+        self.close_sink()
+        self.sink = JsonlSink(path, **kwargs)
+        return self.sink
+
+    def close_sink(self):
+        sink, self.sink = self.sink, None
+        if sink is not None:
+            sink.put({'ts': time.time(), 'metrics': self.metrics()})
+            sink.close()
+
+
+class _Timer:
+    __slots__ = ('telemetry', 'op', 'start')
+
+    def __init__(self, telemetry, op):
+        self.telemetry = telemetry
+        self.op = op
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.telemetry.observe(self.op, time.perf_counter() - self.start, error=exc_type is not None)
+        return False
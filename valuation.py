@@ -0,0 +1,97 @@
+"""حساب قيمة المحفظة دفعة واحدة (يستخدمه Backend.calculate_total_asset_value).
+ملاحظات:
+- تُبنى خريطة أسعار ASSET -> سعر USDT مرة واحدة لكل لقطة أسعار، ثم تُصف الأرصدة والأسعار في مصفوفتين
+  ويُحسب المجموع والتفصيل في تمريرة واحدة (NumPy إن توفر، وإلا بايثون خالص).
+- القيمة بسعر جانب الشراء (bid، أو آخر سعر إن غاب)، ومن VWAP دفتر الأوامر المحلي للكمية الفعلية إن كان متزامناً.
+- الحساب يتم بأعداد float، والتحويل إلى Decimal فقط عند العرض.
+"""
+import math
+from collections import namedtuple
+from decimal import Decimal
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional on Android builds
+    np = None
+
+from routing import value_along
+
+Valuation = namedtuple('Valuation', 'total assets amounts prices values')
+
+
+def to_decimal(x, places=8):
+    return Decimal(repr(float(x))).quantize(Decimal(1).scaleb(-places))
+
+
+class PortfolioValuator:
+    def __init__(self, quote='USDT', banned=(), use_numpy=True):
+        self.quote = quote
+        self.banned = frozenset(banned)
+        self.use_numpy = use_numpy and np is not None
+        self._prices = (None, None)  # (tickers snapshot, {asset: price})
+
+    def price_map(self, tickers):
+        """أسعار كل الأصول مقابل quote من لقطة واحدة، مع إعادة استخدامها ما دامت اللقطة نفسها."""
+        snapshot, prices = self._prices
+        if prices is not None and snapshot is tickers:
+            return prices
+        prices = {self.quote: 1.0}
+        slash = '/' + self.quote
+        n = len(self.quote)
+        for sym, t in (tickers or {}).items():
+            if not t:
+                continue
+            price = t.get('bid') or t.get('last')
+            if not price:
+                continue
+            if sym.endswith(slash):
+                prices[sym[:-n - 1]] = float(price)
+            elif '/' not in sym and sym.endswith(self.quote):
+                # no-slash ids like 'BTCUSDT'; slash symbols win when both exist
+                prices.setdefault(sym[:-n], float(price))
+        self._prices = (tickers, prices)
+        return prices
+
+    def align(self, totals, tickers, router=None, books=None):
+        prices = self.price_map(tickers)
+        assets, amounts, column = [], [], []
+        for asset, amt in totals.items():
+            if not amt or asset in self.banned:
+                continue
+            amt = float(amt)
+            if amt <= 0:
+                continue
+            price = prices.get(asset)
+            book = books(f'{asset}/{self.quote}') if books is not None and asset != self.quote else None
+            if book is not None:
+                # depth-aware: what selling this exact amount into the live book would fetch
+                avg, filled = book.vwap('sell', amt)
+                if avg:
+                    price = avg
+            if price is None and router is not None:
+                # no direct pair: price one unit along the best route and remember it for this snapshot
+                route = router().route(asset)
+                unit = value_along(route, 1, tickers) if route else None
+                price = prices[asset] = float(unit) if unit else 0.0
+            assets.append(asset)
+            amounts.append(amt)
+            column.append(price or 0.0)
+        return assets, amounts, column
+
+    def value(self, totals, tickers, router=None, books=None):
+        assets, amounts, prices = self.align(totals, tickers, router, books)
+        if self.use_numpy:
+            a = np.asarray(amounts, dtype=np.float64)
+            p = np.asarray(prices, dtype=np.float64)
+            values = a * p
+            total = float(values.sum())
+            values = values.tolist()
+        else:
+            values = [x * y for x, y in zip(amounts, prices)]
+            total = math.fsum(values)
+        return Valuation(total, assets, amounts, prices, values)
+
+    def breakdown(self, valuation, places=8):
+        """تفصيل القيم لكل أصل كـ Decimal للعرض، مرتباً تنازلياً."""
+        rows = sorted(zip(valuation.assets, valuation.values), key=lambda r: r[1], reverse=True)
+        return [(asset, to_decimal(v, places)) for asset, v in rows if v > 0]